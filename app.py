@@ -1,12 +1,28 @@
 import streamlit as st
-import requests
 import pandas as pd
 import plotly.graph_objects as go
+import io
 import math
 import datetime
 from typing import Dict, List
 import numpy as np
 
+from planner.constants import (
+    MIN_PANEL_POWER_W, MAX_PANEL_POWER_W, ROBOT_EFFICIENCY_PANELS_PER_HOUR,
+    ROBOT_DAILY_WORK_HOURS, ROBOT_AVAILABILITY_RATE, STATION_DB,
+)
+from planner import weather
+from planner.memo import default_memo, run_engine_cached
+from planner.prewarm import PREWARM_ENABLED, Prewarmer
+from planner.metrics import Metrics, bind_metrics, metrics
+from planner.render import chart_specs, opportunity_spec, weather_grid_html
+from planner.ensemble import ensemble_members, run_ensemble
+from planner.export import frame_bytes
+from planner.opportunity import opportunity_curve
+from planner.fleet import fleet_stations, plan_fleet, station_model
+from planner.registry import MODELS_PATH, cell_center, parse_stations_csv, read_models
+from planner.sweep import min_robots, recommend_robots, sweep
+
 # ================= 页面配置 =================
 st.set_page_config(
     page_title="巴西光伏运维 | 智能决策系统",
@@ -89,6 +105,7 @@ st.markdown("""
     .metric-sub { font-size: 0.8rem; color: #34c759; font-weight: 500; margin-top: 4px; }
     .metric-sub.neutral { color: #86868b; }
 
+    .weather-grid { display: grid; grid-template-columns: repeat(7, minmax(0, 1fr)); gap: 1rem; }
     .weather-card {
         background: #FFFFFF;
         border-radius: 16px;
@@ -117,57 +134,7 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# ================= ⭐ 核心常数 =================
-DEFAULT_PANEL_POWER_W = 700
-MIN_PANEL_POWER_W = 300
-MAX_PANEL_POWER_W = 900
-WATER_CONSUMPTION_PER_PANEL = 0.015
-ENERGY_CONSUMPTION_PER_PANEL = 0.008
-ROBOT_EFFICIENCY_PANELS_PER_HOUR = 50
-ROBOT_DAILY_WORK_HOURS = 10.0
-ROBOT_AVAILABILITY_RATE = 0.95
-DUST_ACCUMULATION_RATE_BASE = 0.4
-MAX_DUST_CAPACITY = 15.0
-SOILING_NON_LINEAR_FACTOR = 1.2
-HOTSPOT_THRESHOLD = 8.0
-HEAVY_RAIN_THRESHOLD = 5.0
-LIGHT_RAIN_THRESHOLD = 1.0
-MUD_RISK_HUMIDITY = 85.0
-WIND_SAFETY_LIMIT = 10.0
-CARBON_FACTOR = 0.58
-
-# ================= 🗄️ 数据库 =================
-STATION_DB = {
-    "请选择电站...": {},
-    "AUT (Autazes)": {"lat": -3.60, "lon": -59.12, "sell_price": 0.35, "robot_elec_price": 0.25, "water_price": 2.0},
-    "NOD (Nova Olinda)": {"lat": -3.88, "lon": -59.07, "sell_price": 0.38, "robot_elec_price": 0.28, "water_price": 2.2},
-    "BBA (Borba)": {"lat": -4.40, "lon": -59.63, "sell_price": 0.32, "robot_elec_price": 0.22, "water_price": 1.8},
-    "HMT (Humaita)": {"lat": -7.48, "lon": -63.02, "sell_price": 0.40, "robot_elec_price": 0.35, "water_price": 2.5},
-    "SGC (Sao Gabriel)": {"lat": -0.15, "lon": -67.03, "sell_price": 0.36, "robot_elec_price": 0.26, "water_price": 2.1}
-}
-
 # ================= 🛠️ 工具函数 =================
-def get_weather_icon(code: int) -> str:
-    icons = {0: "☀️", 1: "🌤️", 2: "⛅", 3: "☁️", 45: "🌫️", 51: "🌦️", 53: "🌦️", 55: "🌧️", 
-             61: "🌧️", 63: "🌧️", 65: "⛈️", 80: "🌦️", 81: "🌧️", 82: "⛈️", 95: "⚡", 96: "⚡", 99: "⚡"}
-    return icons.get(code, "❓")
-
-def get_weather_desc(code: int, humidity: float, wind: float) -> str:
-    base = {0: "晴朗", 1: "大部晴朗", 2: "多云", 3: "阴天", 45: "雾", 51: "小雨", 
-            53: "雨", 55: "雨", 61: "雨", 63: "雨", 65: "大雨", 80: "阵雨", 
-            81: "雨", 82: "风暴", 95: "雷暴", 96: "雷暴", 99: "雷暴"}.get(code, "未知")
-    risks = []
-    if code in [95, 96, 99]: risks.append("⚡")
-    if wind > WIND_SAFETY_LIMIT: risks.append(f"💨{wind:.0f}")
-    if humidity > MUD_RISK_HUMIDITY and code in [2, 3]: risks.append("💧")
-    return f"{base} ({' '.join(risks)})" if risks else base
-
-def fmt_date_short(s):
-    try:
-        dt = datetime.datetime.strptime(s, "%Y-%m-%d")
-        return f"{dt.month}/{dt.day}"
-    except: return s
-
 def fmt_date_full(s):
     try:
         dt = datetime.datetime.strptime(s, "%Y-%m-%d")
@@ -184,156 +151,54 @@ def validate_inputs(count, power):
     return valid, err, round(cap, 2)
 
 # ================= 🌐 数据获取 =================
-@st.cache_data(ttl=1800)
-def fetch_weather(lat, lon, days=14):
-    try:
-        url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            "latitude": lat, "longitude": lon,
-            "hourly": "weathercode,temperature_2m,relativehumidity_2m,windspeed_10m,rain",
-            "daily": "shortwave_radiation_sum,precipitation_sum,windspeed_10m_max,temperature_2m_max",
-            "timezone": "auto", "forecast_days": days
-        }
-        resp = requests.get(url, params=params, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
-        
-        h, d = data['hourly'], data['daily']
-        agg = {}
-        for i in range(len(h['time'])):
-            date = h['time'][i].split('T')[0]
-            if date not in agg: agg[date] = {"r":0, "w":0, "h":0, "t":0, "c":[]}
-            agg[date]["r"] += h['rain'][i] or 0
-            agg[date]["w"] = max(agg[date]["w"], h['windspeed_10m'][i] or 0)
-            agg[date]["h"] = max(agg[date]["h"], h['relativehumidity_2m'][i] or 50)
-            agg[date]["t"] = max(agg[date]["t"], h['temperature_2m'][i] or 25)
-            agg[date]["c"].append(h['weathercode'][i] or 0)
-            
-        res = []
-        for i in range(len(d['time'])):
-            date = d['time'][i]
-            info = agg.get(date, {})
-            rad_mj = d['shortwave_radiation_sum'][i] or 0
-            rain = d['precipitation_sum'][i] or info.get("r", 0)
-            wind = (d['windspeed_10m_max'][i] or info.get("w", 0)) / 3.6
-            temp = d['temperature_2m_max'][i] or info.get("t", 25)
-            hum = info.get("h", 70)
-            code = max(set(info.get("c", [0])), key=info.get("c", [0]).count)
-            
-            res.append({
-                "date": date, "rain": round(rain, 1), "wind": round(wind, 1),
-                "radiation_mj": round(rad_mj, 1),
-                "radiation_kwh": round(rad_mj / 3.6, 2),
-                "humidity": round(hum, 1), "temp": round(temp, 1),
-                "code": code, "icon": get_weather_icon(code), "desc": get_weather_desc(code, hum, wind)
-            })
-        return res, "Open-Meteo API"
-    except Exception as e:
-        start = datetime.datetime.now()
-        sim = []
-        for i in range(days):
-            d = (start + datetime.timedelta(days=i)).strftime("%Y-%m-%d")
-            r = np.random.exponential(3) if np.random.random() < 0.6 else 0
-            w = max(0, np.random.normal(4, 2))
-            rad_mj = max(5, 20 * (1 - min(r/10, 0.8)) + np.random.normal(0, 2))
-            hum = min(99, max(40, np.random.normal(80, 10)))
-            code = 61 if r > 1 else (3 if hum > 85 else 0)
-            sim.append({
-                "date": d, "rain": round(r, 1), "wind": round(w, 1), 
-                "radiation_mj": round(rad_mj, 1), "radiation_kwh": round(rad_mj/3.6, 2),
-                "humidity": round(hum, 1), "temp": round(np.random.normal(30, 3), 1),
-                "code": code, "icon": get_weather_icon(code), "desc": get_weather_desc(code, hum, w)
-            })
-        return sim, "模拟模式 (API 备用)"
+# 进程内缓存只用于避免每次重跑都解析；持久化与过期刷新由磁盘缓存负责。
+# st.cache_data 命中时函数体不执行：函数体内计未命中，调用处计查询次数
+@st.cache_data(ttl=300)
+def _fetch_weather(lat, lon):
+    metrics().count("app.fetch_cache.miss")
+    return weather.fetch_weather(lat, lon)
 
-# ================= 🧠 决策引擎 =================
-def run_engine(weather, cfg, econ):
-    dates = [x['date'] for x in weather]
-    rains = [x['rain'] for x in weather]
-    winds = [x['wind'] for x in weather]
-    rads_mj = [x['radiation_mj'] for x in weather]
-    hums = [x['humidity'] for x in weather]
-    
-    panels = cfg['panels']
-    cap_mw = cfg['capacity']
-    robots = cfg['robots']
-    
-    p_sell, p_water, p_elec = econ['sell'], econ['water'], econ['elec']
-    
-    eff_robots = robots * ROBOT_AVAILABILITY_RATE
-    daily_cap = eff_robots * ROBOT_EFFICIENCY_PANELS_PER_HOUR * ROBOT_DAILY_WORK_HOURS
-    
-    if daily_cap <= 0:
-        duration = 999
-    else:
-        duration = math.ceil(panels / daily_cap)
-    
-    water_cost = panels * WATER_CONSUMPTION_PER_PANEL * p_water
-    elec_cost = panels * ENERGY_CONSUMPTION_PER_PANEL * p_elec
-    single_cost = water_cost + elec_cost
-    
-    dust = 0.0
-    plan, windows = [], []
-    last_end = -999
-    
-    for i in range(len(dates)):
-        r, w, rad_mj, hum = rains[i], winds[i], rads_mj[i], hums[i]
-        
-        if r >= HEAVY_RAIN_THRESHOLD: dust = 0.0
-        elif r >= LIGHT_RAIN_THRESHOLD: dust *= 0.5
-        else:
-            rate = DUST_ACCUMULATION_RATE_BASE
-            if hum > MUD_RISK_HUMIDITY and r < 0.1: rate *= 1.3
-            dust += rate
-        dust = min(dust, MAX_DUST_CAPACITY)
-        
-        loss = (dust / 100) * (1 + (1 - rad_mj/20) * (SOILING_NON_LINEAR_FACTOR - 1))
-        loss = min(loss, 1.0)
-        
-        gen_potential = cap_mw * (rad_mj / 3.6) * 1000
-        lost_rev = gen_potential * loss * p_sell
-        
-        is_cleaning = i <= last_end and i >= (last_end - duration + 1)
-        safety_stop = w > WIND_SAFETY_LIMIT
-        hot_spot = dust > HOTSPOT_THRESHOLD
-        
-        action, status, cost = "监控", "⚪ 正常运行", 0.0
-        trigger, reason = False, ""
-        
-        if not is_cleaning and not safety_stop:
-            if hot_spot:
-                trigger, reason = True, "热斑风险"
-            elif lost_rev * 3.0 > single_cost * 1.1:
-                trigger, reason = True, "经济最优"
-        
-        if trigger and (i + duration < len(dates)):
-            action, cost = "清洗", single_cost
-            last_end = i + duration - 1
-            status = f"🧹 清洗中 ({reason})"
-            windows.append({"start": i, "end": last_end, "reason": reason, "cost": single_cost})
-        
-        if i > 0 and (i-1) in [w['end'] for w in windows]:
-            dust, loss = 0.2, 0.002
-            status = "✨ 高效发电"
-            
-        actual_gen = gen_potential * (1 - loss)
-        net = actual_gen * p_sell - cost
-        
-        plan.append({
-            "date": dates[i], "rain": r, "wind": w, 
-            "radiation_kwh": round(rad_mj / 3.6, 2),
-            "dust": round(dust, 2), "loss": round(loss*100, 1),
-            "action": action, "status": status,
-            "revenue": round(actual_gen * p_sell, 1), "cost": round(cost, 1),
-            "net": round(net, 1), "carbon": round((actual_gen * CARBON_FACTOR)/1000, 3),
-            "hot_spot": hot_spot, "safety": safety_stop
-        })
-        if action == "Cleaning" and i == last_end: dust = 0.2
-        
-    return pd.DataFrame(plan), windows, {
-        "total_cost": sum(w['cost'] for w in windows),
-        "count": len(windows), "duration": duration
-    }
+@st.cache_data(ttl=300)
+def _fetch_weather_hourly(lat, lon):
+    metrics().count("app.fetch_cache.miss")
+    return weather.fetch_weather_hourly(lat, lon)
+
+def _looked_up(cached, lat, lon):
+    m = metrics()
+    m.count("app.fetch_cache.lookup")
+    with m.stage("app.fetch"):
+        return cached(lat, lon)
+
+def fetch_weather(lat, lon):
+    return _looked_up(_fetch_weather, lat, lon)
+
+def fetch_weather_hourly(lat, lon):
+    return _looked_up(_fetch_weather_hourly, lat, lon)
+
+# 每个进程一个后台预热线程：到期前刷新全部电站的预报并预算默认参数下的计划
+@st.cache_resource
+def _prewarmer():
+    return Prewarmer().start() if PREWARM_ENABLED else None
+
+prewarmer = _prewarmer()
+
+ensemble_for = st.cache_data(ttl=1800)(ensemble_members)
+recommend_for = st.cache_data(ttl=1800, max_entries=64)(recommend_robots)
+sweep_for = st.cache_data(ttl=1800, max_entries=16)(sweep)
+models_for = st.cache_data(ttl=300)(read_models)   # SOLAR_MODELS：按站拟合的积灰模型参数
+
+# ================= 📈 图表与表格 =================
+def build_charts(df, wins):
+    return tuple(go.Figure(spec) for spec in chart_specs(df, wins))
+
+def build_opportunity(weather_data, cfg, econ):
+    curve = opportunity_curve(weather_data, cfg, econ)
+    return curve, go.Figure(opportunity_spec(curve))
+
+def build_table(df):
+    view = df.copy()
+    view['Date'] = view['date'].apply(fmt_date_full)
+    return view
 
 # ================= 🪟 定义原生对话框 =================
 @st.dialog("📖 技术原理")
@@ -362,6 +227,12 @@ def technical_principles_dialog():
     1. **安全:** 积灰 > 8% (热斑风险) 且 风速 < 10 m/s。
     2. **经济:** 损失收入 > 1.1 × 清洗成本。
     
+    **全局最优模式:** 以动态规划在整个预测期内选择清洗窗口，使净收益最大；
+    会等待即将到来的大雨免费清洗面板，同时遵守大风停机、窗口长度与热斑约束。
+    
+    **逐小时模式:** 积灰按小时递推；清洗只在 7–17 时作业时段内、风速 ≤ 10 m/s 且无降雨的小时推进，
+    累计完成所需的机器人作业小时后结束。
+    
     *注：水资源限制已禁用。机器人数量直接影响清洗窗口期长短。*
     """, unsafe_allow_html=True)
 
@@ -375,7 +246,8 @@ with st.sidebar:
     station = st.selectbox("电站选择", list(STATION_DB.keys()), index=0)
     
     if station != "请选择电站...":
-        db = STATION_DB[station]
+        db = {**STATION_DB[station], **(models_for(MODELS_PATH).get(station, {}) if MODELS_PATH else {})}
+        model = station_model(db)
         
         st.markdown("## 规模参数")
         c1, c2 = st.columns(2)
@@ -397,21 +269,14 @@ with st.sidebar:
         robots = st.number_input("清洗机器人数量 (台)", value=28, step=1, label_visibility="collapsed")
         st.caption("可用清洗机器人数量。机器人越多 = 清洗周期越短 = 调度越灵活。")
         
-        target_days = 7
-        daily_need = p_count / target_days
-        robot_capacity_per_day = ROBOT_EFFICIENCY_PANELS_PER_HOUR * ROBOT_DAILY_WORK_HOURS * ROBOT_AVAILABILITY_RATE
-        rec_robots = math.ceil(daily_need / robot_capacity_per_day) if robot_capacity_per_day > 0 else 999
-        
-        current_days = math.ceil(p_count / (robots * robot_capacity_per_day)) if (robots * robot_capacity_per_day) > 0 else 999
+        # 推荐数量依赖天气与经济参数（在下方输入），先占位，读完参数后填充
+        rec_slot = st.container()
         
-        if robots < rec_robots:
-            st.warning(f"⚠️ 数量不足：建议 **{rec_robots} 台** 以实现 {target_days} 天清洗周期。")
-            st.caption(f"影响：当前配置需 **{current_days} 天** 完成清洗。周期过长可能错过最佳天气窗口。")
-        elif robots > rec_robots:
-            st.success(f"✅ 配置优良：超过推荐值 ({rec_robots} 台)。")
-            st.caption(f"影响：清洗迅速 (约 **{current_days} 天**)。允许频繁维护，更好地管理风险。")
-        else:
-            st.info(f"✅ 推荐数量 ({rec_robots} 台)。周期：约 {current_days} 天。")
+        st.markdown("## 调度策略")
+        strategy = st.radio("调度策略", ["贪心规则", "全局最优", "逐小时", "分区"], horizontal=True, label_visibility="collapsed")
+        st.caption("贪心规则：损失超过成本即触发清洗。全局最优：结合未来降雨，求整个预测期净收益最大的清洗窗口。"
+                   "逐小时：只在风速安全、无降雨的作业小时推进清洗，大风天的可用时段不再整天放弃。"
+                   "分区：按阵列分区跟踪积灰（外侧行、道路两侧积灰更快），机器人每天优先清洗最脏的分区。")
         
         st.markdown("## 经济参数 (巴西雷亚尔)")
         p_sell = st.number_input("售电电价 (R$/kWh)", value=float(db['sell_price']), format="%.3f", label_visibility="collapsed")
@@ -425,21 +290,73 @@ with st.sidebar:
         
         st.markdown("---")
         st.button("📖 技术原理", use_container_width=True, on_click=technical_principles_dialog)
+        debug = st.toggle("🔧 性能调试", help="在页面底部显示本次运行各阶段耗时、缓存命中与数据来源")
+        # 每个会话一份度量记录器：开关与清零只影响本会话，不动进程级记录器
+        session_metrics = bind_metrics(st.session_state.setdefault("metrics", Metrics()))
+        session_metrics.enable(debug)
+        if debug:
+            session_metrics.reset()
+        
+        LAT, LON = cell_center(float(db['lat']), float(db['lon']))   # 同一天气网格的电站共用预报与缓存
+        
+        with rec_slot:
+            robot_capacity_per_day = ROBOT_EFFICIENCY_PANELS_PER_HOUR * ROBOT_DAILY_WORK_HOURS * ROBOT_AVAILABILITY_RATE
+            current_days = math.ceil(p_count / (robots * robot_capacity_per_day)) if (robots * robot_capacity_per_day) > 0 else 999
+            
+            # 在 1–200 台范围内扫描预测期净收益，取达到最佳清洗收益 95% 的最小数量
+            rec_robots, curve = recommend_for(
+                fetch_weather(LAT, LON)[0], {"panels": p_count, "capacity": cap_mw, **({"model": model} if model else {})},
+                {"sell": p_sell, "water": p_water, "elec": p_elec}
+            )
+            gain = curve['net'][:, 0, 0] - curve['baseline'][0]
+            best_gain = gain.max()
+            cur_gain = gain[min(robots, len(gain)) - 1] if robots > 0 else 0.0
+            share = cur_gain / best_gain * 100 if best_gain > 0 else 100.0
+            
+            if best_gain <= 0:
+                st.info(f"预测期内清洗无净收益，机器人数量不影响本期计划。周期：约 {current_days} 天。")
+            elif robots < rec_robots:
+                st.warning(f"⚠️ 数量不足：建议 **{rec_robots} 台**，可获得 95% 以上的最佳清洗收益。")
+                st.caption(f"影响：当前配置仅获得 **{share:.0f}%** 的清洗收益，需 **{current_days} 天** 完成清洗。")
+            elif robots > rec_robots:
+                st.success(f"✅ 配置优良：超过推荐值 ({rec_robots} 台)。")
+                st.caption(f"影响：清洗迅速 (约 **{current_days} 天**)，获得 {share:.0f}% 的清洗收益；继续增加机器人收益提升有限。")
+            else:
+                st.info(f"✅ 推荐数量 ({rec_robots} 台)。周期：约 {current_days} 天。")
         
-        LAT, LON = float(db['lat']), float(db['lon'])
         run = True
     else:
         run = False
 
 if run:
-    weather_data, source = fetch_weather(LAT, LON)
+    hourly = None
+    if strategy == "逐小时":
+        (weather_data, hourly), source = fetch_weather_hourly(LAT, LON)
+    else:
+        weather_data, source = fetch_weather(LAT, LON)
     cfg = {"panels": p_count, "capacity": cap_mw, "robots": robots}
+    if model:
+        cfg['model'] = model
     econ = {"sell": p_sell, "water": p_water, "elec": p_elec}
     
-    df, wins, stats = run_engine(weather_data, cfg, econ)
+    # 规划输入不变（如只切换表格筛选）时复用引擎结果与派生的图表、表格
+    memo = default_memo()
+    engine_mode = {"全局最优": "optimal", "逐小时": "hourly", "分区": "zones"}.get(strategy, "greedy")
+    with metrics().stage("app.plan"):
+        plan_key, (df, wins, stats) = run_engine_cached(weather_data, cfg, econ, mode=engine_mode, memo=memo, hourly=hourly)
     
     st.title(f"🇧 {station}")
     st.caption(f"数据来源：{source} | 更新时间：{datetime.datetime.now().strftime('%H:%M')}")
+    if hourly is not None:
+        st.caption(
+            f"逐小时调度：每次清洗需 {stats['robot_hours']} 个作业小时 | 预测期内可作业 {stats['workable_hours']} 小时，"
+            f"其中 {stats['recovered_hours']} 小时位于按日规则整天停机的大风日"
+        )
+    if engine_mode == "zones":
+        st.caption(
+            f"分区调度：{stats['zones']} 个分区，预测期内共清洗 {stats['zone_cleanings']} 区次 | "
+            f"全场清洗一遍约需 {stats['sweep_days']} 天"
+        )
     st.markdown("---")
     
     c0, c1, c2, c3, c4 = st.columns(5)
@@ -494,169 +411,136 @@ if run:
     st.markdown("<br>", unsafe_allow_html=True)
     
     st.subheader("天气预报与风险")
-    rows = (len(weather_data) + 6) // 7
-    for r in range(rows):
-        cols = st.columns(7)
-        for c in range(7):
-            idx = r * 7 + c
-            if idx < len(weather_data):
-                d = weather_data[idx]
-                badge = ""
-                if d['wind'] > WIND_SAFETY_LIMIT: badge = "<div class='risk-badge risk-wind'>大风</div>"
-                elif d['humidity'] > MUD_RISK_HUMIDITY and d['code'] in [2,3]: badge = "<div class='risk-badge risk-mud'>泥泞</div>"
-                
-                with cols[c]:
-                    st.markdown(f"""
-                    <div class="weather-card fade-in-up" style="animation-delay: {idx*0.05}s">
-                        <div class="w-date">{fmt_date_short(d['date'])}</div>
-                        <div class="w-icon">{d['icon']}</div>
-                        <div class="w-temp">{d['temp']}°C</div>
-                        <div class="w-desc">{d['desc'].split('(')[0]}</div>
-                        <div class="w-stats">🌧️ {d['rain']}mm | ☢️ {d['radiation_kwh']} kWh</div>
-                        {badge}
-                    </div>
-                    """, unsafe_allow_html=True)
+    st.markdown(weather_grid_html(weather_data), unsafe_allow_html=True)
     
     st.markdown("<br>", unsafe_allow_html=True)
     
     # 📈 图表：严格按照您的要求修改
     st.subheader("策略可视化")
     
-    # --- 图一：辐射量 & 净现金流 (重新编辑，确保坐标轴格式正确) ---
-    fig1 = go.Figure()
-    
-    # 1. 辐射量 (左轴)
-    fig1.add_trace(go.Scatter(
-        x=df['date'], 
-        y=df['radiation_kwh'], 
-        name='辐射量 (kWh/m²)', 
-        line=dict(color='#ff9500', width=3),
-        yaxis='y1'
-    ))
-    
-    # 2. 净现金流 (右轴)
-    fig1.add_trace(go.Bar(
-        x=df['date'], 
-        y=df['net'], 
-        name='净现金流 (R$)', 
-        marker_color=df['net'].apply(lambda x: '#34c759' if x>0 else '#ff3b30'), 
-        opacity=0.5,
-        yaxis='y2'
-    ))
-    
-    # 清洗背景
-    for w in wins:
-        fig1.add_vrect(x0=df['date'].iloc[w['start']], x1=df['date'].iloc[w['end']], fillcolor="#0071e3", opacity=0.1, line_width=0)
-    
-    # 关键：重新定义布局，确保双轴彻底分离
-    fig1.update_layout(
-        height=400,
-        hovermode='x unified',
-        legend=dict(orientation="h", y=1.05, x=0.5, xanchor='center', font=dict(size=11)),
-        # 左轴配置
-        yaxis=dict(
-            title="辐射量 (kWh/m²)", 
-            side='left', 
-            gridcolor='#f0f0f0', 
-            tickfont=dict(color="#ff9500", size=11),
-            title_font=dict(color="#ff9500", size=12),
-            showgrid=True,
-            zeroline=False
-        ),
-        # 右轴配置 - 关键修改：独立域，右侧，无网格
-        yaxis2=dict(
-            title="净现金流 (R$)", 
-            overlaying='y', 
-            side='right', 
-            tickfont=dict(color="#34c759", size=11),
-            title_font=dict(color="#34c759", size=12),
-            showgrid=False, # 右侧不显示网格，避免混乱
-            zeroline=False,
-            anchor='x' # 确保锚定在X轴上
-        ),
-        xaxis=dict(
-            showgrid=False,
-            tickfont=dict(size=10)
-        ),
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        margin=dict(l=70, r=70, t=50, b=40), 
-        font=dict(family="Noto Sans SC", size=11),
-        barmode='overlay'
-    )
-    
-    st.plotly_chart(fig1, use_container_width=True, key="chart1")
-    
-    # --- 图二：积灰度 (纵轴间隔调整为0.5) ---
-    fig2 = go.Figure()
-    
-    fig2.add_trace(go.Scatter(
-        x=df['date'], 
-        y=df['dust'], 
-        name='积灰度 (%)', 
-        line=dict(color='#d70000', width=4), 
-        mode='lines+markers', 
-        marker=dict(size=6, color='#d70000')
-    ))
-    
-    for w in wins:
-        fig2.add_vrect(x0=df['date'].iloc[w['start']], x1=df['date'].iloc[w['end']], fillcolor="#0071e3", opacity=0.1, line_width=0)
-    
-    # 计算动态范围，但重点是设置 tickinterval
-    max_dust = df['dust'].max()
-    y_max = max(5, math.ceil(max_dust * 1.2))
-    
-    fig2.update_layout(
-        height=300, # 稍微增加高度以容纳更多刻度
-        hovermode='x unified',
-        showlegend=False, 
-        yaxis=dict(
-            title="积灰度 (%)", 
-            side='left', 
-            gridcolor='#f0f0f0', 
-            range=[0, y_max],
-            tickfont=dict(color="#d70000", size=11), 
-            title_font=dict(color="#d70000", size=12),
-            # 关键修改：强制刻度间隔为 0.5
-            dtick=0.5, 
-            showgrid=True,
-            zeroline=False
-        ),
-        xaxis=dict(
-            showgrid=False,
-            tickfont=dict(size=10)
-        ),
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        margin=dict(l=70, r=20, t=10, b=40), 
-        font=dict(family="Noto Sans SC", size=11),
-    )
-    
-    st.plotly_chart(fig2, use_container_width=True, key="chart2")
+    with metrics().stage("app.figures"):
+        fig1, fig2 = memo.get((plan_key, "charts"), lambda: build_charts(df, wins))
+        st.plotly_chart(fig1, use_container_width=True, key="chart1")
+        st.plotly_chart(fig2, use_container_width=True, key="chart2")
+    
+    # 清洗时机：每个开工日 × 清洗周期相对不清洗的净收益（一次线性计算，不逐日重跑引擎）
+    st.markdown("**清洗时机热力图**")
+    with metrics().stage("app.opportunity"):
+        curve, fig5 = memo.get((plan_key, "opportunity"), lambda: build_opportunity(weather_data, cfg, econ))
+        st.plotly_chart(fig5, use_container_width=True, key="chart_opportunity")
+    if curve['best'] is not None:
+        gain = curve['gain'][curve['current'], curve['best']]
+        st.caption(f"当前配置（每次 {curve['duration'][curve['current']]} 天）只清洗一次时，最佳开工日为 "
+                   f"{curve['date'][curve['best']]}，较不清洗净增 R$ {gain:,.0f}。空白格为大风日或窗口超出预测期。")
+    else:
+        st.caption("当前配置的清洗周期超出预测期，无法在本期内完成一次清洗。")
+    
+    # 集合预报：降雨时间的不确定性对清洗决策影响最大
+    if st.toggle("🎲 集合预报分析（降雨不确定性）"):
+        members, ens_source = ensemble_for(LAT, LON, weather_data)
+        ens = run_ensemble(members, cfg, econ)
+        e1, e2, e3 = st.columns(3)
+        for col, label, val in ((e1, "P10 净收益", ens['net_p10']), (e2, "P50 净收益", ens['net_p50']), (e3, "P90 净收益", ens['net_p90'])):
+            with col:
+                st.markdown(f"""
+                <div class="metric-container">
+                    <div class="metric-label">{label}</div>
+                    <div class="metric-value">R$ {val:,.0f}</div>
+                    <div class="metric-sub neutral">{ens['members']} 个成员</div>
+                </div>
+                """, unsafe_allow_html=True)
+        
+        fig3 = go.Figure(go.Bar(
+            x=[str(d) for d in ens['date']], y=ens['p_start'] * 100,
+            marker_color='#0071e3', name='开工概率 (%)'
+        ))
+        fig3.update_layout(
+            height=240, yaxis=dict(title="清洗开工概率 (%)", range=[0, 100], gridcolor='#f0f0f0'),
+            xaxis=dict(showgrid=False, tickfont=dict(size=10)),
+            plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+            margin=dict(l=70, r=20, t=10, b=40), font=dict(family="Noto Sans SC", size=11)
+        )
+        st.plotly_chart(fig3, use_container_width=True, key="chart_ensemble")
+        st.caption(f"集合来源：{ens_source} | 平均清洗次数：{ens['count_mean']:.1f}")
+    
+    # 资本开支规划：售电价 × 水电价格下所需的最小机器人数量（200 档扫描，开启后才计算）
+    if st.toggle("📐 机器人规模与电价敏感性"):
+        sells = np.round(np.linspace(p_sell * 0.6, p_sell * 1.4, 20), 3)
+        factors = np.round(np.linspace(0.5, 2.0, 20), 2)
+        surface = sweep_for(weather_data, cfg, np.arange(1, 201), sells, p_water * factors, p_elec * factors)
+        need, _ = min_robots(surface)
+        fig4 = go.Figure(go.Heatmap(
+            x=sells, y=factors, z=need.T, colorscale="Blues",
+            colorbar=dict(title="台"), hovertemplate="售电价 %{x}<br>水电价格 ×%{y}<br>最少 %{z} 台<extra></extra>"
+        ))
+        fig4.update_layout(
+            height=320, xaxis=dict(title="售电电价 (R$/kWh)"), yaxis=dict(title="水/电成本倍数"),
+            plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+            margin=dict(l=70, r=20, t=10, b=40), font=dict(family="Noto Sans SC", size=11)
+        )
+        st.plotly_chart(fig4, use_container_width=True, key="chart_sweep")
+        st.caption("每格为达到该价格下最佳清洗收益 95% 所需的最少机器人数量（1–200 台 × 20 × 20 网格批量计算）。")
     
     # 表格
     st.subheader("执行计划")
     mode = st.radio("筛选", ["全部", "仅清洗", "仅风险"], horizontal=True)
-    view = df.copy()
-    view['Date'] = view['date'].apply(fmt_date_full)
-    
-    if mode == "仅清洗": view = view[view['action'] == '清洗']
-    elif mode == "仅风险": view = view[(view['hot_spot']) | (view['safety'])]
-    
-    cols_disp = ["Date", "radiation_kwh", "dust", "loss", "action", "status", "net"]
-    rename_map = {"radiation_kwh": "辐射 (kWh)", "dust": "积灰%", "loss": "损耗%", "action": "动作", "status": "状态", "net": "净收益 (R$)"}
-    
-    def style_status(val):
-        if "风险" in str(val): return "color:white; background-color:#ff3b30;"
-        if "清洗" in str(val): return "color:white; background-color:#0071e3;"
-        if "高效" in str(val): return "color:#34c759; font-weight:bold;"
-        return ""
-    
-    st.dataframe(
-        view[cols_disp].rename(columns=rename_map).style.map(style_status, subset=['状态'])
-        .format({"辐射 (kWh)":"{:.2f}", "积灰%":"{:.1f}%", "损耗%":"{:.1f}%", "净收益 (R$)":"R$ {:,.0f}"}),
-        use_container_width=True, height=300
-    )
+    with metrics().stage("app.table"):
+        view = memo.get((plan_key, "table"), lambda: build_table(df))
+        
+        if mode == "仅清洗": view = view[view['action'] == '清洗']
+        elif mode == "仅风险": view = view[(view['hot_spot']) | (view['safety'])]
+        
+        cols_disp = ["Date", "radiation_kwh", "dust", "loss", "action", "status", "net"]
+        rename_map = {"radiation_kwh": "辐射 (kWh)", "dust": "积灰%", "loss": "损耗%", "action": "动作", "status": "状态", "net": "净收益 (R$)"}
+        
+        def style_status(val):
+            if "风险" in str(val): return "color:white; background-color:#ff3b30;"
+            if "清洗" in str(val): return "color:white; background-color:#0071e3;"
+            if "高效" in str(val): return "color:#34c759; font-weight:bold;"
+            return ""
+        
+        st.dataframe(
+            view[cols_disp].rename(columns=rename_map).style.map(style_status, subset=['状态'])
+            .format({"辐射 (kWh)":"{:.2f}", "积灰%":"{:.1f}%", "损耗%":"{:.1f}%", "净收益 (R$)":"R$ {:,.0f}"}),
+            use_container_width=True, height=300
+        )
+        # 供 BI 使用的完整计划（不受筛选影响）；Parquet 编码与 DataFrame 一样按规划输入复用
+        st.download_button(
+            "导出 Parquet", memo.get((plan_key, "parquet"), lambda: frame_bytes(df)),
+            file_name=f"plan_{station.split(' ')[0]}_{datetime.date.today().isoformat()}.parquet",
+            mime="application/vnd.apache.parquet"
+        )
+
+    # 性能调试：本次运行各阶段耗时与缓存命中（计数在侧栏开关处清零）
+    if debug:
+        snap = metrics().snapshot()
+        counters = snap['counters']
+        with st.expander("🔧 性能调试", expanded=True):
+            lookups, misses = counters.get("app.fetch_cache.lookup", 0), counters.get("app.fetch_cache.miss", 0)
+            memo_stats = memo.stats()
+            d1, d2, d3 = st.columns(3)
+            d1.metric("页面天气缓存", f"{lookups - misses} 命中 / {misses} 未命中")
+            d2.metric("磁盘缓存", f"{counters.get('weather.cache.fresh', 0) + counters.get('weather.cache.stale', 0)} 命中 / "
+                               f"{counters.get('weather.cache.miss', 0)} 未命中")
+            d3.metric("引擎记忆化", f"{memo_stats['hit_rate']:.0%} 命中率", f"{memo_stats['size']} 条")
+            used = [label for key, label in (("weather.source.api", "Open-Meteo API"), ("weather.source.expired_cache", "过期缓存"),
+                                             ("weather.source.simulation", "模拟数据")) if counters.get(key)]
+            st.caption(f"本次运行新取得的天气来自：{'、'.join(used) or '缓存（未请求 API）'}"
+                       + (f" | API 请求失败 {counters['weather.fetch.error']} 次" if counters.get("weather.fetch.error") else ""))
+            if prewarmer is not None:
+                w = prewarmer.stats
+                st.caption(
+                    f"后台预热：{'运行中' if prewarmer.running() else '已停止'} | 已完成 {w['cycles']} 轮，刷新 {w['refreshed']} 个网格、"
+                    f"预算 {w['plans']} 个计划" + (f" | 最近错误：{w['last_error'][:80]}" if w['last_error'] else "")
+                )
+            st.dataframe(
+                pd.DataFrame([{"阶段": name, "次数": s['count'], "总耗时 (ms)": s['total_ms'], "最长 (ms)": s['max_ms']}
+                              for name, s in snap['stages'].items()]),
+                use_container_width=True, hide_index=True
+            )
+            j1, j2 = st.columns(2)
+            j1.download_button("导出 JSON", metrics().to_json(), file_name="metrics.json", mime="application/json")
+            j2.download_button("导出 Prometheus", metrics().to_prometheus(), file_name="metrics.prom", mime="text/plain")
 
 else:
     st.markdown("""
@@ -665,6 +549,39 @@ else:
         <p>系统将自动计算最优清洗策略。</p>
     </div>
     """, unsafe_allow_html=True)
+    
+    # 全站批量规划：晨报所需的全部电站一次性计算
+    st.subheader("全站批量规划")
+    extra_file = st.file_uploader("附加电站清单 (CSV，可选)", type="csv")
+    st.caption("列：name, lat, lon, sell_price, robot_elec_price, water_price；可选 panels, power, robots。")
+    
+    if st.button("🚀 规划全部电站"):
+        try:
+            extra = None if extra_file is None else parse_stations_csv(
+                io.TextIOWrapper(extra_file, encoding="utf-8-sig", newline=""), extra_file.name
+            )
+            stations = fleet_stations(extra)
+        except ValueError as e:
+            st.error(f"附加电站清单有误：{e}")
+            st.stop()
+        with st.spinner("正在批量获取天气并并行计算..."):
+            fleet = plan_fleet(stations)
+        
+        fleet_map = {
+            "station": "电站", "source": "数据来源", "capacity": "装机 (MW)", "robots": "机器人",
+            "duration": "清洗周期 (天)", "revenue": "总收入 (R$)", "cost": "清洗成本 (R$)",
+            "profit": "净利润 (R$)", "margin": "利润率%", "carbon": "碳减排 (吨)",
+            "windows": "清洗次数", "next_clean": "下次清洗", "max_dust": "最大积灰%",
+            "hot_spot_days": "热斑天数", "safety_days": "大风天数"
+        }
+        fleet['next_clean'] = fleet['next_clean'].apply(fmt_date_full)
+        st.dataframe(
+            fleet.rename(columns=fleet_map).style.format({
+                "装机 (MW)": "{:.2f}", "总收入 (R$)": "R$ {:,.0f}", "清洗成本 (R$)": "R$ {:,.0f}",
+                "净利润 (R$)": "R$ {:,.0f}", "利润率%": "{:.1f}%", "碳减排 (吨)": "{:,.2f}", "最大积灰%": "{:.1f}%"
+            }),
+            use_container_width=True, hide_index=True
+        )
 
 st.markdown("---")
 st.caption("© 2026 巴西光伏智能运维 | Designed by Jerrick Tan_N184")
@@ -0,0 +1 @@
+# 性能基准：python -m benchmarks.<模块名>
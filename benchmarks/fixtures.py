@@ -0,0 +1,97 @@
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from planner.constants import STATION_DB
+from planner.weather import DAILY_VARS, HOURLY_VARS, request_forecast
+
+# ================= 📼 Open-Meteo 离线样本 =================
+# 用法：python -m benchmarks.fixtures [--record | --synthetic] [--days 16]
+# --record 对 STATION_DB 各电站请求一次真实预报并原样保存 JSON；
+# 无网络时用 --synthetic 生成结构相同（字段、单位、时间格式）的可复现样本。
+# 基准测试只读取 fixtures/ 下的文件，不访问网络。
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+FIXTURE_DAYS = 16
+SYNTHETIC_START = "2025-07-01"
+
+def fixture_path(name):
+    return FIXTURE_DIR / f"{name.split()[0].lower()}.json"
+
+def synthetic_forecast(lat, lon, days=FIXTURE_DAYS, seed=0):
+    # 亚马逊午后对流雨：降雨集中在 13–19 时，风速午后达峰，辐射按日变化曲线并随云量衰减
+    rng = np.random.default_rng(seed)
+    n = days * 24
+    hour = np.arange(n) % 24
+    stamps = np.datetime64(SYNTHETIC_START, "h") + np.arange(n)
+    storm = np.repeat(rng.random(days) < 0.55, 24) & (hour >= 13) & (hour < 20)
+    rain = np.where(storm & (rng.random(n) < 0.5), rng.exponential(1.5, n), 0.0).round(1)
+    cloud = np.clip(np.repeat(rng.normal(0.35, 0.15, days), 24) + 0.4 * (rain > 0), 0, 0.9)
+    sun = np.maximum(0.0, np.sin(np.pi * (hour - 6) / 12))
+    radiation = (950 * sun * (1 - cloud)).round(0)
+    wind_kmh = np.maximum(0, (8 + 10 * np.maximum(0, np.sin(np.pi * (hour - 9) / 12))) * np.repeat(rng.uniform(0.6, 2.4, days), 24)
+                          + rng.normal(0, 2, n)).round(1)
+    temp = (26 + 6 * sun * (1 - cloud) + rng.normal(0, 0.5, n)).round(1)
+    hum = np.clip(95 - 2.5 * (temp - 24) + 10 * (rain > 0), 40, 100).round(0)
+    code = np.where(rain > 2.5, 63, np.where(rain > 0, 61, np.where(cloud > 0.5, 3, np.where(cloud > 0.25, 2, 0))))
+
+    daily = lambda x, f: f(x.reshape(days, 24), axis=1)
+    dates = np.datetime_as_string(stamps[::24], unit="D")
+    return {
+        "latitude": lat, "longitude": lon, "generationtime_ms": 0.5,
+        "utc_offset_seconds": -14400, "timezone": "America/Manaus", "timezone_abbreviation": "GMT-4", "elevation": 40.0,
+        "hourly_units": {"time": "iso8601", "weathercode": "wmo code", "temperature_2m": "°C", "relativehumidity_2m": "%",
+                         "windspeed_10m": "km/h", "rain": "mm", "shortwave_radiation": "W/m²"},
+        "hourly": {
+            "time": np.datetime_as_string(stamps, unit="m").tolist(),
+            "weathercode": code.tolist(), "temperature_2m": temp.tolist(), "relativehumidity_2m": hum.astype(int).tolist(),
+            "windspeed_10m": wind_kmh.tolist(), "rain": rain.tolist(), "shortwave_radiation": radiation.tolist()
+        },
+        "daily_units": {"time": "iso8601", "shortwave_radiation_sum": "MJ/m²", "precipitation_sum": "mm",
+                        "windspeed_10m_max": "km/h", "temperature_2m_max": "°C"},
+        "daily": {
+            "time": dates.tolist(),
+            "shortwave_radiation_sum": (daily(radiation, np.sum) * 0.0036).round(2).tolist(),
+            "precipitation_sum": daily(rain, np.sum).round(1).tolist(),
+            "windspeed_10m_max": daily(wind_kmh, np.max).tolist(),
+            "temperature_2m_max": daily(temp, np.max).tolist()
+        }
+    }
+
+def write_fixtures(days=FIXTURE_DAYS, record=False):
+    FIXTURE_DIR.mkdir(exist_ok=True)
+    paths = []
+    for seed, (name, db) in enumerate((n, db) for n, db in STATION_DB.items() if db):
+        data = request_forecast(db['lat'], db['lon'], days) if record else synthetic_forecast(db['lat'], db['lon'], days, seed)
+        path = fixture_path(name)
+        path.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+def load_fixtures():
+    # {电站名: Open-Meteo JSON}，顺序与 STATION_DB 一致
+    out = {}
+    for name, db in STATION_DB.items():
+        if not db:
+            continue
+        path = fixture_path(name)
+        if not path.exists():
+            raise FileNotFoundError(f"{path} 不存在，请先运行 python -m benchmarks.fixtures")
+        out[name] = json.loads(path.read_text(encoding="utf-8"))
+    return out
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks.fixtures")
+    src = p.add_mutually_exclusive_group()
+    src.add_argument("--record", action="store_true", help="请求真实 Open-Meteo 预报并保存")
+    src.add_argument("--synthetic", action="store_true", help="生成可复现的模拟样本（默认）")
+    p.add_argument("--days", type=int, default=FIXTURE_DAYS)
+    args = p.parse_args(argv)
+
+    print(f"请求字段 hourly={HOURLY_VARS} daily={DAILY_VARS}")
+    for path in write_fixtures(args.days, record=args.record):
+        print(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import sys
+
+from planner.compact import compact_plan, plan_nbytes, to_frame
+from planner.engine import plan_columns, run_engine_arrays
+from planner.synthetic import station_frame, synthetic_weather
+
+# ================= 🧮 计划内存占用 =================
+# 用法：python -m benchmarks.memory [--years 10]
+# 比较每电站年的计划内存：逐日字典列表（旧版 run_engine 的中间形式）、展示 DataFrame、
+# float64 计划数组与紧凑格式（及其分类列 DataFrame）。
+
+CFG = {"panels": 40000, "capacity": 28.0, "robots": 28}
+ECON = {"sell": 0.35, "water": 2.0, "elec": 0.25}
+
+def deep_size(obj, seen=None):
+    # 递归统计字典 / 列表及其元素（共享对象只计一次）
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(x, seen) for x in obj)
+    return size
+
+def measure(years):
+    import pandas as pd
+
+    w = station_frame(synthetic_weather([(-3.60, -59.12)], 365 * years, start="2015-01-01", seed=0), 0)
+    plan, _, _ = run_engine_arrays(w['rain'], w['wind'], w['radiation_mj'], w['humidity'], CFG, ECON)
+    cols = plan_columns(w, plan)
+    rows = [dict(zip(cols, vals)) for vals in zip(*cols.values())]
+    compact = compact_plan(w, plan)
+    return {
+        "逐日字典列表": deep_size(rows),
+        "展示 DataFrame": int(pd.DataFrame(rows).memory_usage(deep=True).sum()),
+        "float64 计划数组": sum(v.nbytes for v in plan.values()),
+        "紧凑格式": plan_nbytes(compact),
+        "紧凑格式 DataFrame": int(to_frame(compact).memory_usage(deep=True).sum()),
+    }
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks.memory")
+    p.add_argument("--years", type=int, default=10)
+    args = p.parse_args(argv)
+
+    sizes = measure(args.years)
+    base = sizes["逐日字典列表"]
+    print(f"{'表示':<18}{'KB/电站年':>12}{'相对字典列表':>14}")
+    for name, size in sizes.items():
+        print(f"{name:<20}{size / args.years / 1024:>12.1f}{base / size:>14.1f}x")
+
+if __name__ == "__main__":
+    main()
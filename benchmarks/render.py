@@ -0,0 +1,124 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from planner.engine import run_engine
+from planner.render import chart_specs, weather_grid_html
+from planner.weather import simulate_weather
+
+# ================= 🎨 页面渲染耗时 =================
+# 用法：python -m benchmarks.render [--days 14 90] [--repeat 20] [--apptest] [--baseline-app 旧版app.py]
+# 1) 图表：旧路径（逐窗口 add_vrect、逐行 apply 着色，每次重跑重建）与新路径（整列生成规格、按计划哈希缓存）
+#    分别计时，包含 streamlit 发送前的 to_dict + to_json 序列化；
+# 2) --apptest：用 streamlit AppTest 测量“切换表格筛选 -> 脚本跑完”的端到端耗时，
+#    可用 --baseline-app 指定旧版 app.py（如 git show <rev>:app.py > /tmp/app_old.py）对比。
+
+CFG = {"panels": 40000, "capacity": 28.0, "robots": 6}
+ECON = {"sell": 0.35, "water": 2.0, "elec": 0.25}
+
+def legacy_charts(df, wins):
+    # 旧版页面的构图方式，仅用于对比
+    import plotly.graph_objects as go
+
+    fig1 = go.Figure()
+    fig1.add_trace(go.Scatter(x=df['date'], y=df['radiation_kwh'], name='辐射量 (kWh/m²)',
+                              line=dict(color='#ff9500', width=3), yaxis='y1'))
+    fig1.add_trace(go.Bar(x=df['date'], y=df['net'], name='净现金流 (R$)',
+                          marker_color=df['net'].apply(lambda x: '#34c759' if x > 0 else '#ff3b30'),
+                          opacity=0.5, yaxis='y2'))
+    for w in wins:
+        fig1.add_vrect(x0=df['date'].iloc[w['start']], x1=df['date'].iloc[w['end']], fillcolor="#0071e3", opacity=0.1, line_width=0)
+    fig1.update_layout(height=400, hovermode='x unified', barmode='overlay',
+                       yaxis2=dict(title="净现金流 (R$)", overlaying='y', side='right', anchor='x'))
+    fig2 = go.Figure()
+    fig2.add_trace(go.Scatter(x=df['date'], y=df['dust'], name='积灰度 (%)', mode='lines+markers'))
+    for w in wins:
+        fig2.add_vrect(x0=df['date'].iloc[w['start']], x1=df['date'].iloc[w['end']], fillcolor="#0071e3", opacity=0.1, line_width=0)
+    fig2.update_layout(height=300, hovermode='x unified', showlegend=False)
+    return fig1, fig2
+
+def new_charts(df, wins):
+    import plotly.graph_objects as go
+
+    return tuple(go.Figure(spec) for spec in chart_specs(df, wins))
+
+def _send(figs):
+    # streamlit.plotly_chart 对 Figure 的处理：to_dict 后 to_json
+    import plotly.io
+
+    return [plotly.io.to_json(f.to_dict(), validate=False) for f in figs]
+
+def _timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best * 1e3
+
+def _same_figures(old, new):
+    for a, b in zip(old, new):
+        a, b = a.to_dict(), b.to_dict()
+        if len(a['data']) != len(b['data']) or a['layout'].get('shapes', []) != b['layout'].get('shapes', []):
+            return False
+        for ta, tb in zip(a['data'], b['data']):
+            if list(ta['x']) != list(tb['x']) or list(ta['y']) != list(tb['y']):
+                return False
+            if 'marker' in ta and list(ta['marker'].get('color', [])) != list(tb['marker'].get('color', [])):
+                return False
+    return True
+
+def bench_charts(days, repeat):
+    weather = simulate_weather(days, seed=days)
+    df, wins, _ = run_engine(weather, CFG, ECON)
+    cached = new_charts(df, wins)
+    return {
+        "days": days, "windows": len(wins),
+        "same": _same_figures(legacy_charts(df, wins), cached),
+        "legacy_ms": _timed(lambda: _send(legacy_charts(df, wins)), repeat),
+        "new_ms": _timed(lambda: _send(new_charts(df, wins)), repeat),
+        "cached_ms": _timed(lambda: _send(cached), repeat),
+        "grid_ms": _timed(lambda: weather_grid_html(weather), repeat)
+    }
+
+def bench_apptest(app, repeat):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(Path(app).resolve()), default_timeout=120)
+    at.run()
+    at.selectbox[0].select("AUT (Autazes)").run()
+    times = []
+    for i in range(repeat):
+        radio = [r for r in at.radio if r.label == "筛选"][0]
+        t = time.perf_counter()
+        radio.set_value(("仅清洗", "全部")[i % 2]).run()
+        times.append(time.perf_counter() - t)
+    return float(np.median(times) * 1e3)
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks.render")
+    p.add_argument("--days", type=int, nargs="+", default=[14, 90, 365])
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--apptest", action="store_true")
+    p.add_argument("--app", default=str(Path(__file__).resolve().parent.parent / "app.py"))
+    p.add_argument("--baseline-app")
+    args = p.parse_args(argv)
+
+    print(f"{'天数':>6}{'窗口':>6}{'一致':>6}{'旧路径ms':>11}{'新路径ms':>11}{'缓存命中ms':>12}{'预报网格ms':>12}")
+    for days in args.days:
+        r = bench_charts(days, args.repeat)
+        print(
+            f"{r['days']:>8}{r['windows']:>8}{str(r['same']):>8}{r['legacy_ms']:>13.2f}"
+            f"{r['new_ms']:>13.2f}{r['cached_ms']:>15.2f}{r['grid_ms']:>15.3f}"
+        )
+
+    if args.apptest:
+        runs = max(3, args.repeat // 4)
+        apps = [("当前", args.app)] + ([("基线", args.baseline_app)] if args.baseline_app else [])
+        for label, app in apps:
+            print(f"{label} {app}：切换筛选到脚本完成 中位数 {bench_apptest(app, runs):.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import time
+
+import numpy as np
+
+from planner.constants import STATION_DB
+from planner.engine import run_engine_arrays, run_engine_batch
+from planner.synthetic import synthetic_weather
+
+# ================= 🏋️ 合成天气压力测试 =================
+# 用法：python -m benchmarks.stress [--stations 1000] [--days 3650] [--chunk 250] [--seed 0] [--check 5]
+# 以 STATION_DB 坐标为中心随机撒点生成电站，按块生成合成天气并交给批量引擎，
+# 报告生成与计算的吞吐量（电站日 / 秒）；--check 抽查若干电站与逐站引擎结果一致。
+
+CFG = {"panels": 40000, "capacity": 28.0, "robots": 28}
+ECON = {"sell": 0.35, "water": 2.0, "elec": 0.25}
+
+def station_coords(n, seed):
+    rng = np.random.default_rng(seed)
+    sites = np.array([(db['lat'], db['lon']) for db in STATION_DB.values() if db])
+    return sites[rng.integers(0, len(sites), n)] + rng.uniform(-0.3, 0.3, (n, 2))
+
+def run(stations, days, chunk, seed, check):
+    coords = station_coords(stations, seed)
+    t_gen = t_engine = 0.0
+    net = []
+    bad = 0
+    for lo in range(0, stations, chunk):
+        t = time.perf_counter()
+        w = synthetic_weather(coords[lo:lo + chunk], days, start="2015-01-01", seed=seed + lo)
+        t_gen += time.perf_counter() - t
+        t = time.perf_counter()
+        _, stats = run_engine_batch(w['rain'], w['wind'], w['radiation_mj'], w['humidity'], CFG, ECON)
+        t_engine += time.perf_counter() - t
+        net.append(stats['net'])
+        for i in range(min(check, len(stats['net']))):
+            plan, _, _ = run_engine_arrays(w['rain'][i], w['wind'][i], w['radiation_mj'][i], w['humidity'][i], CFG, ECON)
+            bad += not np.isclose(plan['net'].sum(), stats['net'][i])
+    return {
+        "station_days": stations * days, "gen_s": t_gen, "engine_s": t_engine,
+        "net_mean": float(np.concatenate(net).mean()), "mismatch": bad
+    }
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks.stress")
+    p.add_argument("--stations", type=int, default=1000)
+    p.add_argument("--days", type=int, default=3650)
+    p.add_argument("--chunk", type=int, default=250, help="每块电站数（控制内存：块 × 天 × 8 字节 × 约 10 个数组）")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--check", type=int, default=5, help="每块抽查的电站数")
+    args = p.parse_args(argv)
+
+    r = run(args.stations, args.days, args.chunk, args.seed, args.check)
+    sd = r['station_days']
+    print(f"{args.stations} 电站 × {args.days} 天 = {sd:,} 电站日")
+    print(f"生成天气 {r['gen_s']:.2f} s（{sd / r['gen_s']:,.0f} 电站日/秒）")
+    print(f"批量引擎 {r['engine_s']:.2f} s（{sd / r['engine_s']:,.0f} 电站日/秒）")
+    print(f"平均净收益 R$ {r['net_mean']:,.0f} | 抽查不一致 {r['mismatch']} 个")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from planner.calibrate import calibrate_history
+from planner.engine import run_engine, run_engine_arrays, run_engine_batch
+from planner.fleet import FLEET_DEFAULTS, fleet_stations, station_setup
+from planner.hourly import hourly_day_index, run_engine_hourly, run_engine_hourly_batch
+from planner.opportunity import opportunity_curve
+from planner.pool import plan_pool
+from planner.synthetic import synthetic_weather
+from planner.weather import parse_forecast, parse_forecast_columns, parse_forecast_hourly
+from planner.zones import run_engine_zones, zone_layout
+
+from .fixtures import load_fixtures
+from .render import _send, new_charts
+
+# ================= ⏱️ 基准测试套件 =================
+# 用法：python -m benchmarks.suite [--only engine] [--repeat 7] [--threshold 0.3] [--update] [--json 结果.json]
+# 全部离线运行：天气来自 benchmarks/fixtures/ 下的 Open-Meteo 样本（见 benchmarks.fixtures）。
+# 每项取 repeat 次中的最快耗时，与 baselines.json 比较：慢于基线 (1 + threshold) 倍
+# 且绝对差超过 MIN_DELTA_MS 即判为退化，进程以状态码 1 退出；--update 用本次结果覆盖基线。
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines.json"
+DEFAULT_THRESHOLD = 0.3
+MIN_DELTA_MS = 0.2   # 亚毫秒级用例的计时抖动不算退化
+FLEET_SIZE = 300
+POOL_SIZE = 100
+CFG = {"panels": 40000, "capacity": 28.0, "robots": 28}
+ECON = {"sell": 0.35, "water": 2.0, "elec": 0.25}
+
+def _tiled(cols, days):
+    # 把 16 天样本首尾相接铺满长周期（日期列同样循环，引擎只按位置使用）
+    return {k: np.resize(np.asarray(v), days) for k, v in cols.items()}
+
+def _fleet(fixtures, size):
+    # 以 STATION_DB 为模板复制出 size 个电站，天气轮流取各电站样本
+    base = list(fleet_stations().values())
+    setups = [station_setup(dict(base[i % len(base)], robots=FLEET_DEFAULTS['robots'] + i % 7)) for i in range(size)]
+    cfg = {k: np.array([s[0][k] for s in setups]) for k in ("panels", "capacity", "robots")}
+    econ = {k: np.array([s[1][k] for s in setups]) for k in ("sell", "water", "elec")}
+    payloads = list(fixtures.values())
+    return [payloads[i % len(payloads)] for i in range(size)], cfg, econ
+
+def build_cases(fixtures):
+    # 用例名 -> 无参可调用对象；准备工作（解析、铺满、构造批量数组）不计时
+    payloads = list(fixtures.values())
+    daily = [parse_forecast_columns(d) for d in payloads]
+    hourly = [parse_forecast_hourly(d) for d in payloads]
+    cases = {
+        "parse.daily_records": lambda: [parse_forecast(d) for d in payloads],
+        "parse.daily_columns": lambda: [parse_forecast_columns(d) for d in payloads],
+        "parse.hourly": lambda: [parse_forecast_hourly(d) for d in payloads],
+    }
+    for days in (14, 365, 3650):
+        cols = _tiled(daily[0], days)
+        cases[f"engine.greedy.{days}d"] = lambda cols=cols: run_engine(cols, CFG, ECON)
+    cases["engine.optimal.365d"] = lambda cols=_tiled(daily[0], 365): run_engine(cols, CFG, ECON, mode="optimal")
+    cases["engine.hourly.14d"] = lambda: run_engine_hourly(hourly[0], CFG, ECON)
+    # 清洗时机：1–200 台机器人的全部周期 × 每个开工日
+    cases["opportunity.365d"] = lambda cols=_tiled(daily[0], 365): opportunity_curve(cols, CFG, ECON)
+    layout = zone_layout(CFG['panels'], rows=50, cols=100)
+    cases["engine.zones.5000x365d"] = lambda cols=_tiled(daily[0], 365): run_engine_zones(
+        cols['rain'], cols['wind'], cols['radiation_mj'], cols['humidity'], CFG, ECON, layout
+    )
+
+    fleet, cfg, econ = _fleet(fixtures, FLEET_SIZE)
+    fleet_daily = [daily[payloads.index(d)] for d in fleet]
+    fleet_hourly = [hourly[payloads.index(d)] for d in fleet]
+    stack = lambda frames, k: np.stack([np.asarray(f[k], dtype=float) for f in frames])
+    cases[f"fleet.greedy.{FLEET_SIZE}x14d"] = lambda: run_engine_batch(
+        stack(fleet_daily, 'rain'), stack(fleet_daily, 'wind'), stack(fleet_daily, 'radiation_mj'),
+        stack(fleet_daily, 'humidity'), cfg, econ
+    )
+    day_idx = np.stack([hourly_day_index(h) for h in fleet_hourly])
+    cases[f"fleet.hourly.{FLEET_SIZE}x14d"] = lambda: run_engine_hourly_batch(
+        day_idx, stack(fleet_hourly, 'hour').astype(np.int64), stack(fleet_hourly, 'rain'), stack(fleet_hourly, 'wind'),
+        stack(fleet_hourly, 'radiation_mj'), stack(fleet_hourly, 'humidity'), cfg, econ
+    )
+
+    # 共享机器人池：以 AUT 为中心 ±0.5° 内的电站连成一组（POOL_SIZE 站走启发式，前 3 站走精确求解）
+    rng = np.random.default_rng(0)
+    near = [(-3.6 + a, -59.12 + b) for a, b in rng.uniform(-0.5, 0.5, (POOL_SIZE, 2)).tolist()]
+    setups = [station_setup(dict(fleet_stations()['AUT (Autazes)'], robots=int(r))) for r in rng.integers(15, 35, POOL_SIZE)]
+    frames = [daily[i % len(daily)] for i in range(POOL_SIZE)]
+    cases["pool.exact.3x14d"] = lambda: plan_pool(frames[:3], setups[:3], near[:3], mode="exact")
+    cases[f"pool.heuristic.{POOL_SIZE}x14d"] = lambda: plan_pool(frames, setups, near, mode="heuristic")
+
+    # 校准：单站 10 年逐日发电记录（由引擎按默认参数生成，系统效率 0.8）
+    hist = dict(_tiled(daily[0], 3650), date=np.datetime_as_string(np.datetime64("2015-01-01") + np.arange(3650)))
+    plan, wins, _ = run_engine_arrays(hist['rain'], hist['wind'], hist['radiation_mj'], hist['humidity'], CFG, ECON)
+    prod = {
+        "date": hist['date'], "energy": plan['radiation_kwh'] * CFG['capacity'] * 1000 * 0.8 * (1 - plan['loss']),
+        "cleaned": np.isin(np.arange(3650), wins['end']), "complete": np.ones(3650, dtype=bool)
+    }
+    cases["calibrate.3650d"] = lambda: calibrate_history(hist, prod, CFG['capacity'])
+
+    coords = [(float(db['lat']), float(db['lon'])) for db in fleet_stations().values()] * 200
+    cases["synthetic.1000x365d"] = lambda: synthetic_weather(coords, 365, start="2025-01-01", seed=0)
+
+    for days in (14, 365):
+        df, wins, _ = run_engine(_tiled(daily[0], days), CFG, ECON)
+        cases[f"render.dataframe.{days}d"] = lambda cols=_tiled(daily[0], days): run_engine(cols, CFG, ECON)[0].to_dict("list")
+        cases[f"render.figures.{days}d"] = lambda df=df, wins=wins: _send(new_charts(df, wins))
+    return cases
+
+def measure(fn, repeat):
+    fn()   # 预热：首次调用的惰性导入、缓存分配不计入
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best * 1e3
+
+def load_baselines(path=BASELINE_PATH):
+    path = Path(path)
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {"cases": {}}
+
+def compare(results, baselines, threshold):
+    # 返回 [(用例, 本次ms, 基线ms 或 None, 比值 或 None, 是否退化)]
+    rows = []
+    for name, ms in results.items():
+        base = baselines['cases'].get(name, {}).get('ms')
+        ratio = ms / base if base else None
+        slow = base is not None and ms > base * (1 + threshold) and ms - base > MIN_DELTA_MS
+        rows.append((name, ms, base, ratio, slow))
+    return rows
+
+def run_suite(only=None, repeat=7):
+    cases = build_cases(load_fixtures())
+    return {
+        name: measure(fn, repeat) for name, fn in cases.items()
+        if not only or any(name.startswith(prefix) for prefix in only)
+    }
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    p.add_argument("--only", nargs="+", help="只运行名称以这些前缀开头的用例（如 parse engine.greedy）")
+    p.add_argument("--repeat", type=int, default=7)
+    p.add_argument("--threshold", type=float, help=f"允许的变慢比例，默认取基线文件中的值或 {DEFAULT_THRESHOLD}")
+    p.add_argument("--baseline", default=str(BASELINE_PATH))
+    p.add_argument("--update", action="store_true", help="用本次结果写入基线（保留未运行用例的旧值）")
+    p.add_argument("--json", help="另存本次结果")
+    args = p.parse_args(argv)
+
+    baselines = load_baselines(args.baseline)
+    threshold = args.threshold if args.threshold is not None else baselines.get('threshold', DEFAULT_THRESHOLD)
+    results = run_suite(args.only, args.repeat)
+    rows = compare(results, baselines, threshold)
+
+    print(f"{'用例':<28}{'本次ms':>10}{'基线ms':>10}{'比值':>8}  结论")
+    for name, ms, base, ratio, slow in rows:
+        verdict = "新增" if base is None else ("退化" if slow else "通过")
+        base_s = f"{base:>10.3f}" if base is not None else f"{'-':>10}"
+        ratio_s = f"{ratio:>8.2f}" if ratio is not None else f"{'-':>8}"
+        print(f"{name:<30}{ms:>10.3f}{base_s}{ratio_s}  {verdict}")
+
+    meta = {"python": platform.python_version(), "machine": platform.machine(), "numpy": np.__version__, "repeat": args.repeat}
+    if args.json:
+        Path(args.json).write_text(json.dumps({**meta, "cases": results}, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.update:
+        cases = dict(baselines['cases'])
+        cases.update({name: {"ms": round(ms, 4)} for name, ms in results.items()})
+        out = {**meta, "threshold": threshold, "cases": dict(sorted(cases.items()))}
+        Path(args.baseline).write_text(json.dumps(out, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"基线已更新：{args.baseline}")
+        return 0
+
+    slow = [r[0] for r in rows if r[4]]
+    if slow:
+        print(f"{len(slow)} 项慢于基线 {threshold:.0%} 以上：{', '.join(slow)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
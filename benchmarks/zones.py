@@ -0,0 +1,53 @@
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+from planner.constants import ROBOT_AVAILABILITY_RATE, ROBOT_DAILY_WORK_HOURS, ROBOT_EFFICIENCY_PANELS_PER_HOUR
+from planner.engine import run_engine_arrays
+from planner.zones import run_engine_zones, zone_layout
+
+from .optimizer import CFG, ECON, amazon_weather
+
+# ================= 🧩 分区引擎一致性 =================
+# 用法：python -m benchmarks.zones [--seeds 300] [--days 365]
+# 单个分区、一天清完（机器人数足够）时分区引擎应与整站引擎逐日一致：
+# 在随机天气上比较两者的积灰、损耗、收益、成本与清洗日，并报告默认布局下分区引擎的耗时。
+FIELDS = ("dust", "loss", "revenue", "cost", "clean", "reason")
+
+def single_zone_cfg(cfg=CFG):
+    per_robot = ROBOT_AVAILABILITY_RATE * ROBOT_EFFICIENCY_PANELS_PER_HOUR * ROBOT_DAILY_WORK_HOURS
+    return {**cfg, "robots": math.ceil(cfg['panels'] / per_robot)}
+
+def mismatches(days, seed, cfg, econ=ECON):
+    # 返回不一致的字段名（空列表即逐日相同）
+    w = amazon_weather(days, seed)
+    block, _, _ = run_engine_arrays(*w, cfg, econ)
+    zoned, _ = run_engine_zones(*w, cfg, econ, layout={"panels": [cfg['panels']], "soiling": [1.0]})
+    return [k for k in FIELDS if not np.array_equal(block[k], zoned[k])]
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks.zones")
+    p.add_argument("--seeds", type=int, default=300)
+    p.add_argument("--days", type=int, default=365)
+    args = p.parse_args(argv)
+
+    cfg = single_zone_cfg()
+    bad = {}
+    for seed in range(args.seeds):
+        for k in mismatches(args.days, seed, cfg):
+            bad.setdefault(k, []).append(seed)
+    print(f"单分区 vs 整站引擎：{args.seeds} 组 × {args.days} 天，"
+          + ("逐日一致" if not bad else "不一致：" + "；".join(f"{k} {len(v)} 组（如种子 {v[0]}）" for k, v in bad.items())))
+
+    w = amazon_weather(args.days, 0)
+    layout = zone_layout(CFG['panels'])
+    t = time.perf_counter()
+    run_engine_zones(*w, CFG, ECON, layout)
+    print(f"默认布局 {len(layout['panels'])} 个分区 × {args.days} 天：{(time.perf_counter() - t) * 1e3:.1f} ms")
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# 巴西光伏清洗调度：与界面无关的规划核心
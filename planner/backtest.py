@@ -0,0 +1,172 @@
+import csv
+from pathlib import Path
+
+import numpy as np
+
+from .compact import compact_plan, concat_plans
+from .engine import engine_params, plan_columns, run_engine_arrays
+
+# ================= ⏪ 历史回测（流式） =================
+# 从本地归档文件（Open-Meteo archive API 导出的 CSV / Parquet，逐日数据）按块读取天气，
+# 跨块延续积灰与清洗窗口状态，并逐块写出计划行；内存只与块大小有关，与回测年数无关。
+# 结果与把全部天气一次性交给 run_engine 的结果逐行一致。
+CHUNK_DAYS = 365
+ARCHIVE_ALIASES = {
+    "date": ("time", "date"),
+    "rain": ("precipitation_sum", "rain_sum", "rain"),
+    "wind": ("wind_speed_10m_max", "windspeed_10m_max", "wind"),
+    "radiation_mj": ("shortwave_radiation_sum", "radiation_mj"),
+    "humidity": ("relative_humidity_2m_max", "relativehumidity_2m_max", "relative_humidity_2m_mean", "humidity"),
+}
+WIND_KMH = ("wind_speed_10m_max", "windspeed_10m_max")   # 归档接口默认 km/h，引擎使用 m/s
+DEFAULT_HUMIDITY = 70.0
+PLAN_FIELDS = ("date", "rain", "wind", "radiation_kwh", "dust", "loss", "action", "status",
+               "revenue", "cost", "net", "carbon", "hot_spot", "safety")
+
+def _base_name(header):
+    # "precipitation_sum (mm)" -> "precipitation_sum"
+    return header.split(" (")[0].strip().lower()
+
+def _resolve_columns(headers):
+    names = [_base_name(h) for h in headers]
+    found = {}
+    for field, aliases in ARCHIVE_ALIASES.items():
+        for alias in aliases:
+            if alias in names:
+                found[field] = (names.index(alias), alias)
+                break
+    missing = [f for f in ("date", "rain", "wind", "radiation_mj") if f not in found]
+    if missing:
+        raise ValueError(f"归档文件缺少列：{', '.join(missing)}（表头：{', '.join(headers)}）")
+    return found
+
+def _to_chunk(raw, found):
+    def num(field, default=0.0):
+        if field not in found:
+            return np.full(len(raw['date']), default)
+        vals = np.array([float(v) if v not in ("", None) else np.nan for v in raw[field]])
+        return np.where(np.isnan(vals), default, vals)
+
+    wind = num("wind")
+    if found["wind"][1] in WIND_KMH:
+        wind = wind / 3.6
+    # 与实时预报解析一致的精度
+    return {
+        "date": np.array(raw['date'], dtype=str).astype("U10"),
+        "rain": num("rain").round(1), "wind": wind.round(1),
+        "radiation_mj": num("radiation_mj").round(1),
+        "humidity": num("humidity", DEFAULT_HUMIDITY).round(1)
+    }
+
+def read_archive_csv(path, chunk_days=CHUNK_DAYS):
+    # Open-Meteo 导出的 CSV 前几行是坐标元数据，真正的表头以 "time" 开头
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        for headers in reader:
+            if headers and _base_name(headers[0]) in ARCHIVE_ALIASES["date"]:
+                break
+        else:
+            return
+        found = _resolve_columns(headers)
+        raw = {k: [] for k in found}
+        for row in reader:
+            if not row or not row[0].strip():
+                continue
+            for field, (idx, _) in found.items():
+                raw[field].append(row[idx] if idx < len(row) else "")
+            if len(raw['date']) >= chunk_days:
+                yield _to_chunk(raw, found)
+                raw = {k: [] for k in found}
+        if raw['date']:
+            yield _to_chunk(raw, found)
+
+def read_archive_parquet(path, chunk_days=CHUNK_DAYS):
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    found = _resolve_columns(pf.schema_arrow.names)
+    names = pf.schema_arrow.names
+    columns = [names[idx] for idx, _ in found.values()]
+    for batch in pf.iter_batches(batch_size=chunk_days, columns=columns):
+        raw = {field: batch.column(names[idx]).to_pylist() for field, (idx, _) in found.items()}
+        raw['date'] = [str(d)[:10] for d in raw['date']]
+        yield _to_chunk(raw, found)
+
+def read_archive(paths, chunk_days=CHUNK_DAYS):
+    # 多个文件（如按年份导出）按给定顺序首尾相接
+    for path in [paths] if isinstance(paths, (str, Path)) else paths:
+        reader = read_archive_parquet if Path(path).suffix.lower() in (".parquet", ".pq") else read_archive_csv
+        yield from reader(path, chunk_days)
+
+def _concat(a, b):
+    return {k: np.concatenate((a[k], b[k])) for k in b} if a else b
+
+def _split(cols, k):
+    return {c: v[:k] for c, v in cols.items()}, {c: v[k:] for c, v in cols.items()}
+
+def backtest(chunks, cfg, econ, out=None, on_rows=None, collect=False, on_plan=None):
+    # chunks：逐块的列式天气（如 read_archive(...) 的结果）；out：计划行输出 CSV 路径；
+    # collect=True 时在结果的 "plan" 中返回全期紧凑计划（见 compact.py，每电站年约 14 KB）；
+    # on_plan(紧凑计划, 窗口) 则逐块收到紧凑计划与本块的列式窗口（如 PlanExporter.write），不必在内存中保留全期。
+    # 触发条件“窗口须在回测期内完成”需要向后看 duration 天：
+    # 每块只计算到缓冲区末尾前 duration 天，其余留待下一块，最后一块按真实末尾计算。
+    duration, _ = engine_params(cfg, econ)
+    state = None
+    offset = 0
+    totals = {"days": 0, "revenue": 0.0, "cost": 0.0, "net": 0.0, "carbon": 0.0, "windows": 0}
+    windows = []
+    parts = []
+
+    f = open(out, "w", newline="", encoding="utf-8") if out else None
+    writer = csv.writer(f) if f else None
+    if writer:
+        writer.writerow(PLAN_FIELDS)
+
+    def run(cols, horizon):
+        nonlocal state, offset
+        plan, wins, stats = run_engine_arrays(
+            cols['rain'], cols['wind'], cols['radiation_mj'], cols['humidity'], cfg, econ,
+            state=state, horizon=horizon
+        )
+        state = stats['state']
+        totals['days'] += len(cols['rain'])
+        totals['revenue'] += float(plan['revenue'].sum())
+        totals['cost'] += stats['total_cost']
+        totals['net'] += float(plan['net'].sum())
+        totals['carbon'] += float(plan['carbon'].sum())
+        totals['windows'] += stats['count']
+        for s in wins['start'].tolist():
+            windows.append({"start": str(cols['date'][s]), "index": offset + s, "days": duration})
+        if collect or on_plan:
+            compact = compact_plan(cols, plan)
+            if collect:
+                parts.append(compact)
+            if on_plan:
+                on_plan(compact, wins)
+        if writer or on_rows:
+            rows = plan_columns(cols, plan)
+            if writer:
+                writer.writerows(zip(*(rows[k] for k in PLAN_FIELDS)))
+            if on_rows:
+                on_rows(rows)
+        offset += len(cols['rain'])
+
+    try:
+        buffer = None
+        for chunk in chunks:
+            buffer = _concat(buffer, chunk)
+            ready = len(buffer['rain']) - duration
+            if ready > 0:
+                head, buffer = _split(buffer, ready)
+                run(head, len(head['rain']) + duration)
+        if buffer is not None and len(buffer['rain']):
+            run(buffer, len(buffer['rain']))
+    finally:
+        if f:
+            f.close()
+
+    totals['state'] = state
+    totals['window_starts'] = windows
+    if collect:
+        totals['plan'] = concat_plans(parts)
+    return totals
@@ -0,0 +1,131 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+# ================= 💾 天气磁盘缓存 =================
+# 持久化 Open-Meteo 原始响应：重启 / 重新部署 / 新 worker 都能直接命中。
+# 键为 (lat, lon, days, issued)，每个位置只保留最近一次成功的预报。
+CACHE_DIR = Path(os.environ.get("SOLAR_CACHE_DIR", Path(__file__).resolve().parent.parent / ".cache"))
+CACHE_TTL = 1800                 # 超过即视为过期：先返回旧数据，后台刷新
+CACHE_STALE_MAX = 24 * 3600      # 超过则阻塞等待新数据（失败时仍回退到旧数据）
+CACHE_MAX_AGE = 7 * 24 * 3600    # 硬过期：直接淘汰
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+class WeatherCache:
+    def __init__(self, path=None, ttl=CACHE_TTL, stale_max=CACHE_STALE_MAX,
+                 max_age=CACHE_MAX_AGE, max_bytes=CACHE_MAX_BYTES):
+        self.path = Path(path) if path else CACHE_DIR / "weather.sqlite"
+        self.ttl, self.stale_max, self.max_age, self.max_bytes = ttl, stale_max, max_age, max_bytes
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS forecast (
+                    lat REAL, lon REAL, days INTEGER, issued REAL,
+                    accessed REAL, size INTEGER, payload BLOB,
+                    PRIMARY KEY (lat, lon, days, issued)
+                )
+            """)
+    
+    @contextmanager
+    def _connect(self):
+        # 每次操作独立连接：可在页面线程与后台刷新线程间安全共享。
+        # sqlite3 连接的 with 只提交 / 回滚、不关闭，用完在这里显式关闭
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _key(lat, lon, days):
+        return round(float(lat), 4), round(float(lon), 4), int(days)
+    
+    def get(self, lat, lon, days):
+        key = self._key(lat, lon, days)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT issued, payload FROM forecast WHERE lat=? AND lon=? AND days=? "
+                "ORDER BY issued DESC LIMIT 1", key
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE forecast SET accessed=? WHERE lat=? AND lon=? AND days=? AND issued=?",
+                (time.time(), *key, row[0])
+            )
+        return json.loads(zlib.decompress(row[1])), row[0]
+    
+    def issued(self, lat, lon, days):
+        # 最近一次预报的时间戳（不读取、不解压数据，也不更新访问时间），没有缓存时为 None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT MAX(issued) FROM forecast WHERE lat=? AND lon=? AND days=?", self._key(lat, lon, days)
+            ).fetchone()
+        return row[0]
+    
+    def put(self, lat, lon, days, data, issued=None):
+        key = self._key(lat, lon, days)
+        issued = time.time() if issued is None else issued
+        blob = zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+        with self._connect() as conn:
+            conn.execute("DELETE FROM forecast WHERE lat=? AND lon=? AND days=? AND issued<=?", (*key, issued))
+            conn.execute(
+                "INSERT OR REPLACE INTO forecast VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, issued, issued, len(blob), blob)
+            )
+            self._evict(conn)
+    
+    def _evict(self, conn):
+        conn.execute("DELETE FROM forecast WHERE issued < ?", (time.time() - self.max_age,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM forecast").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 超出容量：按最近访问时间淘汰（LRU）
+        for rowid, size in conn.execute("SELECT rowid, size FROM forecast ORDER BY accessed").fetchall():
+            conn.execute("DELETE FROM forecast WHERE rowid=?", (rowid,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+    
+    def refresh_async(self, lat, lon, days, loader):
+        return self.refresh_many_async([(lat, lon)], days, lambda coords: [loader()])
+    
+    def refresh_many_async(self, coords, days, loader):
+        # 同一位置同时只允许一个后台刷新；loader 接收坐标列表并按序返回原始响应
+        with self._lock:
+            todo = [c for c in coords if self._key(*c, days) not in self._refreshing]
+            keys = [self._key(*c, days) for c in todo]
+            self._refreshing.update(keys)
+        if not todo:
+            return False
+        
+        def work():
+            try:
+                for (lat, lon), data in zip(todo, loader(todo)):
+                    self.put(lat, lon, days, data)
+            except Exception:
+                pass  # 刷新失败保留旧数据，下次请求再试
+            finally:
+                with self._lock:
+                    self._refreshing.difference_update(keys)
+        
+        threading.Thread(target=work, daemon=True, name="weather-refresh").start()
+        return True
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def default_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = WeatherCache()
+        return _default_cache
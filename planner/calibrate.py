@@ -0,0 +1,295 @@
+import csv
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+
+from .backtest import read_archive
+from .constants import MAX_DUST_CAPACITY, MUD_RISK_HUMIDITY
+from .engine import DEFAULT_MODEL, MODEL_FIELDS, engine_params
+from .fleet import FLEET_DEFAULTS, station_setup
+
+# ================= 🎯 模型参数校准 =================
+# 用历史发电量（逆变器 / SCADA 导出，逐小时或逐日）与同期归档天气，按站拟合积灰 / 损耗模型参数
+# （DEFAULT_MODEL：积灰速率、非线性系数、大雨 / 小雨阈值、泥灰倍数）。
+# 实测发电比 r = 发电量 / 理论发电量；模型预测 r ≈ pr × (1 - 损耗)，pr 为电站系统效率，
+# 对每组参数取最小二乘闭式解，只需逐日累加三个和，不保存逐日预测。
+# 全部候选参数组成 (候选,) 向量，按天循环一次就得到所有候选的误差；先粗网格后在最优点附近逐轮加密。
+# 各站独立，走进程池并行；输出 CSV 可作为 SOLAR_MODELS / --models 供引擎按站使用。
+PRODUCTION_ALIASES = {
+    "time": ("timestamp", "time", "datetime", "date"),
+    "energy": ("energy_kwh", "energy", "kwh", "yield_kwh", "e_kwh"),
+    "station": ("station", "name", "site"),
+    "cleaned": ("cleaned", "cleaning"),
+}
+CALIB_GRID = {
+    "dust_rate": np.linspace(0.1, 1.2, 12),
+    "soiling_factor": np.linspace(1.0, 1.6, 7),
+    "heavy_rain": np.array([2.0, 3.0, 5.0, 8.0, 12.0, 20.0]),
+    "light_rain": np.array([0.2, 0.5, 1.0, 2.0, 3.0]),
+    "mud_factor": np.linspace(1.0, 1.8, 5),
+}
+CALIB_REFINED = ("dust_rate", "soiling_factor", "mud_factor")   # 连续参数：在最优点附近加密
+CALIB_REFINE_ROUNDS = 3
+CALIB_MIN_RADIATION = 5.0    # MJ/m²：阴天的发电比噪声大，不参与拟合
+CALIB_MIN_DAYS = 60
+CALIB_RATIO_BAND = (0.3, 1.5)   # 相对中位数的有效发电比范围：排除停机、限电与计量异常日
+MODEL_COLUMNS = ("name", *MODEL_FIELDS, "pr", "rmse", "baseline_rmse", "days")
+
+def _find(names, aliases):
+    for alias in aliases:
+        if alias in names:
+            return names.index(alias)
+    return None
+
+def _resolve(headers):
+    names = [h.split(" (")[0].strip().lower() for h in headers]
+    found = {k: _find(names, aliases) for k, aliases in PRODUCTION_ALIASES.items()}
+    missing = [k for k in ("time", "energy") if found[k] is None]
+    if missing:
+        raise ValueError(f"发电量文件缺少列：{', '.join(missing)}（表头：{', '.join(headers)}）")
+    return {k: i for k, i in found.items() if i is not None}
+
+def _num(values):
+    arr = np.array([v if v not in ("", None) else "nan" for v in values], dtype=object)
+    return arr.astype(float)
+
+def read_production_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        headers = next(reader, [])
+        found = _resolve(headers)
+        rows = [r for r in reader if r and r[0].strip()]
+    cols = {k: [r[i] if i < len(r) else "" for r in rows] for k, i in found.items()}
+    return _production_columns(cols)
+
+def read_production_parquet(path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    names = pq.ParquetFile(path).schema_arrow.names
+    found = _resolve(names)
+    table = pq.read_table(path, columns=[names[i] for i in found.values()])
+    cols = {}
+    for k, i in found.items():
+        col = table.column(names[i])
+        cols[k] = col.cast(pa.string()).to_pylist() if k in ("time", "station") else col.to_pylist()
+    return _production_columns(cols)
+
+def _production_columns(cols):
+    out = {
+        "time": np.asarray(cols['time'], dtype=str).astype("U10"),
+        "energy": _num(cols['energy'])
+    }
+    if "station" in cols:
+        out['station'] = np.asarray(cols['station'], dtype=str)
+    if "cleaned" in cols:
+        flag = np.char.lower(np.asarray(cols['cleaned'], dtype=str))
+        out['cleaned'] = np.isin(flag, ("1", "1.0", "true", "yes", "y"))
+    return out
+
+def read_production(paths):
+    # 一个或多个 CSV / Parquet 按顺序拼接（同一电站按年份分文件等）
+    parts = []
+    for path in [paths] if isinstance(paths, (str, Path)) else paths:
+        parquet = Path(path).suffix.lower() in (".parquet", ".pq")
+        parts.append(read_production_parquet(path) if parquet else read_production_csv(path))
+    keys = set.intersection(*(set(p) for p in parts))
+    return {k: np.concatenate([p[k] for p in parts]) for k in keys}
+
+def daily_production(raw):
+    # 逐条记录 -> {电站（无电站列时为 None）: 逐日 {"date", "energy", "cleaned", "complete"}}。
+    # 记录数明显少于该站常见值（中位数）的日子视为数据缺口，不参与拟合
+    station = raw.get('station', np.full(len(raw['time']), "", dtype=str))
+    out = {}
+    for name in np.unique(station).tolist():
+        sel = station == name
+        days, inv = np.unique(raw['time'][sel], return_inverse=True)
+        energy = raw['energy'][sel]
+        ok = ~np.isnan(energy)
+        samples = np.bincount(inv, weights=ok, minlength=len(days))
+        cleaned = raw['cleaned'][sel] if "cleaned" in raw else np.zeros(len(inv), dtype=bool)
+        out[name or None] = {
+            "date": days,
+            "energy": np.bincount(inv, weights=np.where(ok, energy, 0.0), minlength=len(days)),
+            "cleaned": np.bincount(inv, weights=cleaned, minlength=len(days)) > 0,
+            "complete": samples >= 0.9 * np.median(samples)
+        }
+    return out
+
+def read_manifest(path):
+    # 校准清单 CSV：name, production, weather；多个文件以 ; 分隔，相对路径以清单所在目录为准
+    base = Path(path).parent
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [
+            {
+                "name": row['name'].strip(),
+                "production": [str(base / p.strip()) for p in row['production'].split(";") if p.strip()],
+                "weather": [str(base / p.strip()) for p in row['weather'].split(";") if p.strip()]
+            }
+            for row in csv.DictReader(f)
+        ]
+
+def history_terms(weather, daily, capacity, duration=None):
+    # 按天气日期对齐的逐日量；无发电记录或无效的日子只参与积灰递推，不计入误差。
+    # 清洗记录可以只标窗口最后一天，也可以标窗口的每一天：连续标记的日子视为首尾相接的窗口，
+    # 每 duration 天（本站机器人数对应的周期，缺省时整段算一个窗口）及整段最后一天为窗口结束
+    dates = np.asarray(weather['date'], dtype=str).astype("U10")
+    n = len(dates)
+    rain = np.asarray(weather['rain'], dtype=float)
+    rad = np.asarray(weather['radiation_mj'], dtype=float)
+    hum = np.asarray(weather['humidity'], dtype=float)
+    _, wi, pi = np.intersect1d(dates, daily['date'], return_indices=True)
+    energy = np.full(n, np.nan)
+    energy[wi] = np.where(daily['complete'][pi], daily['energy'][pi], np.nan)
+    cleaned = np.zeros(n, dtype=bool)
+    cleaned[wi] = daily['cleaned'][pi]
+    idx = np.arange(n)
+    run_start = np.maximum.accumulate(np.where(cleaned & ~np.concatenate(([False], cleaned[:-1])), idx, 0))
+    last = cleaned & ~np.append(cleaned[1:], False)
+    if duration:
+        last |= cleaned & ((idx - run_start + 1) % duration == 0)
+    cleaned = last
+
+    expected = capacity * (rad / 3.6) * 1000
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(expected > 0, energy / expected, np.nan)
+    valid = (rad >= CALIB_MIN_RADIATION) & np.isfinite(ratio) & (ratio > 0)
+    if valid.any():
+        mid = np.median(ratio[valid])
+        valid &= (ratio >= CALIB_RATIO_BAND[0] * mid) & (ratio <= CALIB_RATIO_BAND[1] * mid)
+    return {
+        "rain": rain, "rad": rad, "mud": (hum > MUD_RISK_HUMIDITY) & (rain < 0.1),
+        # 与引擎相同：清洗窗口结束的次日积灰复位
+        "reset": np.concatenate(([False], cleaned[:-1])) if n else cleaned,
+        "ratio": np.where(valid, ratio, 0.0), "valid": valid
+    }
+
+def fit_errors(terms, params):
+    # params: {参数: (P,)} -> (pr, 平方误差和)，均为 (P,)。
+    # 积灰递推与 run_engine_arrays 相同（无调度清洗，只按记录的清洗日复位）
+    rate, soil = params['dust_rate'], params['soiling_factor']
+    heavy, light = params['heavy_rain'], params['light_rain']
+    rate_mud = rate * params['mud_factor']
+    p = len(rate)
+    dust = np.zeros(p)
+    a = np.zeros(p)
+    b = np.zeros(p)
+    rain_l, rad_l, mud_l = terms['rain'].tolist(), terms['rad'].tolist(), terms['mud'].tolist()
+    reset_l, valid_l, ratio_l = terms['reset'].tolist(), terms['valid'].tolist(), terms['ratio'].tolist()
+
+    for t in range(len(rain_l)):
+        r = rain_l[t]
+        dust = np.where(r >= heavy, 0.0, np.where(r >= light, dust * 0.5, dust + (rate_mud if mud_l[t] else rate)))
+        dust = np.minimum(dust, MAX_DUST_CAPACITY)
+        if reset_l[t]:
+            dust = np.full(p, 0.2)
+        if valid_l[t]:
+            keep = 1 - (0.002 if reset_l[t] else np.minimum((dust / 100) * (1 + (1 - rad_l[t] / 20) * (soil - 1)), 1.0))
+            a += ratio_l[t] * keep
+            b += keep * keep
+
+    pr = np.where(b > 0, a / np.where(b > 0, b, 1), 0.0)
+    sse = float(np.square(terms['ratio'][terms['valid']]).sum()) - pr * a
+    return pr, np.maximum(sse, 0.0)
+
+def _candidates(grid):
+    # 网格笛卡尔积 -> {参数: (P,)}，去掉小雨阈值不低于大雨阈值的组合
+    combos = np.array(list(product(*(grid[k] for k in MODEL_FIELDS))), dtype=float)
+    cand = dict(zip(MODEL_FIELDS, combos.T))
+    keep = cand['light_rain'] < cand['heavy_rain']
+    return {k: v[keep] for k, v in cand.items()}
+
+def _refine_grid(best, step):
+    grid = {k: np.array([best[k]]) for k in MODEL_FIELDS}
+    for k in CALIB_REFINED:
+        lo = CALIB_GRID[k][0]
+        grid[k] = np.unique(np.maximum(best[k] + step[k] * np.linspace(-1, 1, 5), lo))
+    return grid
+
+def calibrate_history(weather, daily, capacity, duration=None):
+    # 单站拟合：返回 {模型参数..., "pr", "rmse", "baseline_rmse", "days"}；rmse 为损耗（比例）的均方根误差
+    terms = history_terms(weather, daily, capacity, duration)
+    days = int(np.count_nonzero(terms['valid']))
+    if days < CALIB_MIN_DAYS:
+        raise ValueError(f"有效天数不足：{days} 天（至少 {CALIB_MIN_DAYS} 天晴好且有完整发电记录的日子）")
+
+    def rmse(pr, sse):
+        return float(np.sqrt(sse / days) / pr) if pr > 0 else float("inf")
+
+    base_pr, base_sse = fit_errors(terms, {k: np.array([v], dtype=float) for k, v in DEFAULT_MODEL.items()})
+    cand = _candidates(CALIB_GRID)
+    pr, sse = fit_errors(terms, cand)
+    step = {k: float(np.diff(CALIB_GRID[k]).mean()) for k in CALIB_REFINED}
+    for _ in range(CALIB_REFINE_ROUNDS):
+        i = int(np.argmin(sse))
+        best = {k: float(v[i]) for k, v in cand.items()}
+        step = {k: v / 2 for k, v in step.items()}
+        cand = _candidates(_refine_grid(best, step))
+        pr, sse = fit_errors(terms, cand)
+    i = int(np.argmin(sse))
+    if base_sse[0] <= sse[i]:
+        # 历史数据区分不出更好的参数（如缺少降雨 / 高湿日）：保留默认值
+        cand, pr, sse, i = {k: np.array([v], dtype=float) for k, v in DEFAULT_MODEL.items()}, base_pr, base_sse, 0
+    return {
+        **{k: round(float(cand[k][i]), 4) for k in MODEL_FIELDS},
+        "pr": round(float(pr[i]), 4), "rmse": round(rmse(pr[i], sse[i]), 5),
+        "baseline_rmse": round(rmse(base_pr[0], base_sse[0]), 5), "days": days
+    }
+
+def _weather(paths):
+    chunks = list(read_archive(paths))
+    return {k: np.concatenate([c[k] for c in chunks]) for k in chunks[0]} if chunks else None
+
+def calibrate_station(name, weather_paths, daily, capacity, duration=None):
+    weather = _weather(weather_paths)
+    if weather is None:
+        raise ValueError(f"{name}：归档天气为空")
+    return {"name": name, **calibrate_history(weather, daily, capacity, duration)}
+
+def calibrate_fleet(manifest, stations, defaults=FLEET_DEFAULTS, cpu_workers=None):
+    # manifest: read_manifest 的结果；stations 提供装机容量（面板数 × 单板功率）。
+    # 发电量文件在本进程读一次（可含多站），按站拆分后与天气路径一起交给进程池；
+    # 某站失败（缺列、数据不足）时该站结果为 {"name", "error"}，不影响其他站
+    productions = {}
+    for job in manifest:
+        key = tuple(job['production'])
+        if key not in productions:
+            try:
+                productions[key] = daily_production(read_production(job['production']))
+            except (ValueError, OSError) as exc:
+                productions[key] = exc
+    with ProcessPoolExecutor(max_workers=cpu_workers) as pool:
+        futures = []
+        for job in manifest:
+            by_station = productions[tuple(job['production'])]
+            if isinstance(by_station, Exception):
+                futures.append(by_station)
+                continue
+            if job['name'] not in stations:
+                futures.append(ValueError(f"注册表中没有电站 {job['name']}"))
+                continue
+            daily = by_station.get(job['name'], by_station.get(None))
+            if daily is None:
+                futures.append(ValueError(f"发电量文件中没有电站 {job['name']}"))
+                continue
+            cfg, econ = station_setup(stations[job['name']], defaults)
+            futures.append(pool.submit(calibrate_station, job['name'], job['weather'], daily, cfg['capacity'],
+                                       engine_params(cfg, econ)[0]))
+        results = []
+        for job, fut in zip(manifest, futures):
+            try:
+                if isinstance(fut, Exception):
+                    raise fut
+                results.append(fut.result())
+            except (ValueError, OSError) as exc:
+                results.append({"name": job['name'], "error": str(exc)})
+    return results
+
+def write_models(path, results):
+    # 成功拟合的电站写成 CSV（列见 MODEL_COLUMNS），可直接用作 SOLAR_MODELS / --models
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, MODEL_COLUMNS)
+        writer.writeheader()
+        writer.writerows(r for r in results if "error" not in r)
@@ -0,0 +1,419 @@
+import argparse
+import datetime
+import json
+import random
+import sys
+import time
+
+from .backtest import backtest, read_archive
+from .calibrate import calibrate_fleet, read_manifest, write_models
+from .compact import compact_plan
+from .ensemble import ensemble_members, run_ensemble
+from .engine import engine_params, plan_columns, run_engine_arrays, weather_columns, window_records
+from .export import EXPORT_FORMATS, PlanExporter
+from .fleet import FLEET_DEFAULTS, plan_fleet_hourly_rows, plan_fleet_pool_rows, plan_fleet_rows, station_setup
+from .hourly import plan_hourly
+from .metrics import metrics
+from .opportunity import opportunity_curve
+from .optimizer import optimal_starts
+from .pool import POOL_MODES
+from .prewarm import Prewarmer
+from .registry import StationRegistry, apply_models, cell_center, default_stations, read_models, read_stations
+from .rolling import commit, initial_checkpoint, resume, run_days
+from .sweep import recommend_robots
+from .weather import fetch_weather, fetch_weather_hourly
+from .zones import plan_zones
+
+# ================= ⌨️ 命令行入口 =================
+# 用法：python -m planner --station AUT --days 14 --json
+# 只依赖 numpy（网络请求时才加载 requests），不加载 streamlit / plotly / pandas
+
+def find_station(query, stations=None):
+    stations = default_stations() if stations is None else stations
+    q = query.strip().upper()
+    for name in stations:
+        if name.upper() == q or name.split(" ")[0].upper() == q:
+            return name
+    codes = ", ".join(n.split(" ")[0] for n in list(stations)[:20]) + (" …" if len(stations) > 20 else "")
+    raise SystemExit(f"未知电站：{query}（可选：{codes}）")
+
+def load_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"checkpoint": initial_checkpoint(), "days": None}
+
+def save_state(path, saved):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(saved, f, ensure_ascii=False)
+
+def plan_one(name, db, days=14, defaults=FLEET_DEFAULTS, mode="greedy", members=0, sweep=False, state_path=None,
+             on_plan=None, opportunity=False):
+    lat, lon = cell_center(float(db['lat']), float(db['lon']))
+    if mode == "hourly":
+        (weather, hourly), source = fetch_weather_hourly(lat, lon, days)
+    else:
+        weather, source = fetch_weather(lat, lon, days)
+    cols = weather_columns(weather)
+    cfg, econ = station_setup(db, defaults)
+    ckpt = None
+    with metrics().stage(f"engine.{mode}"):
+        if state_path:
+            # 续算：上次计划中今天之前的天数已经发生，先计入 checkpoint，再从其状态规划今天起的预报
+            saved = load_state(state_path)
+            ckpt = saved['checkpoint']
+            if saved['days'] and len(cols['date']):
+                ckpt = commit(ckpt, saved['days'], str(cols['date'][0]))
+            run = resume(ckpt, cols, cfg, econ)
+            cols, plan, wins, stats = run['cols'], run['plan'], run['windows'], run['stats']
+            save_state(state_path, {"checkpoint": ckpt, "days": run_days(run)})
+            windows = window_records(wins)
+        elif mode == "hourly":
+            plan, windows, stats = plan_hourly(cols, hourly, cfg, econ)
+        elif mode == "zones":
+            plan, windows, stats = plan_zones(cols, cfg, econ)
+        else:
+            args = (cols['rain'], cols['wind'], cols['radiation_mj'], cols['humidity'], cfg, econ)
+            starts = optimal_starts(*args)[0] if mode == "optimal" else None
+            plan, wins, stats = run_engine_arrays(*args, starts=starts)
+            windows = window_records(wins)
+    if on_plan:
+        on_plan(name, compact_plan(cols, plan), windows)
+    rev = float(plan['revenue'].sum())
+    rows = plan_columns(cols, plan)
+    for w in windows:
+        w['start_date'], w['end_date'] = rows['date'][w['start']], rows['date'][w['end']]
+    res = {
+        "station": name, "source": source, "mode": mode, "cfg": cfg, "econ": econ,
+        "kpi": {
+            "revenue": rev, "cost": stats['total_cost'], "profit": rev - stats['total_cost'],
+            "carbon": float(plan['carbon'].sum()), "windows": stats['count'], "duration": stats['duration']
+        },
+        "windows": windows,
+        "plan": [dict(zip(rows, vals)) for vals in zip(*rows.values())]
+    }
+    if ckpt is not None:
+        res['checkpoint'] = ckpt
+    if mode == "hourly":
+        res['kpi'].update({k: stats[k] for k in ("robot_hours", "workable_hours", "recovered_hours", "window_days")})
+    if mode == "zones":
+        res['kpi'].update({k: stats[k] for k in ("zones", "zone_cleanings", "sweep_days")})
+    if members:
+        ens_members, ens_source = ensemble_members(lat, lon, cols, members)
+        ens = run_ensemble(ens_members, cfg, econ)
+        res['ensemble'] = {
+            "source": ens_source, "members": ens['members'],
+            "net_p10": ens['net_p10'], "net_p50": ens['net_p50'], "net_p90": ens['net_p90'],
+            "p_start": dict(zip(map(str, ens['date']), ens['p_start'].round(4).tolist()))
+        }
+    if sweep:
+        rec, curve = recommend_robots(cols, cfg, econ)
+        gain = curve['net'][:, 0, 0] - curve['baseline'][0]
+        res['robots'] = {
+            "recommended": rec, "current": cfg['robots'],
+            "best_gain": float(gain.max()),
+            "gain_by_robots": dict(zip(curve['robots'].tolist(), gain.round(2).tolist()))
+        }
+    if opportunity:
+        curve = opportunity_curve(cols, cfg, econ, durations=[engine_params(cfg, econ)[0]])
+        gain = curve['gain'][0]
+        res['opportunity'] = {
+            "duration": int(curve['duration'][0]), "cost": curve['cost'],
+            "best": rows['date'][curve['best']] if curve['best'] is not None else None,
+            "gain_by_start": {d: (round(float(g), 2) if g == g else None) for d, g in zip(rows['date'], gain.tolist())}
+        }
+    return res
+
+def _print_plan(res, out):
+    k = res['kpi']
+    # 逐小时窗口起止在任意小时，各窗口跨越的天数可能不同
+    spans = k.get('window_days') or [k['duration']]
+    each = f"{min(spans)}–{max(spans)}" if min(spans) != max(spans) else spans[0]
+    out.write(f"{res['station']} | 数据来源：{res['source']}\n")
+    out.write(
+        f"总收入 R$ {k['revenue']:,.0f} | 清洗成本 R$ {k['cost']:,.0f} | 净利润 R$ {k['profit']:,.0f} | "
+        f"碳减排 {k['carbon']:,.2f} 吨 | {k['windows']} 个周期（每次 {each} 天）\n"
+    )
+    if 'robot_hours' in k:
+        out.write(
+            f"逐小时调度：每次清洗 {k['robot_hours']} 个作业小时 | 可作业 {k['workable_hours']} 小时，"
+            f"其中 {k['recovered_hours']} 小时位于按日规则停机的大风日\n"
+        )
+    if 'zones' in k:
+        out.write(f"分区调度：{k['zones']} 个分区，共清洗 {k['zone_cleanings']} 区次 | 全场清洗一遍约需 {k['sweep_days']} 天\n")
+    if 'checkpoint' in res:
+        c = res['checkpoint']
+        if c['date']:
+            w = c['window']
+            out.write(
+                f"续算自 {c['date']}：积灰 {c['dust']:.2f}% | "
+                + (f"清洗窗口进行中（剩余 {w['days_remaining']} 天，至 {w['end']}）| " if w else "")
+                + f"累计 {c['kpi']['days']} 天净利润 R$ {c['kpi']['net']:,.0f}\n"
+            )
+    out.write(f"{'日期':<11}{'辐射kWh':>8}{'积灰%':>7}{'损耗%':>7}  {'动作':<4}{'净收益R$':>12}  状态\n")
+    for r in res['plan']:
+        out.write(
+            f"{r['date']:<12}{r['radiation_kwh']:>8.2f}{r['dust']:>8.2f}{r['loss']:>8.1f}  "
+            f"{r['action']:<4}{r['net']:>14,.0f}  {r['status']}\n"
+        )
+
+    if 'ensemble' in res:
+        e = res['ensemble']
+        out.write(
+            f"集合预报：{e['source']} | 净收益 P10 R$ {e['net_p10']:,.0f} / "
+            f"P50 R$ {e['net_p50']:,.0f} / P90 R$ {e['net_p90']:,.0f}\n"
+        )
+        out.write("开工概率：" + "  ".join(f"{d[5:]} {p * 100:.0f}%" for d, p in e['p_start'].items()) + "\n")
+
+    if 'robots' in res:
+        r = res['robots']
+        cur = r['gain_by_robots'].get(r['current'], r['best_gain'])
+        share = cur / r['best_gain'] * 100 if r['best_gain'] > 0 else 100.0
+        if r['best_gain'] <= 0:
+            out.write("机器人：预测期内清洗无净收益，数量不影响本期计划\n")
+        else:
+            out.write(
+                f"机器人：推荐 {r['recommended']} 台（达到最佳清洗收益 95%）| 当前 {r['current']} 台，"
+                f"获得 {share:.0f}% 的清洗收益（最佳 R$ {r['best_gain']:,.0f}）\n"
+            )
+    if 'opportunity' in res:
+        o = res['opportunity']
+        if o['best'] is None:
+            out.write(f"清洗时机：每次 {o['duration']} 天的清洗无法在预测期内完成\n")
+        else:
+            out.write(f"清洗时机（只清洗一次、每次 {o['duration']} 天，相对不清洗的净收益增量）：最佳开工日 {o['best']}\n")
+            for d, g in o['gain_by_start'].items():
+                out.write(f"  {d}  " + ("不可开工" if g is None else f"R$ {g:>12,.0f}") + "\n")
+
+def _print_backtest(res, out):
+    out.write(
+        f"{res['station']} | 回测 {res['days']} 天（{res['first']} ~ {res['last']}）\n"
+        f"总收入 R$ {res['revenue']:,.0f} | 清洗成本 R$ {res['cost']:,.0f} | 净利润 R$ {res['net']:,.0f} | "
+        f"碳减排 {res['carbon']:,.2f} 吨 | {res['windows']} 个周期\n"
+    )
+    if res['out']:
+        out.write(f"逐日计划已写入 {res['out']}\n")
+
+def _print_calibration(results, out, path):
+    out.write(f"{'电站':<20}{'积灰速率':>8}{'非线性':>7}{'大雨mm':>7}{'小雨mm':>7}{'泥灰':>6}{'系统效率':>8}{'误差%':>7}{'原误差%':>8}{'天数':>6}\n")
+    for r in results:
+        if "error" in r:
+            out.write(f"{r['name']:<20}拟合失败：{r['error']}\n")
+            continue
+        out.write(
+            f"{r['name']:<20}{r['dust_rate']:>10.3f}{r['soiling_factor']:>9.3f}{r['heavy_rain']:>9.1f}{r['light_rain']:>9.1f}"
+            f"{r['mud_factor']:>8.2f}{r['pr']:>11.3f}{r['rmse'] * 100:>9.2f}{r['baseline_rmse'] * 100:>10.2f}{r['days']:>8}\n"
+        )
+    if path:
+        out.write(f"模型参数已写入 {path}（用作 SOLAR_MODELS 或 --models）\n")
+
+def _print_export(exporter, out):
+    out.write(
+        f"已导出 {exporter.rows['plans']} 行计划、{exporter.rows['windows']} 个清洗窗口到 {exporter.root}"
+        f"（{exporter.fmt}，run_date={exporter.run_date}）\n"
+    )
+
+def _print_fleet(rows, out):
+    out.write(f"{'电站':<20}{'数据来源':<26}{'净利润R$':>14}{'利润率%':>9}{'清洗次数':>6}  下次清洗\n")
+    for r in rows:
+        out.write(
+            f"{r['station']:<20}{r['source']:<26}{r['profit']:>14,.0f}{r['margin']:>9.1f}"
+            f"{r['windows']:>8}  {r['next_clean'] or '-'}\n"
+        )
+
+def _print_pool(summary, out):
+    out.write(
+        f"共享机器人池：净利润 R$ {summary['net']:,.0f} | 各站独立贪心调度 R$ {summary['standalone']:,.0f} | "
+        f"单站排程改进 R$ {summary['schedule_gain']:,.0f} | 共享增益 R$ {summary['gain']:,.0f} | "
+        f"调入机器人 {summary['borrowed']} 台次\n"
+    )
+    for g in summary['groups']:
+        if len(g['stations']) > 1:
+            out.write(f"  {'、'.join(g['stations'])}：共 {g['robots']} 台，峰值占用 {g['peak']} 台（{g['mode']}）\n")
+
+def build_parser():
+    p = argparse.ArgumentParser(prog="python -m planner", description="光伏清洗调度（无界面版）")
+    p.add_argument("--station", action="append", default=[], help="电站代码或全名，可重复，如 AUT")
+    p.add_argument("--all", action="store_true", help="批量规划注册表中的全部电站")
+    p.add_argument("--registry", metavar="FILE", help="电站注册表（CSV 或 SQLite 的 stations 表），默认 SOLAR_STATIONS 或内置电站")
+    p.add_argument("--near", nargs=2, type=float, metavar=("LAT", "LON"), help="列出距该坐标最近的 5 个电站")
+    p.add_argument("--days", type=int, default=14, help="预测天数（默认 14）")
+    p.add_argument("--panels", type=int, default=FLEET_DEFAULTS['panels'], help="光伏板数量")
+    p.add_argument("--power", type=float, default=FLEET_DEFAULTS['power'], help="单板功率 (Wp)")
+    p.add_argument("--robots", type=int, default=FLEET_DEFAULTS['robots'], help="清洗机器人数量")
+    p.add_argument("--optimal", action="store_true", help="使用动态规划求全局最优清洗计划（默认贪心规则）")
+    p.add_argument("--pool", nargs="?", const="auto", choices=POOL_MODES,
+                   help="相邻电站共享机器人池统一调度（配合 --all 或多个 --station）：exact 精确求解，heuristic 适合大规模")
+    p.add_argument("--hourly", action="store_true", help="逐小时调度：只在风速安全、无降雨的作业小时推进清洗")
+    p.add_argument("--zones", action="store_true", help="分区调度：按阵列分区跟踪积灰，每天优先清洗最脏的分区")
+    p.add_argument("--ensemble", type=int, default=0, metavar="N", help="附加 N 个成员的集合预报分析")
+    p.add_argument("--sweep", action="store_true", help="扫描 1–200 台机器人，给出推荐数量")
+    p.add_argument("--opportunity", action="store_true", help="逐日列出若只在该日开工清洗一次，相对不清洗的净收益增量")
+    p.add_argument("--backtest", nargs="+", metavar="FILE", help="对归档天气（CSV / Parquet，可多个文件按顺序拼接）做流式回测，需配合 --station")
+    p.add_argument("--out", help="回测逐日计划 / 校准模型参数的输出 CSV 路径")
+    p.add_argument("--calibrate", metavar="MANIFEST",
+                   help="按站拟合积灰模型参数：清单 CSV（name, production, weather）列出各站的历史发电量与归档天气文件")
+    p.add_argument("--models", metavar="FILE", help="按站模型参数（--calibrate 的输出），默认 SOLAR_MODELS")
+    p.add_argument("--state", metavar="FILE", help="引擎状态文件：从上次运行的 checkpoint 续算并更新（贪心规则，单个电站）")
+    p.add_argument("--prewarm", nargs="?", type=int, const=0, metavar="N",
+                   help="后台预热：到期前刷新注册表中全部电站的预报缓存（N 轮后退出，默认一直运行），供多个页面进程共用")
+    p.add_argument("--export", metavar="DIR", help="把逐日计划与清洗窗口导出为按电站、运行日期分区的数据集")
+    p.add_argument("--export-format", choices=EXPORT_FORMATS, default="parquet", help="导出格式（默认 parquet）")
+    p.add_argument("--json", action="store_true", help="输出 JSON")
+    p.add_argument("--metrics", choices=("json", "prometheus"), help="运行结束后输出各阶段耗时与缓存命中（默认写到 stderr）")
+    p.add_argument("--metrics-out", metavar="FILE", help="度量输出文件（未指定 --metrics 时为 JSON）")
+    return p
+
+def main(argv=None, out=None):
+    out = out or sys.stdout
+    args = build_parser().parse_args(argv)
+    if not (args.metrics or args.metrics_out):
+        return _run(args, out)
+    m = metrics()
+    m.reset()
+    m.enable()
+    with m.stage("cli.total"):
+        code = _run(args, out)
+    text = m.to_prometheus() if args.metrics == "prometheus" else m.to_json() + "\n"
+    if args.metrics_out:
+        with open(args.metrics_out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stderr.write(text)
+    return code
+
+def _run(args, out):
+    if not args.export:
+        return _dispatch(args, out, None)
+    # 导出在结果输出之后汇报，JSON 模式下不混入标准输出
+    with PlanExporter(args.export, fmt=args.export_format) as exporter:
+        code = _dispatch(args, out, exporter)
+    if not args.json:
+        _print_export(exporter, out)
+    return code
+
+def _dispatch(args, out, exporter):
+    defaults = {"panels": args.panels, "power": args.power, "robots": args.robots}
+    on_plan = exporter.write if exporter else None
+    stations = read_stations(args.registry) if args.registry else default_stations()
+    if args.models:
+        stations = apply_models(stations, read_models(args.models))
+    
+    if args.near:
+        registry = StationRegistry(stations)
+        near = [{"station": name, "distance_km": round(km, 2)} for name, km in registry.nearest(*args.near, k=5)]
+        if args.json:
+            json.dump(near, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+        else:
+            for r in near:
+                out.write(f"{r['station']:<24}{r['distance_km']:>10.2f} km\n")
+        return 0
+    
+    if args.prewarm is not None:
+        # 独立进程只维护磁盘缓存：计划记忆化在各页面进程内，这里算了也用不上
+        warm = Prewarmer(stations, args.days, defaults, modes=())
+        cycles = 0
+        try:
+            while True:
+                res = warm.run_once()
+                cycles += 1
+                out.write(
+                    f"{datetime.datetime.now():%H:%M:%S} 刷新 {res['refreshed']} / {len(warm.cells)} 个网格"
+                    + (f" | 最近错误：{warm.stats['last_error']}" if warm.stats['last_error'] else "") + "\n"
+                )
+                out.flush()
+                if args.prewarm and cycles >= args.prewarm:
+                    return 0
+                time.sleep(warm.interval * random.uniform(0.8, 1.2))
+        except KeyboardInterrupt:
+            return 0
+    
+    if args.calibrate:
+        manifest = read_manifest(args.calibrate)
+        unknown = [job['name'] for job in manifest if job['name'] not in stations]
+        if unknown:
+            build_parser().error(f"校准清单中的电站不在注册表中：{', '.join(unknown)}")
+        with metrics().stage("calibrate"):
+            results = calibrate_fleet(manifest, stations, defaults)
+        if args.out:
+            write_models(args.out, results)
+        if args.json:
+            json.dump(results, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+        else:
+            _print_calibration(results, out, args.out)
+        return 0 if all("error" not in r for r in results) else 1
+    
+    if args.pool:
+        if args.hourly or args.optimal or args.state or args.backtest:
+            build_parser().error("--pool 不能与 --hourly、--optimal、--state、--backtest 同时使用")
+        if not args.all and len(args.station) < 2:
+            build_parser().error("--pool 需要 --all 或至少两个 --station")
+        if not args.all:
+            stations = {name: stations[name] for name in (find_station(q, stations) for q in args.station)}
+        with metrics().stage("fleet.pool"):
+            rows, summary = plan_fleet_pool_rows(stations, args.days, defaults, mode=args.pool, on_plan=on_plan)
+        if args.json:
+            json.dump({"stations": rows, "pool": summary}, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+        else:
+            _print_fleet(rows, out)
+            _print_pool(summary, out)
+        return 0
+    
+    if args.optimal + args.hourly + args.zones > 1:
+        build_parser().error("--optimal、--hourly 与 --zones 只能选一个")
+    mode = "optimal" if args.optimal else "hourly" if args.hourly else "zones" if args.zones else "greedy"
+    
+    if args.all:
+        if args.state or args.ensemble or args.sweep or args.opportunity:
+            build_parser().error("--state、--ensemble、--sweep、--opportunity 只用于 --station 规划")
+        with metrics().stage(f"fleet.{mode}"):
+            if args.hourly:
+                rows = plan_fleet_hourly_rows(stations, args.days, defaults, on_plan=on_plan)
+            else:
+                rows = plan_fleet_rows(stations, args.days, defaults, on_plan=on_plan, mode=mode)
+        if args.json:
+            json.dump(rows, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+        else:
+            _print_fleet(rows, out)
+        return 0
+    
+    if args.backtest:
+        if not args.station:
+            build_parser().error("回测需要 --station（提供电价、水价等经济参数）")
+        name = find_station(args.station[0], stations)
+        cfg, econ = station_setup(stations[name], defaults)
+        span = {}
+
+        def track(rows):
+            span.setdefault('first', rows['date'][0] if rows['date'] else None)
+            span['last'] = rows['date'][-1] if rows['date'] else span.get('last')
+
+        export = (lambda compact, wins: exporter.write(name, compact, wins)) if exporter else None
+        res = backtest(read_archive(args.backtest), cfg, econ, out=args.out, on_rows=track, on_plan=export)
+        res.update(station=name, out=args.out, first=span.get('first'), last=span.get('last'))
+        if args.json:
+            json.dump(res, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+        else:
+            _print_backtest(res, out)
+        return 0
+
+    if not args.station:
+        build_parser().error("需要 --station 或 --all")
+    if args.state and (args.optimal or args.hourly or args.zones or len(args.station) > 1):
+        build_parser().error("--state 只支持单个电站的贪心规则规划")
+    results = [plan_one(name, stations[name], args.days, defaults, mode, args.ensemble, args.sweep, args.state, on_plan,
+                        args.opportunity)
+               for name in (find_station(q, stations) for q in args.station)]
+    if args.json:
+        json.dump(results if len(results) > 1 else results[0], out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    else:
+        for res in results:
+            _print_plan(res, out)
+    return 0
@@ -0,0 +1,88 @@
+import numpy as np
+
+from .engine import REASONS, STATUS_LABELS, STATUS_RESET, _round, weather_columns
+
+# ================= 🗜️ 紧凑计划格式 =================
+# 大规模保存计划（全站 × 多年回测）时使用的定长列式格式：
+# 数值列 float32，清洗原因为 int8 编码，四个布尔标志压成一个 uint8 位域，日期为自 1970-01-01 起的天数 (int32)。
+# 动作、状态文字与净收益都可由编码推出，不单独保存；展示用的字符串列只在界面边缘由 compact_columns / to_frame 生成。
+EPOCH = np.datetime64("1970-01-01", "D")
+FLOAT_FIELDS = ("rain", "wind", "radiation_kwh", "dust", "loss", "revenue", "cost", "carbon")
+FLAG_CLEAN, FLAG_RESET, FLAG_HOT_SPOT, FLAG_SAFETY = 1, 2, 4, 8
+ACTION_LABELS = ("监控", "清洗")
+
+def date_days(dates):
+    return (np.asarray(dates, dtype="datetime64[D]") - EPOCH).astype(np.int32)
+
+def day_dates(days):
+    return np.datetime_as_string(EPOCH + np.asarray(days, dtype=np.int64).astype("timedelta64[D]"), unit="D")
+
+def compact_plan(weather, plan):
+    # run_engine_arrays / daily_plan 的计划 + 同期天气 -> 紧凑计划
+    cols = weather_columns(weather)
+    flags = (
+        np.asarray(plan['clean'], dtype=np.uint8) * FLAG_CLEAN
+        | np.asarray(plan['reset'], dtype=np.uint8) * FLAG_RESET
+        | np.asarray(plan['hot_spot'], dtype=np.uint8) * FLAG_HOT_SPOT
+        | np.asarray(plan['safety'], dtype=np.uint8) * FLAG_SAFETY
+    )
+    out = {"day": date_days(cols['date'])}
+    out.update({k: np.asarray(plan[k], dtype=np.float32) for k in FLOAT_FIELDS})
+    out.update(reason=np.asarray(plan['reason'], dtype=np.int8), flags=flags.astype(np.uint8))
+    return out
+
+def concat_plans(parts):
+    parts = list(parts)
+    if not parts:
+        return None
+    return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+
+def plan_nbytes(compact):
+    return sum(v.nbytes for v in compact.values())
+
+def flag(compact, bit):
+    return (compact['flags'] & bit) > 0
+
+def status_codes(compact):
+    # 下标对应 STATUS_LABELS
+    return np.where(flag(compact, FLAG_RESET), STATUS_RESET, compact['reason']).astype(np.int8)
+
+def net(compact):
+    return compact['revenue'].astype(float) - compact['cost'].astype(float)
+
+def totals(compact):
+    # 汇总按 float64 累加，避免长周期下 float32 的累计误差
+    return {
+        "days": len(compact['day']),
+        "revenue": float(compact['revenue'].sum(dtype=float)), "cost": float(compact['cost'].sum(dtype=float)),
+        "net": float(net(compact).sum()), "carbon": float(compact['carbon'].sum(dtype=float)),
+        "windows": int(np.count_nonzero(flag(compact, FLAG_CLEAN)))
+    }
+
+def compact_columns(compact):
+    # 紧凑计划 -> 展示列（字段、舍入与 plan_columns 相同）
+    return {
+        "date": day_dates(compact['day']).tolist(),
+        "rain": _round(compact['rain'].astype(float), 1), "wind": _round(compact['wind'].astype(float), 1),
+        "radiation_kwh": _round(compact['radiation_kwh'].astype(float), 2),
+        "dust": _round(compact['dust'].astype(float), 2), "loss": _round(compact['loss'].astype(float) * 100, 1),
+        "action": [ACTION_LABELS[c] for c in flag(compact, FLAG_CLEAN).astype(int).tolist()],
+        "status": [STATUS_LABELS[c] for c in status_codes(compact).tolist()],
+        "revenue": _round(compact['revenue'].astype(float), 1), "cost": _round(compact['cost'].astype(float), 1),
+        "net": _round(net(compact), 1), "carbon": _round(compact['carbon'].astype(float), 3),
+        "hot_spot": flag(compact, FLAG_HOT_SPOT).tolist(), "safety": flag(compact, FLAG_SAFETY).tolist()
+    }
+
+def to_frame(compact):
+    # 界面边缘：动作 / 状态 / 原因为 pandas 分类列，其余列保持紧凑类型
+    import pandas as pd
+
+    return pd.DataFrame({
+        "date": day_dates(compact['day']),
+        **{k: compact[k] for k in FLOAT_FIELDS},
+        "net": net(compact).astype(np.float32),
+        "action": pd.Categorical.from_codes(flag(compact, FLAG_CLEAN).astype(np.int8), ACTION_LABELS),
+        "status": pd.Categorical.from_codes(status_codes(compact), STATUS_LABELS),
+        "reason": pd.Categorical.from_codes(compact['reason'], REASONS),
+        "hot_spot": flag(compact, FLAG_HOT_SPOT), "safety": flag(compact, FLAG_SAFETY)
+    })
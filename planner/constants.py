@@ -0,0 +1,30 @@
+# ================= ⭐ 核心常数 =================
+DEFAULT_PANEL_POWER_W = 700
+MIN_PANEL_POWER_W = 300
+MAX_PANEL_POWER_W = 900
+WATER_CONSUMPTION_PER_PANEL = 0.015
+ENERGY_CONSUMPTION_PER_PANEL = 0.008
+ROBOT_EFFICIENCY_PANELS_PER_HOUR = 50
+ROBOT_DAILY_WORK_HOURS = 10.0
+ROBOT_WORK_START_HOUR = 7      # 逐小时调度：每日作业时段为 7 时起 ROBOT_DAILY_WORK_HOURS 小时
+ROBOT_AVAILABILITY_RATE = 0.95
+DUST_ACCUMULATION_RATE_BASE = 0.4
+MAX_DUST_CAPACITY = 15.0
+SOILING_NON_LINEAR_FACTOR = 1.2
+HOTSPOT_THRESHOLD = 8.0
+HEAVY_RAIN_THRESHOLD = 5.0
+LIGHT_RAIN_THRESHOLD = 1.0
+MUD_RISK_HUMIDITY = 85.0
+MUD_DUST_FACTOR = 1.3         # 高湿无雨（泥灰）时的积灰速率倍数
+WIND_SAFETY_LIMIT = 10.0
+CARBON_FACTOR = 0.58
+
+# ================= 🗄️ 数据库 =================
+STATION_DB = {
+    "请选择电站...": {},
+    "AUT (Autazes)": {"lat": -3.60, "lon": -59.12, "sell_price": 0.35, "robot_elec_price": 0.25, "water_price": 2.0},
+    "NOD (Nova Olinda)": {"lat": -3.88, "lon": -59.07, "sell_price": 0.38, "robot_elec_price": 0.28, "water_price": 2.2},
+    "BBA (Borba)": {"lat": -4.40, "lon": -59.63, "sell_price": 0.32, "robot_elec_price": 0.22, "water_price": 1.8},
+    "HMT (Humaita)": {"lat": -7.48, "lon": -63.02, "sell_price": 0.40, "robot_elec_price": 0.35, "water_price": 2.5},
+    "SGC (Sao Gabriel)": {"lat": -0.15, "lon": -67.03, "sell_price": 0.36, "robot_elec_price": 0.26, "water_price": 2.1}
+}
@@ -0,0 +1,296 @@
+import math
+
+import numpy as np
+
+from .constants import (
+    CARBON_FACTOR, DUST_ACCUMULATION_RATE_BASE, ENERGY_CONSUMPTION_PER_PANEL,
+    HEAVY_RAIN_THRESHOLD, HOTSPOT_THRESHOLD, LIGHT_RAIN_THRESHOLD, MAX_DUST_CAPACITY,
+    MUD_DUST_FACTOR, MUD_RISK_HUMIDITY, ROBOT_AVAILABILITY_RATE, ROBOT_DAILY_WORK_HOURS,
+    ROBOT_EFFICIENCY_PANELS_PER_HOUR, SOILING_NON_LINEAR_FACTOR, WATER_CONSUMPTION_PER_PANEL,
+    WIND_SAFETY_LIMIT,
+)
+from .metrics import metrics
+
+# ================= 🧠 决策引擎 =================
+REASONS = ("", "热斑风险", "经济最优", "全局最优")
+REASON_HOTSPOT, REASON_ECONOMIC, REASON_OPTIMAL = 1, 2, 3
+STATUS_LABELS = ("⚪ 正常运行", "🧹 清洗中 (热斑风险)", "🧹 清洗中 (经济最优)", "🧹 清洗中 (全局最优)", "✨ 高效发电")
+STATUS_RESET = 4
+# 积灰 / 损耗模型参数：默认取全局常数，cfg['model'] 可按站覆盖（见 calibrate.py）
+DEFAULT_MODEL = {
+    "dust_rate": DUST_ACCUMULATION_RATE_BASE, "soiling_factor": SOILING_NON_LINEAR_FACTOR,
+    "heavy_rain": HEAVY_RAIN_THRESHOLD, "light_rain": LIGHT_RAIN_THRESHOLD, "mud_factor": MUD_DUST_FACTOR
+}
+MODEL_FIELDS = tuple(DEFAULT_MODEL)
+
+def model_params(cfg):
+    return {**DEFAULT_MODEL, **(cfg.get('model') or {})}
+
+def stack_models(cfgs):
+    # 多站 cfg -> 批量引擎用的 {参数: (B,)}
+    return {k: np.array([model_params(cfg)[k] for cfg in cfgs], dtype=float) for k in MODEL_FIELDS}
+
+def _per_row(value, like):
+    # 标量或 (B,) 的参数对齐到 (B, D) 的天气数组
+    v = np.asarray(value, dtype=float)
+    return v[:, None] if v.ndim == 1 and like.ndim == 2 else v
+
+def engine_params(cfg, econ):
+    eff_robots = cfg['robots'] * ROBOT_AVAILABILITY_RATE
+    daily_cap = eff_robots * ROBOT_EFFICIENCY_PANELS_PER_HOUR * ROBOT_DAILY_WORK_HOURS
+    
+    if daily_cap <= 0:
+        duration = 999
+    else:
+        duration = math.ceil(cfg['panels'] / daily_cap)
+    
+    water_cost = cfg['panels'] * WATER_CONSUMPTION_PER_PANEL * econ['water']
+    elec_cost = cfg['panels'] * ENERGY_CONSUMPTION_PER_PANEL * econ['elec']
+    return duration, water_cost + elec_cost
+
+def daily_terms(rain, wind, rad_mj, hum, cap_mw, model=None):
+    # 与调度状态无关的逐日量：一次性向量化计算。model 见 DEFAULT_MODEL，值为标量或 (B,)
+    rain = np.asarray(rain, dtype=float)
+    rad_mj = np.asarray(rad_mj, dtype=float)
+    hum = np.asarray(hum, dtype=float)
+    m = {k: _per_row(v, rain) for k, v in (model or DEFAULT_MODEL).items()}
+    return {
+        "heavy": rain >= m['heavy_rain'],
+        "light": rain >= m['light_rain'],
+        "rate": np.where((hum > MUD_RISK_HUMIDITY) & (rain < 0.1), m['dust_rate'] * m['mud_factor'], m['dust_rate']),
+        "soil_k": 1 + (1 - rad_mj/20) * (m['soiling_factor'] - 1),
+        "gen": cap_mw * (rad_mj / 3.6) * 1000,
+        "safety": np.asarray(wind, dtype=float) > WIND_SAFETY_LIMIT
+    }
+
+def run_engine_arrays(rain, wind, rad_mj, hum, cfg, econ, starts=None, state=None, horizon=None):
+    # starts 为 None 时按贪心规则触发；给定开工日序列时按该计划回放（用于评估优化结果）。
+    # state 为上一段结束时的引擎状态 {"dust", "last_end"}（last_end 相对本段第 0 天），
+    # horizon 为从本段第 0 天起的总天数（窗口须在其中完成），默认即本段长度；
+    # 二者用于分段 / 流式计算，结束状态在 stats["state"] 中返回。
+    rain = np.asarray(rain, dtype=float)
+    wind = np.asarray(wind, dtype=float)
+    rad_mj = np.asarray(rad_mj, dtype=float)
+    hum = np.asarray(hum, dtype=float)
+    n = len(rain)
+    
+    p_sell = econ['sell']
+    duration, single_cost = engine_params(cfg, econ)
+    terms = daily_terms(rain, wind, rad_mj, hum, cfg['capacity'], model_params(cfg))
+    gen_potential, safety = terms['gen'], terms['safety']
+    planned = None if starts is None else set(np.asarray(starts, dtype=int).tolist())
+    
+    # 积灰递推与触发判断本质上是串行的：循环内只保留 O(1) 的标量运算
+    dust_arr = np.empty(n)
+    loss_arr = np.empty(n)
+    hot_spot = np.zeros(n, dtype=bool)
+    reason = np.zeros(n, dtype=np.int8)
+    reset = np.zeros(n, dtype=bool)
+    
+    heavy_l, light_l, rate_l = terms['heavy'].tolist(), terms['light'].tolist(), terms['rate'].tolist()
+    k_l, gen_l, safety_l = terms['soil_k'].tolist(), gen_potential.tolist(), safety.tolist()
+    trigger_cost = single_cost * 1.1
+    state = state or {"dust": 0.0, "last_end": -999}
+    dust, last_end = float(state['dust']), int(state['last_end'])
+    horizon = n if horizon is None else horizon
+    
+    for i in range(n):
+        if heavy_l[i]: dust = 0.0
+        elif light_l[i]: dust *= 0.5
+        else: dust += rate_l[i]
+        dust = min(dust, MAX_DUST_CAPACITY)
+        
+        loss = min((dust / 100) * k_l[i], 1.0)
+        
+        # 昨日是否刚结束一个清洗窗口（窗口互不重叠，只需比较最近一次的结束日）
+        just_cleaned = i - 1 == last_end
+        hot = dust > HOTSPOT_THRESHOLD
+        
+        if i > last_end and not safety_l[i] and i + duration < horizon:
+            if planned is not None:
+                if i in planned:
+                    reason[i] = REASON_HOTSPOT if hot else REASON_OPTIMAL
+                    last_end = i + duration - 1
+            elif hot:
+                reason[i] = REASON_HOTSPOT
+                last_end = i + duration - 1
+            elif gen_l[i] * loss * p_sell * 3.0 > trigger_cost:
+                reason[i] = REASON_ECONOMIC
+                last_end = i + duration - 1
+        
+        if just_cleaned:
+            dust, loss = 0.2, 0.002
+            reset[i] = True
+        
+        dust_arr[i], loss_arr[i], hot_spot[i] = dust, loss, hot
+    
+    clean = reason > 0
+    cost = np.where(clean, single_cost, 0.0)
+    actual_gen = gen_potential * (1 - loss_arr)
+    revenue = actual_gen * p_sell
+    
+    starts = np.flatnonzero(clean)
+    plan = {
+        "rain": rain, "wind": wind, "radiation_kwh": rad_mj / 3.6,
+        "dust": dust_arr, "loss": loss_arr,
+        "clean": clean, "reason": reason, "reset": reset,
+        "revenue": revenue, "cost": cost, "net": revenue - cost,
+        "carbon": (actual_gen * CARBON_FACTOR) / 1000,
+        "hot_spot": hot_spot, "safety": safety
+    }
+    windows = {
+        "start": starts, "end": starts + duration - 1,
+        "reason": reason[starts], "cost": np.full(len(starts), single_cost)
+    }
+    return plan, windows, {
+        "total_cost": sum(windows['cost'].tolist()),
+        "count": len(starts), "duration": duration,
+        "state": {"dust": dust, "last_end": last_end - n if last_end - n >= -1 else -999}
+    }
+
+def engine_params_batch(cfg, econ):
+    # engine_params 的向量化版本：cfg / econ 中的值可以是标量或形状为 (B,) 的数组
+    panels = np.asarray(cfg['panels'], dtype=float)
+    daily_cap = (np.asarray(cfg['robots'], dtype=float) * ROBOT_AVAILABILITY_RATE
+                 * ROBOT_EFFICIENCY_PANELS_PER_HOUR * ROBOT_DAILY_WORK_HOURS)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        duration = np.where(daily_cap > 0, np.ceil(panels / np.where(daily_cap > 0, daily_cap, 1)), 999).astype(np.int64)
+    water_cost = panels * WATER_CONSUMPTION_PER_PANEL * np.asarray(econ['water'], dtype=float)
+    elec_cost = panels * ENERGY_CONSUMPTION_PER_PANEL * np.asarray(econ['elec'], dtype=float)
+    return duration, water_cost + elec_cost
+
+def run_engine_batch(rain, wind, rad_mj, hum, cfg, econ):
+    # 批量贪心引擎：B 个情景（集合成员 / 参数组合）× D 天一次计算。
+    # 天气为 (D,) 或 (B, D)，cfg / econ 的值为标量或 (B,)；按天循环，每步对整批情景向量运算。
+    # 与 run_engine_arrays 逐情景结果一致。
+    rain, wind, rad_mj, hum = (np.atleast_2d(np.asarray(x, dtype=float)) for x in (rain, wind, rad_mj, hum))
+    duration, single_cost = engine_params_batch(cfg, econ)
+    cap_mw = np.asarray(cfg['capacity'], dtype=float)
+    p_sell = np.asarray(econ['sell'], dtype=float)
+    batch = np.broadcast_shapes(rain.shape[:1], duration.shape, single_cost.shape, cap_mw.shape, p_sell.shape)
+    b, n = batch[0], rain.shape[1]
+    
+    duration, single_cost, cap_mw, p_sell = (np.broadcast_to(x, (b,)) for x in (duration, single_cost, cap_mw, p_sell))
+    terms = daily_terms(rain, wind, rad_mj, hum, 1.0, model_params(cfg))
+    heavy = np.broadcast_to(terms['heavy'], (b, n))
+    light = np.broadcast_to(terms['light'], (b, n))
+    rate = np.broadcast_to(terms['rate'], (b, n))
+    soil_k = np.broadcast_to(terms['soil_k'], (b, n))
+    safety = np.broadcast_to(terms['safety'], (b, n))
+    gen_potential = cap_mw[:, None] * (rad_mj / 3.6) * 1000
+    
+    dust_arr = np.empty((b, n))
+    loss_arr = np.empty((b, n))
+    hot_spot = np.empty((b, n), dtype=bool)
+    reason = np.zeros((b, n), dtype=np.int8)
+    reset = np.empty((b, n), dtype=bool)
+    
+    trigger_cost = single_cost * 1.1
+    dust = np.zeros(b)
+    last_end = np.full(b, -999, dtype=np.int64)
+    
+    for i in range(n):
+        dust = np.where(heavy[:, i], 0.0, np.where(light[:, i], dust * 0.5, dust + rate[:, i]))
+        dust = np.minimum(dust, MAX_DUST_CAPACITY)
+        loss = np.minimum((dust / 100) * soil_k[:, i], 1.0)
+        
+        just_cleaned = last_end == i - 1
+        hot = dust > HOTSPOT_THRESHOLD
+        can = (i > last_end) & ~safety[:, i] & (i + duration < n)
+        by_hot = can & hot
+        by_econ = can & ~hot & (gen_potential[:, i] * loss * p_sell * 3.0 > trigger_cost)
+        reason[:, i] = np.where(by_hot, REASON_HOTSPOT, np.where(by_econ, REASON_ECONOMIC, 0))
+        last_end = np.where(by_hot | by_econ, i + duration - 1, last_end)
+        
+        dust = np.where(just_cleaned, 0.2, dust)
+        loss = np.where(just_cleaned, 0.002, loss)
+        dust_arr[:, i], loss_arr[:, i], hot_spot[:, i], reset[:, i] = dust, loss, hot, just_cleaned
+    
+    clean = reason > 0
+    cost = np.where(clean, single_cost[:, None], 0.0)
+    actual_gen = gen_potential * (1 - loss_arr)
+    revenue = actual_gen * p_sell[:, None]
+    net = revenue - cost
+    plan = {
+        "dust": dust_arr, "loss": loss_arr,
+        "clean": clean, "reason": reason, "reset": reset,
+        "revenue": revenue, "cost": cost, "net": net,
+        "carbon": (actual_gen * CARBON_FACTOR) / 1000,
+        "hot_spot": hot_spot, "safety": safety
+    }
+    return plan, {
+        "net": net.sum(axis=1), "total_cost": cost.sum(axis=1),
+        "count": clean.sum(axis=1), "duration": duration
+    }
+
+def _round(arr, ndigits):
+    # 与逐行 round() 保持一致（np.round 在 .5 边界上的结果不同）
+    return [round(v, ndigits) for v in arr.tolist()]
+
+def weather_columns(weather):
+    # 逐日记录列表 -> 列式天气帧；已是列式（如 parse_forecast_columns 的结果）时原样返回
+    if isinstance(weather, dict):
+        return weather
+    return {k: [x[k] for x in weather] for k in ("date", "rain", "wind", "radiation_mj", "humidity")}
+
+def _as_list(values):
+    return values.tolist() if isinstance(values, np.ndarray) else list(values)
+
+def plan_columns(weather, plan):
+    # 展示用的逐日计划列（与原 DataFrame 字段、舍入一致），不依赖 pandas
+    cols = weather_columns(weather)
+    status = np.where(plan['reset'], STATUS_RESET, plan['reason'])
+    return {
+        "date": _as_list(cols['date']), "rain": _as_list(cols['rain']), "wind": _as_list(cols['wind']),
+        "radiation_kwh": _round(plan['radiation_kwh'], 2),
+        "dust": _round(plan['dust'], 2), "loss": _round(plan['loss'] * 100, 1),
+        "action": ["清洗" if c else "监控" for c in plan['clean'].tolist()],
+        "status": [STATUS_LABELS[c] for c in status.tolist()],
+        "revenue": _round(plan['revenue'], 1), "cost": _round(plan['cost'], 1),
+        "net": _round(plan['net'], 1), "carbon": _round(plan['carbon'], 3),
+        "hot_spot": plan['hot_spot'].tolist(), "safety": plan['safety'].tolist()
+    }
+
+def window_records(wins):
+    return [
+        {"start": int(s), "end": int(e), "reason": REASONS[r], "cost": float(c)}
+        for s, e, r, c in zip(wins['start'], wins['end'], wins['reason'], wins['cost'])
+    ]
+
+def plan_arrays(weather, cfg, econ, mode="greedy", hourly=None):
+    # (列式天气, 计划数组, 窗口记录, 统计)：run_engine / run_engine_compact 共用
+    cols = weather_columns(weather)
+    with metrics().stage(f"engine.{mode}"):
+        if mode == "hourly":
+            from .hourly import plan_hourly
+            from .weather import expand_hourly
+            daily, wins, stats = plan_hourly(cols, expand_hourly(cols) if hourly is None else hourly, cfg, econ)
+            return cols, daily, wins, stats
+        if mode == "zones":
+            from .zones import plan_zones
+            daily, wins, stats = plan_zones(cols, cfg, econ)
+            return cols, daily, wins, stats
+        starts = None
+        if mode == "optimal":
+            from .optimizer import optimal_starts
+            starts, _ = optimal_starts(cols['rain'], cols['wind'], cols['radiation_mj'], cols['humidity'], cfg, econ)
+        plan, wins, stats = run_engine_arrays(
+            cols['rain'], cols['wind'], cols['radiation_mj'], cols['humidity'], cfg, econ, starts=starts
+        )
+        return cols, plan, window_records(wins), stats
+
+def run_engine(weather, cfg, econ, mode="greedy", hourly=None):
+    # mode: "greedy" 贪心触发规则；"optimal" 动态规划求收益最大的清洗窗口；
+    # "hourly" 逐小时调度（hourly 为同一预报的逐小时帧，缺省时由逐日天气展开）；"zones" 分区积灰调度（默认布局）。
+    # 返回展示用 DataFrame；批量保存计划请用 run_engine_compact
+    import pandas as pd
+    
+    cols, plan, wins, stats = plan_arrays(weather, cfg, econ, mode, hourly)
+    return pd.DataFrame(plan_columns(cols, plan)), wins, stats
+
+def run_engine_compact(weather, cfg, econ, mode="greedy", hourly=None):
+    # 与 run_engine 相同，但计划为紧凑格式（见 compact.py），不依赖 pandas
+    from .compact import compact_plan
+    
+    cols, plan, wins, stats = plan_arrays(weather, cfg, econ, mode, hourly)
+    return compact_plan(cols, plan), wins, stats
@@ -0,0 +1,105 @@
+import numpy as np
+
+from .engine import run_engine_batch, weather_columns
+from .weather import http_session
+
+# ================= 🎲 集合预报 / 蒙特卡洛规划 =================
+# 降雨时间是清洗决策最大的不确定来源：在 N 个预报成员上同时运行引擎（成员 × 天 数组），
+# 给出每天作为清洗开工日的概率，以及净收益的 P10 / P50 / P90。
+ENSEMBLE_URL = "https://ensemble-api.open-meteo.com/v1/ensemble"
+ENSEMBLE_MODEL = "icon_seamless"
+ENSEMBLE_HOURLY = ("precipitation", "windspeed_10m", "relativehumidity_2m", "shortwave_radiation")
+DEFAULT_MEMBERS = 200
+
+def _member_matrix(hourly, var):
+    # 控制预报 + var_member01..NN，按成员编号排列为 (M, H)
+    keys = [var] + sorted(k for k in hourly if k.startswith(var + "_member"))
+    return np.array([hourly[k] for k in keys if k in hourly], dtype=float)
+
+def parse_ensemble(data):
+    h = data['hourly']
+    days, inv = np.unique(np.array(h['time'], dtype=str).astype("U10"), return_inverse=True)
+
+    def daily_sum(x):
+        out = np.zeros((len(days), x.shape[0]))
+        np.add.at(out, inv, np.nan_to_num(x).T)
+        return out.T
+
+    def daily_max(x, default):
+        out = np.zeros((len(days), x.shape[0]))
+        np.maximum.at(out, inv, np.where(np.isnan(x), default, x).T)
+        return out.T
+
+    rain = daily_sum(_member_matrix(h, "precipitation"))
+    wind = daily_max(_member_matrix(h, "windspeed_10m"), 0) / 3.6
+    hum = daily_max(_member_matrix(h, "relativehumidity_2m"), 70)
+    rad_mj = daily_sum(_member_matrix(h, "shortwave_radiation")) * 0.0036   # 小时平均 W/m² -> MJ/m²
+    m = min(len(rain), len(wind), len(hum), len(rad_mj))
+    return {
+        "date": days,
+        "rain": rain[:m].round(1), "wind": wind[:m].round(1),
+        "radiation_mj": rad_mj[:m].round(1), "humidity": hum[:m].round(1)
+    }
+
+def fetch_ensemble(lat, lon, days=14, model=ENSEMBLE_MODEL):
+    params = {
+        "latitude": lat, "longitude": lon, "models": model,
+        "hourly": ",".join(ENSEMBLE_HOURLY), "timezone": "auto", "forecast_days": days
+    }
+    resp = http_session().get(ENSEMBLE_URL, params=params, timeout=30)
+    resp.raise_for_status()
+    return parse_ensemble(resp.json())
+
+def perturb_members(weather, members=DEFAULT_MEMBERS, seed=0, rain_sigma=0.6, shift_prob=0.3,
+                    wind_sd=1.5, hum_sd=5.0, rad_sigma=0.1):
+    # 由确定性预报生成扰动成员：降雨以 shift_prob 概率挪到相邻日、雨量对数正态缩放，
+    # 风速/湿度加性噪声、辐射乘性噪声；第 0 个成员保留原始预报作为控制成员
+    cols = weather_columns(weather)
+    rng = np.random.default_rng(seed)
+    rain = np.asarray(cols['rain'], dtype=float)
+    d = len(rain)
+
+    shift = rng.choice([-1, 0, 1], p=[shift_prob / 2, 1 - shift_prob, shift_prob / 2], size=(members, d))
+    target = np.clip(np.arange(d) + shift, 0, max(d - 1, 0))
+    amount = rain * rng.lognormal(0, rain_sigma, (members, d))
+    rain_m = np.zeros((members, d))
+    np.add.at(rain_m, (np.arange(members)[:, None], target), amount)
+
+    wind_m = np.maximum(0, np.asarray(cols['wind'], dtype=float) + rng.normal(0, wind_sd, (members, d)))
+    hum_m = np.clip(np.asarray(cols['humidity'], dtype=float) + rng.normal(0, hum_sd, (members, d)), 40, 100)
+    rad_m = np.asarray(cols['radiation_mj'], dtype=float) * rng.lognormal(0, rad_sigma, (members, d))
+
+    out = {
+        "date": np.asarray(cols['date']),
+        "rain": rain_m.round(1), "wind": wind_m.round(1),
+        "radiation_mj": rad_m.round(1), "humidity": hum_m.round(1)
+    }
+    if members:
+        for k in ("rain", "wind", "radiation_mj", "humidity"):
+            out[k][0] = np.asarray(cols[k], dtype=float)
+    return out
+
+def ensemble_members(lat, lon, weather, members=DEFAULT_MEMBERS, seed=0):
+    # 优先使用 Open-Meteo 集合预报接口，失败时回退到扰动成员
+    days = len(weather_columns(weather)['date'])
+    try:
+        ens = fetch_ensemble(lat, lon, days)
+        if len(ens['rain']):
+            return ens, f"Open-Meteo 集合预报 ({ENSEMBLE_MODEL}, {len(ens['rain'])} 成员)"
+    except Exception:
+        pass
+    return perturb_members(weather, members, seed), f"扰动集合 ({members} 成员)"
+
+def run_ensemble(members, cfg, econ):
+    plan, stats = run_engine_batch(
+        members['rain'], members['wind'], members['radiation_mj'], members['humidity'], cfg, econ
+    )
+    net = stats['net']
+    p10, p50, p90 = np.percentile(net, [10, 50, 90]) if len(net) else (0.0, 0.0, 0.0)
+    return {
+        "date": members['date'], "members": len(net),
+        "p_start": plan['clean'].mean(axis=0),          # 各日被选为清洗开工日的概率
+        "p_hot_spot": plan['hot_spot'].mean(axis=0),
+        "net": net, "net_p10": float(p10), "net_p50": float(p50), "net_p90": float(p90),
+        "count_mean": float(stats['count'].mean()) if len(net) else 0.0
+    }
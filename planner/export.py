@@ -0,0 +1,176 @@
+import datetime
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+
+from .compact import ACTION_LABELS, FLAG_CLEAN, FLAG_HOT_SPOT, FLAG_SAFETY, flag, net, status_codes
+from .engine import REASONS, STATUS_LABELS
+
+# ================= 📦 计划导出（Parquet / Arrow） =================
+# 把紧凑计划（compact.py）流式写成按电站、运行日期分区的数据集（hive 风格目录）：
+#   <root>/plans/station=<电站>/run_date=<YYYY-MM-DD>/part-0.parquet
+#   <root>/windows/station=<电站>/run_date=<YYYY-MM-DD>/part-0.parquet
+# 每个分区一个打开的写入器，逐块追加；同一文件内按自然月切分 row group，
+# date 列带统计信息，读取单个电站 / 月份时只扫描对应目录与 row group。
+# 列直接由 numpy 缓冲区构造（字典编码的文字列、date32 日期），不做逐行 Python 转换。
+# 同一运行日期重复导出会覆盖该分区。pyarrow 只在导出时加载。
+EXPORT_FORMATS = ("parquet", "arrow")
+PLAN_TABLE, WINDOW_TABLE = "plans", "windows"
+
+def _plan_columns(pa, compact):
+    def labels(codes, names):
+        return pa.DictionaryArray.from_arrays(pa.array(codes, pa.int8()), pa.array(names, pa.string()))
+
+    return {
+        "date": pa.array(compact['day'], pa.int32()).view(pa.date32()),
+        "rain": compact['rain'], "wind": compact['wind'], "radiation_kwh": compact['radiation_kwh'],
+        "dust": compact['dust'], "loss": compact['loss'],
+        "action": labels(flag(compact, FLAG_CLEAN).astype(np.int8), ACTION_LABELS),
+        "status": labels(status_codes(compact), STATUS_LABELS),
+        "reason": labels(compact['reason'], REASONS),
+        "revenue": compact['revenue'], "cost": compact['cost'], "net": net(compact).astype(np.float32),
+        "carbon": compact['carbon'],
+        "hot_spot": flag(compact, FLAG_HOT_SPOT), "safety": flag(compact, FLAG_SAFETY)
+    }
+
+def plan_windows(compact, windows):
+    # 清洗窗口 -> 导出用的列。windows 为窗口记录列表（window_records / hourly_windows / zone_windows）
+    # 或列式窗口（run_engine_arrays 的 wins、共享池的 windows）；start / end 为计划内的日序号，按原样写出。
+    # 回测中跨到下一块的窗口 end 超出本块，按与开工日的天数差推算结束日期
+    if not isinstance(windows, dict):
+        windows = {k: [w[k] for w in windows] for k in ("start", "end", "reason", "cost")}
+    start = np.asarray(windows['start'], dtype=np.int64)
+    end = np.asarray(windows['end'], dtype=np.int64)
+    reason = [REASONS.index(r) if isinstance(r, str) else int(r) for r in np.asarray(windows['reason']).tolist()]
+    day = np.asarray(compact['day'], dtype=np.int32)
+    start_day = day[start]
+    end_day = np.where(end < len(day), day[np.minimum(end, len(day) - 1)], start_day + (end - start))
+    return {
+        "start_day": start_day, "end_day": end_day.astype(np.int32),
+        "reason": np.asarray(reason, dtype=np.int8), "cost": np.asarray(windows['cost'], dtype=np.float32)
+    }
+
+def _window_columns(pa, windows):
+    return {
+        "start_date": pa.array(np.asarray(windows['start_day'], np.int32), pa.int32()).view(pa.date32()),
+        "end_date": pa.array(np.asarray(windows['end_day'], np.int32), pa.int32()).view(pa.date32()),
+        "reason": pa.DictionaryArray.from_arrays(
+            pa.array(np.asarray(windows['reason'], np.int8), pa.int8()), pa.array(REASONS, pa.string())
+        ),
+        "cost": np.asarray(windows['cost'], np.float32)
+    }
+
+def _month_bounds(days):
+    # 已按日期排序的 int32 天数 -> 各自然月的切分位置
+    months = (np.asarray(days, dtype="datetime64[D]").astype("datetime64[M]")).astype(np.int64)
+    return np.flatnonzero(np.diff(months)) + 1
+
+class PlanExporter:
+    def __init__(self, root, run_date=None, fmt="parquet"):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"unknown export format {fmt!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+        import pyarrow as pa
+
+        self.pa = pa
+        self.root = Path(root)
+        self.run_date = str(run_date or datetime.date.today().isoformat())
+        self.fmt = fmt
+        self.rows = {PLAN_TABLE: 0, WINDOW_TABLE: 0}
+        self._writers = {}
+
+    def _path(self, table, station):
+        part = self.root / table / f"station={quote(station, safe='')}" / f"run_date={self.run_date}"
+        part.mkdir(parents=True, exist_ok=True)
+        for old in part.glob("part-*"):
+            old.unlink()   # 覆盖本运行日期此前的导出（含另一种格式）
+        return part / f"part-0.{self.fmt}"
+
+    def _writer(self, table, station, schema):
+        key = (table, station)
+        if key not in self._writers:
+            path = self._path(table, station)
+            if self.fmt == "parquet":
+                import pyarrow.parquet as pq
+                self._writers[key] = pq.ParquetWriter(path, schema, compression="zstd")
+            else:
+                self._writers[key] = self.pa.ipc.new_file(path, schema)
+        return self._writers[key]
+
+    def _append(self, table, station, columns):
+        batch = self.pa.table(columns)
+        if not batch.num_rows:
+            return
+        self._writer(table, station, batch.schema).write_table(batch)
+        self.rows[table] += batch.num_rows
+
+    def write_plan(self, station, compact):
+        # 追加一段（如回测的一块）计划；按月切分为独立的 row group / record batch
+        cols = _plan_columns(self.pa, compact)
+        edges = [0, *_month_bounds(compact['day']).tolist(), len(compact['day'])]
+        for lo, hi in zip(edges[:-1], edges[1:]):
+            self._append(PLAN_TABLE, station, {k: v[lo:hi] for k, v in cols.items()})
+
+    def write_windows(self, station, windows):
+        self._append(WINDOW_TABLE, station, _window_columns(self.pa, windows))
+
+    def write(self, station, compact, windows):
+        # windows：该段计划的清洗窗口（见 plan_windows），结束日按窗口自身写出，不假定固定周期
+        self.write_plan(station, compact)
+        self.write_windows(station, plan_windows(compact, windows))
+
+    def close(self):
+        for w in self._writers.values():
+            w.close()
+        self._writers.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def frame_bytes(frame, fmt="parquet"):
+    # 界面下载：单个计划 DataFrame -> Parquet / Arrow 文件内容（文字列字典编码）
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    for name in ("action", "status"):
+        if name in table.column_names:
+            i = table.column_names.index(name)
+            table = table.set_column(i, name, table.column(name).dictionary_encode())
+    sink = pa.BufferOutputStream()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, sink, compression="zstd")
+    else:
+        with pa.ipc.new_file(sink, table.schema) as w:
+            w.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def scan(root, table=PLAN_TABLE, station=None, month=None, run_date=None, columns=None, fmt="parquet"):
+    # 读取导出的数据集：station / run_date 裁剪目录，month（"YYYY-MM"）按 date 统计信息裁剪 row group
+    import pyarrow.dataset as ds
+
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+    root = Path(root) / table
+    files = sorted(str(f) for f in root.rglob(f"part-*.{fmt}"))
+    data = ds.dataset(
+        files, format="ipc" if fmt == "arrow" else fmt, partitioning="hive", partition_base_dir=str(root)
+    )
+    cond = None
+
+    def both(a, b):
+        return b if a is None else a & b
+
+    if station is not None:
+        cond = both(cond, ds.field("station") == station)
+    if run_date is not None:
+        cond = both(cond, ds.field("run_date") == str(run_date))
+    if month is not None:
+        first = np.datetime64(month, "M")
+        field = "date" if table == PLAN_TABLE else "start_date"
+        lo, hi = (datetime.date.fromisoformat(str(np.datetime64(m, "D"))) for m in (first, first + 1))
+        cond = both(cond, (ds.field(field) >= lo) & (ds.field(field) < hi))
+    return data.to_table(columns=columns, filter=cond)
@@ -0,0 +1,236 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from .compact import compact_plan
+from .engine import MODEL_FIELDS, engine_params, plan_arrays, stack_models, weather_columns
+from .hourly import daily_plan, hourly_day_index, hourly_windows, run_engine_hourly_batch, window_days
+from .metrics import metrics
+from .pool import plan_pool
+from .registry import default_stations, parse_stations, snap_coords
+from .weather import fetch_weather_bulk
+
+# ================= 🚀 全站批量规划 =================
+FLEET_DEFAULTS = {"panels": 40000, "power": 700, "robots": 28}
+FLEET_IO_WORKERS = 16
+FLEET_MODES = ("greedy", "optimal", "zones")
+
+def fleet_stations(extra=None):
+    stations = default_stations()
+    if extra is None:
+        return stations
+    # 外部电站清单：{名称: 参数} 或带 name 字段的记录列表（按注册表规则校验，出错抛 ValueError）
+    if not isinstance(extra, dict):
+        extra = parse_stations(extra, "extra")
+    stations.update(extra)
+    return stations
+
+def station_model(db):
+    # 注册表中按站拟合的积灰模型参数（calibrate.py 的输出列）；未给出的沿用全局常数
+    return {k: float(db[k]) for k in MODEL_FIELDS if db.get(k) not in (None, "")}
+
+def station_setup(db, defaults=FLEET_DEFAULTS):
+    panels = int(db.get('panels', defaults['panels']))
+    power = float(db.get('power', defaults['power']))
+    cfg = {
+        "panels": panels, "capacity": round((panels * power) / 1_000_000, 2),
+        "robots": int(db.get('robots', defaults['robots']))
+    }
+    model = station_model(db)
+    if model:
+        cfg['model'] = model
+    econ = {"sell": float(db['sell_price']), "water": float(db['water_price']), "elec": float(db['robot_elec_price'])}
+    return cfg, econ
+
+def plan_station(name, weather, source, cfg, econ, keep_plan=False, mode="greedy"):
+    # mode 同 run_engine 的逐日模式（"greedy" / "optimal" / "zones"）；
+    # keep_plan=True 时另在 "plan" / "plan_windows" 中返回紧凑计划与窗口记录（供导出；跨进程传回的是定长数组）
+    cols, plan, wins, stats = plan_arrays(weather, cfg, econ, mode)
+    row = station_kpis(name, cols, source, cfg, plan, {"start": [w['start'] for w in wins]}, stats)
+    if keep_plan:
+        row['plan'], row['plan_windows'] = compact_plan(cols, plan), wins
+    return row
+
+def station_kpis(name, weather, source, cfg, plan, wins, stats):
+    rev = float(plan['revenue'].sum())
+    cost = stats['total_cost']
+    starts = wins['start']
+    return {
+        "station": name, "source": source,
+        "capacity": cfg['capacity'], "robots": cfg['robots'], "duration": stats['duration'],
+        "revenue": rev, "cost": cost, "profit": rev - cost,
+        "margin": (rev - cost) / max(rev, 1) * 100,
+        "carbon": float(plan['carbon'].sum()),
+        "windows": stats['count'],
+        "next_clean": str(weather['date'][starts[0]]) if len(starts) else "",
+        "max_dust": float(plan['dust'].max()) if len(plan['dust']) else 0.0,
+        "hot_spot_days": int(np.count_nonzero(plan['hot_spot'])),
+        "safety_days": int(np.count_nonzero(plan['safety']))
+    }
+
+def _plan_rolling(rolling, name, weather, source, cfg, econ, keep_plan=False):
+    run = rolling.plan(name, weather, cfg, econ)
+    row = station_kpis(name, run['cols'], source, cfg, run['plan'], run['windows'], run['stats'])
+    if keep_plan:
+        row['plan'], row['plan_windows'] = compact_plan(run['cols'], run['plan']), run['windows']
+    return row
+
+def _emit(rows, on_plan):
+    # 把 keep_plan 带回的紧凑计划与清洗窗口交给 on_plan(电站, 计划, 窗口)，结果行中不保留
+    for row in rows:
+        plan, wins = row.pop('plan', None), row.pop('plan_windows', None)
+        if on_plan is not None and plan is not None:
+            on_plan(row['station'], plan, wins)
+    return rows
+
+def _fleet_cells(stations, names):
+    # 同一天气网格内的电站共用一份预报：请求数与缓存条目数随网格数增长，而不是电站数
+    centers, cell_of = snap_coords([(float(stations[n]['lat']), float(stations[n]['lon'])) for n in names])
+    m = metrics()
+    m.count("fleet.stations", len(names))
+    m.count("fleet.cells", len(centers))
+    return centers, cell_of
+
+def _fetch_all(centers, days, fetch, hourly):
+    if fetch is None:
+        return fetch_weather_bulk(centers, days, columns=True, hourly=hourly)
+    with ThreadPoolExecutor(max_workers=min(FLEET_IO_WORKERS, len(centers))) as io_pool:
+        return list(io_pool.map(lambda c: fetch(c[0], c[1], days), centers))
+
+def plan_fleet_hourly_rows(stations=None, days=14, defaults=FLEET_DEFAULTS, fetch=None, on_plan=None):
+    # 逐小时模式：预测期小时数相同的电站拼成 (电站 × 小时) 数组，一次向量化计算。
+    # fetch 需返回 ((逐日, 逐小时帧), 来源)，如 weather.fetch_weather_hourly
+    if stations is None:
+        stations = fleet_stations()
+    if not stations:
+        return []
+    
+    names = list(stations)
+    centers, cell_of = _fleet_cells(stations, names)
+    by_cell = _fetch_all(centers, days, fetch, hourly=True)
+    results = [by_cell[k] for k in cell_of]
+    setups = [station_setup(stations[n], defaults) for n in names]
+    groups = {}
+    for i, ((_, hourly), _) in enumerate(results):
+        groups.setdefault(len(hourly['hour']), []).append(i)
+    
+    rows = [None] * len(names)
+    for members in groups.values():
+        hours = [results[i][0][1] for i in members]
+        stack = lambda k: np.stack([h[k] for h in hours])
+        cfg = {k: np.array([setups[i][0][k] for i in members]) for k in ("panels", "capacity", "robots")}
+        cfg['model'] = stack_models([setups[i][0] for i in members])
+        econ = {k: np.array([setups[i][1][k] for i in members]) for k in ("sell", "water", "elec")}
+        plan, stats = run_engine_hourly_batch(
+            np.stack([hourly_day_index(h) for h in hours]), stack('hour'), stack('rain'), stack('wind'),
+            stack('radiation_mj'), stack('humidity'), cfg, econ
+        )
+        for j, i in enumerate(members):
+            (weather, hourly), source = results[i]
+            st_cfg, st_econ = setups[i]
+            st_plan = {k: v[j] for k, v in plan.items()}
+            summary, idx = daily_plan(weather, hourly, st_plan)
+            wins = hourly_windows(hourly, st_plan, idx, engine_params(st_cfg, st_econ)[1], len(summary['clean']))
+            st_stats = {
+                "total_cost": float(stats['total_cost'][j]), "count": int(stats['count'][j]),
+                "duration": max(window_days(wins), default=0)
+            }
+            row = station_kpis(names[i], weather_columns(weather), source, st_cfg, summary,
+                               {"start": np.flatnonzero(summary['clean'])}, st_stats)
+            row.update(robot_hours=int(stats['robot_hours'][j]), workable_hours=int(stats['workable_hours'][j]))
+            if on_plan is not None:
+                row['plan'], row['plan_windows'] = compact_plan(weather, summary), wins
+            rows[i] = row
+    return _emit(rows, on_plan)
+
+def plan_fleet_pool_rows(stations=None, days=14, defaults=FLEET_DEFAULTS, fetch=None, mode="auto", on_plan=None):
+    # 共享机器人池：相邻电站的机器人统一调度（见 pool.py）。
+    # 返回 (各站结果行, 机群汇总)；结果行另含 borrowed（调入机器人台次）、pool_gain（共享机器人带来的增益）
+    # 与 schedule_gain（只用自有机器人时优于独立贪心计划的部分），见 pool.py
+    if stations is None:
+        stations = fleet_stations()
+    if not stations:
+        return [], {"net": 0.0, "standalone": 0.0, "schedule_gain": 0.0, "gain": 0.0, "borrowed": 0, "groups": []}
+    
+    names = list(stations)
+    centers, cell_of = _fleet_cells(stations, names)
+    by_cell = _fetch_all(centers, days, fetch, hourly=False)
+    results = [by_cell[k] for k in cell_of]
+    setups = [station_setup(stations[n], defaults) for n in names]
+    # 各站预测天数不同（如部分回退到缓存）时按最短的对齐
+    cols = [weather_columns(weather) for weather, _ in results]
+    n = min(len(c['rain']) for c in cols)
+    cols = [{k: v[:n] for k, v in c.items()} for c in cols]
+    coords = [(float(stations[name]['lat']), float(stations[name]['lon'])) for name in names]
+    res = plan_pool(cols, setups, coords, mode)
+    
+    rows = []
+    for name, c, (_, source), (cfg, _), st in zip(names, cols, results, setups, res['stations']):
+        row = station_kpis(name, c, source, cfg, st['plan'], st['windows'], st['stats'])
+        row.update(borrowed=int(st['windows']['borrowed'].sum()), pool_gain=st['stats']['net'] - st['stats']['own'],
+                   schedule_gain=st['stats']['own'] - st['stats']['standalone'])
+        if on_plan is not None:
+            # 借调机器人的窗口更短：导出按共享池选定档位的实际起止日
+            row['plan'], row['plan_windows'] = compact_plan(c, st['plan']), st['windows']
+        rows.append(row)
+    summary = {
+        "net": res['net'], "standalone": res['standalone'], "schedule_gain": res['schedule_gain'], "gain": res['gain'],
+        "borrowed": res['borrowed'],
+        "groups": [
+            {"stations": [names[k] for k in g['members']], "robots": g['robots'], "mode": g['mode'],
+             "peak": int(g['used'].max(initial=0))} for g in res['groups']
+        ]
+    }
+    return _emit(rows, on_plan), summary
+
+def plan_fleet_rows(stations=None, days=14, defaults=FLEET_DEFAULTS, fetch=None, cpu_workers=None, rolling=None,
+                    on_plan=None, mode="greedy"):
+    # 默认走批量天气接口（N 个网格约 1 次往返）；传入 fetch 时改为逐网格并发请求。
+    # 引擎（CPU 密集）走进程池，每个电站的天气一到就提交，总耗时取决于最慢的电站。
+    # 传入 RollingPlanner 时在本进程内增量重算（每站只算预报变化的天数），适合按小时刷新。
+    # on_plan(电站, 紧凑计划, 清洗窗口) 按电站顺序逐个回调，如 PlanExporter.write。
+    # mode 为逐日引擎模式（逐小时见 plan_fleet_hourly_rows）；增量重算只支持贪心规则
+    if mode not in FLEET_MODES:
+        raise ValueError(f"unknown fleet mode {mode!r}, expected one of {', '.join(FLEET_MODES)}")
+    if rolling is not None and mode != "greedy":
+        raise ValueError("rolling replanning only supports the greedy mode")
+    if stations is None:
+        stations = fleet_stations()
+    if not stations:
+        return []
+    
+    names = list(stations)
+    centers, cell_of = _fleet_cells(stations, names)
+    members = {}
+    for name, k in zip(names, cell_of.tolist()):
+        members.setdefault(k, []).append(name)
+    jobs = {}
+    keep = on_plan is not None
+    with ProcessPoolExecutor(max_workers=cpu_workers) as cpu_pool:
+        def submit(name, result):
+            weather, source = result
+            cfg, econ = station_setup(stations[name], defaults)
+            if rolling is not None:
+                jobs[name] = _plan_rolling(rolling, name, weather, source, cfg, econ, keep)
+            else:
+                jobs[name] = cpu_pool.submit(plan_station, name, weather_columns(weather), source, cfg, econ, keep, mode)
+        
+        if fetch is None:
+            for k, result in enumerate(fetch_weather_bulk(centers, days, columns=True)):
+                for name in members[k]:
+                    submit(name, result)
+        else:
+            with ThreadPoolExecutor(max_workers=min(FLEET_IO_WORKERS, len(centers))) as io_pool:
+                fetches = {io_pool.submit(fetch, lat, lon, days): k for k, (lat, lon) in enumerate(centers)}
+                for fut in as_completed(fetches):
+                    for name in members[fetches[fut]]:
+                        submit(name, fut.result())
+        
+        rows = [jobs[name] if rolling is not None else jobs[name].result() for name in names]
+    return _emit(rows, on_plan)
+
+def plan_fleet(stations=None, days=14, defaults=FLEET_DEFAULTS, fetch=None, cpu_workers=None, rolling=None,
+               on_plan=None, mode="greedy"):
+    import pandas as pd
+    
+    return pd.DataFrame(plan_fleet_rows(stations, days, defaults, fetch, cpu_workers, rolling, on_plan, mode))
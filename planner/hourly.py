@@ -0,0 +1,214 @@
+import numpy as np
+
+from .constants import (
+    CARBON_FACTOR, HOTSPOT_THRESHOLD, MAX_DUST_CAPACITY, MUD_RISK_HUMIDITY, ROBOT_AVAILABILITY_RATE,
+    ROBOT_DAILY_WORK_HOURS, ROBOT_EFFICIENCY_PANELS_PER_HOUR, ROBOT_WORK_START_HOUR, WIND_SAFETY_LIMIT,
+)
+from .engine import (
+    DEFAULT_MODEL, REASON_ECONOMIC, REASON_HOTSPOT, REASONS, _per_row, engine_params, engine_params_batch,
+    model_params, weather_columns,
+)
+
+# ================= ⏱️ 逐小时调度引擎 =================
+# 逐日引擎按日最大风速整天取消开工，并按固定每天 10 小时折算清洗周期；
+# 逐小时引擎只在作业时段内、风速安全且无降雨的小时推进清洗（机器人·小时），积灰按小时递推，
+# 大风天的早晨等可用时段不再被浪费。电站 × 小时数组一次计算：按小时循环，每步对全部电站向量运算。
+HOURS_PER_DAY = 24
+DRY_RAIN_MM = 0.1          # 小时雨量低于此值视为无雨：可以作业，也不冲刷积灰
+NO_FINISH = 999_999
+
+def robot_hours_needed(cfg):
+    # 全场清洗一遍所需的作业小时数（全部机器人并行）
+    panels = np.asarray(cfg['panels'], dtype=float)
+    per_hour = np.asarray(cfg['robots'], dtype=float) * ROBOT_AVAILABILITY_RATE * ROBOT_EFFICIENCY_PANELS_PER_HOUR
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(per_hour > 0, np.ceil(panels / np.where(per_hour > 0, per_hour, 1)), NO_FINISH).astype(np.int64)
+
+def _day_sums(values, day):
+    # 每行按日分组求和并广播回各小时（day 为行内的日序号）
+    s = values.shape[0]
+    n_days = int(day.max()) + 1 if day.size else 1
+    key = day + np.arange(s)[:, None] * n_days
+    return np.bincount(key.ravel(), weights=values.ravel(), minlength=s * n_days)[key]
+
+def hourly_terms(day, hour, rain, wind, rad_mj, hum, cap_mw, model=None):
+    # 与调度状态无关的逐小时量，形状均为 (电站, 小时)；model 见 engine.DEFAULT_MODEL，值为标量或 (电站,)
+    m = {k: _per_row(v, rain) for k, v in (model or DEFAULT_MODEL).items()}
+    wet = rain >= DRY_RAIN_MM
+    # 一场降雨（连续有雨的小时）的累计雨量沿用逐日阈值：达到大雨阈值即冲净，小雨每场只折半一次
+    cs = np.cumsum(rain, axis=1)
+    event = np.where(wet, cs - np.maximum.accumulate(np.where(wet, 0.0, cs), axis=1), 0.0)
+    prev = np.pad(event[:, :-1], ((0, 0), (1, 0)))
+    heavy = event >= m['heavy_rain']
+    gen = cap_mw[:, None] * (rad_mj / 3.6) * 1000
+    return {
+        "heavy": heavy,
+        "light": (event >= m['light_rain']) & (prev < m['light_rain']) & ~heavy,
+        "rate": np.where((hum > MUD_RISK_HUMIDITY) & ~wet,
+                         m['dust_rate'] * m['mud_factor'], m['dust_rate']) / HOURS_PER_DAY,
+        "soil_k": 1 + (1 - _day_sums(rad_mj, day) / 20) * (m['soiling_factor'] - 1),
+        "gen": gen, "day_gen": _day_sums(gen, day),
+        "workable": ((hour >= ROBOT_WORK_START_HOUR) & (hour < ROBOT_WORK_START_HOUR + ROBOT_DAILY_WORK_HOURS)
+                     & (wind <= WIND_SAFETY_LIMIT) & ~wet)
+    }
+
+def campaign_finish(workable, need):
+    # 第 i 小时开工时，累计完成 need 个作业小时的那个小时；预测期内无法完成时为 H。
+    # 各行的累计作业小时加上互不重叠的偏移后拼成一个有序数组，一次二分查找
+    s, h = workable.shape
+    cw = np.cumsum(workable, axis=1)
+    target = cw - workable + need[:, None]
+    width = h + int(need.max(initial=0)) + 2
+    offs = np.arange(s)[:, None] * width
+    pos = np.searchsorted((cw + offs).ravel(), (target + offs).ravel()).reshape(s, h)
+    return np.minimum(pos - np.arange(s)[:, None] * h, h)
+
+def run_engine_hourly_batch(day, hour, rain, wind, rad_mj, hum, cfg, econ):
+    # day / hour / 天气为 (H,) 或 (S, H)，cfg / econ 的值为标量或 (S,)。
+    # 触发规则与逐日引擎相同（热斑 / 三天损失超过清洗成本），但只能在可作业小时开工，
+    # 清洗在完成所需作业小时后结束，次一小时积灰复位
+    weather = [np.atleast_2d(np.asarray(x, dtype=float)) for x in (rain, wind, rad_mj, hum)]
+    day, hour = (np.atleast_2d(np.asarray(x, dtype=np.int64)) for x in (day, hour))
+    need = robot_hours_needed(cfg)
+    _, single_cost = engine_params_batch(cfg, econ)
+    cap_mw = np.asarray(cfg['capacity'], dtype=float)
+    p_sell = np.asarray(econ['sell'], dtype=float)
+    s = np.broadcast_shapes(weather[0].shape[:1], day.shape[:1], need.shape, single_cost.shape, cap_mw.shape, p_sell.shape)[0]
+    n = weather[0].shape[1]
+    rain, wind, rad_mj, hum = (np.broadcast_to(x, (s, n)) for x in weather)
+    day, hour = (np.broadcast_to(x, (s, n)) for x in (day, hour))
+    need, single_cost, cap_mw, p_sell = (np.broadcast_to(x, (s,)) for x in (need, single_cost, cap_mw, p_sell))
+
+    terms = hourly_terms(day, hour, rain, wind, rad_mj, hum, cap_mw, model_params(cfg))
+    heavy, light, rate, soil_k = terms['heavy'], terms['light'], terms['rate'], terms['soil_k']
+    workable, day_gen = terms['workable'], terms['day_gen']
+    finish = campaign_finish(workable, need)
+
+    dust_arr = np.empty((s, n))
+    loss_arr = np.empty((s, n))
+    hot_spot = np.empty((s, n), dtype=bool)
+    reason = np.zeros((s, n), dtype=np.int8)
+    reset = np.empty((s, n), dtype=bool)
+    end = np.full((s, n), -1, dtype=np.int64)
+
+    trigger_cost = single_cost * 1.1
+    dust = np.zeros(s)
+    last_end = np.full(s, -999, dtype=np.int64)
+
+    for i in range(n):
+        dust = np.where(heavy[:, i], 0.0, np.where(light[:, i], dust * 0.5, dust + rate[:, i]))
+        dust = np.minimum(dust, MAX_DUST_CAPACITY)
+        loss = np.minimum((dust / 100) * soil_k[:, i], 1.0)
+
+        just_cleaned = last_end == i - 1
+        hot = dust > HOTSPOT_THRESHOLD
+        can = (i > last_end) & workable[:, i] & (finish[:, i] + 1 < n)
+        by_hot = can & hot
+        by_econ = can & ~hot & (day_gen[:, i] * loss * p_sell * 3.0 > trigger_cost)
+        start = by_hot | by_econ
+        reason[:, i] = np.where(by_hot, REASON_HOTSPOT, np.where(by_econ, REASON_ECONOMIC, 0))
+        end[:, i] = np.where(start, finish[:, i], -1)
+        last_end = np.where(start, finish[:, i], last_end)
+
+        dust = np.where(just_cleaned, 0.2, dust)
+        loss = np.where(just_cleaned, 0.002, loss)
+        dust_arr[:, i], loss_arr[:, i], hot_spot[:, i], reset[:, i] = dust, loss, hot, just_cleaned
+
+    clean = reason > 0
+    # 清洗进行中的可作业小时（机器人实际作业的时段）
+    marks = np.zeros((s, n + 1), dtype=np.int64)
+    rows, cols = np.nonzero(clean)
+    np.add.at(marks, (rows, cols), 1)
+    np.add.at(marks, (rows, end[rows, cols] + 1), -1)
+    working = (np.cumsum(marks[:, :n], axis=1) > 0) & workable
+
+    cost = np.where(clean, single_cost[:, None], 0.0)
+    actual_gen = terms['gen'] * (1 - loss_arr)
+    revenue = actual_gen * p_sell[:, None]
+    net = revenue - cost
+    plan = {
+        "dust": dust_arr, "loss": loss_arr, "clean": clean, "reason": reason, "reset": reset,
+        "end": end, "working": working, "workable": workable, "gen": terms['gen'],
+        "revenue": revenue, "cost": cost, "net": net,
+        "carbon": (actual_gen * CARBON_FACTOR) / 1000, "hot_spot": hot_spot
+    }
+    return plan, {
+        "net": net.sum(axis=1), "total_cost": cost.sum(axis=1), "count": clean.sum(axis=1),
+        "robot_hours": need, "workable_hours": workable.sum(axis=1)
+    }
+
+def hourly_day_index(hourly):
+    return np.unique(np.asarray(hourly['date'], dtype=str), return_inverse=True)[1]
+
+def run_engine_hourly(hourly, cfg, econ):
+    plan, stats = run_engine_hourly_batch(
+        hourly_day_index(hourly), hourly['hour'], hourly['rain'], hourly['wind'],
+        hourly['radiation_mj'], hourly['humidity'], cfg, econ
+    )
+    return {k: v[0] for k, v in plan.items()}, {k: v[0] for k, v in stats.items()}
+
+def daily_plan(weather, hourly, plan):
+    # 逐小时计划汇总为逐日计划（字段与 run_engine_arrays 的 plan 相同，可直接用于 plan_columns）
+    cols = weather_columns(weather)
+    dates = np.asarray(cols['date'], dtype=str)
+    n = len(dates)
+    pos = np.searchsorted(dates, np.asarray(hourly['date'], dtype=str))
+    known = pos < n
+    known[known] = dates[pos[known]] == np.asarray(hourly['date'], dtype=str)[known]
+    idx = np.where(known, pos, n)   # 末位：不在逐日范围内的小时
+
+    def total(x):
+        return np.bincount(idx, weights=np.asarray(x, dtype=float), minlength=n + 1)[:n]
+
+    last = np.full(n + 1, -1)
+    np.maximum.at(last, idx, np.arange(len(idx)))
+    last = last[:n]
+    gen = total(plan['gen'])
+    hours = np.maximum(total(np.ones(len(idx))), 1)
+    reason = np.zeros(n + 1, dtype=np.int8)
+    np.maximum.at(reason, idx, plan['reason'])
+    return {
+        "rain": np.asarray(cols['rain'], dtype=float), "wind": np.asarray(cols['wind'], dtype=float),
+        "radiation_kwh": np.asarray(cols['radiation_mj'], dtype=float) / 3.6,
+        "dust": np.where(last >= 0, plan['dust'][np.maximum(last, 0)], 0.0),   # 当日结束时
+        "loss": np.where(gen > 0, 1 - total(plan['gen'] * (1 - plan['loss'])) / np.where(gen > 0, gen, 1),
+                         total(plan['loss']) / hours),                         # 按发电量加权
+        "clean": reason[:n] > 0, "reason": reason[:n], "reset": total(plan['reset']) > 0,
+        "revenue": total(plan['revenue']), "cost": total(plan['cost']), "net": total(plan['net']),
+        "carbon": total(plan['carbon']), "hot_spot": total(plan['hot_spot']) > 0,
+        "safety": np.asarray(cols['wind'], dtype=float) > WIND_SAFETY_LIMIT,
+        "work_hours": total(plan['working']), "workable_hours": total(plan['workable'])
+    }, idx
+
+def hourly_windows(hourly, plan, idx, single_cost, days):
+    # idx 为 daily_plan 返回的逐日序号，不在逐日范围内的小时为 days：
+    # 开工小时不在范围内的窗口不计入逐日计划，结束在范围之后的截到最后一天（start_time / end_time 仍为实际时刻）
+    starts = np.flatnonzero(plan['clean'] & (idx < days))
+    ends = plan['end'][starts]
+    times = [f"{d} {h:02d}:00" for d, h in zip(np.asarray(hourly['date'], dtype=str).tolist(),
+                                                np.asarray(hourly['hour']).tolist())]
+    return [
+        {"start": int(idx[s]), "end": int(min(idx[e], days - 1)), "reason": REASONS[plan['reason'][s]],
+         "cost": float(single_cost), "start_time": times[s], "end_time": times[e], "hours": e - s + 1}
+        for s, e in zip(starts.tolist(), ends.tolist())
+    ]
+
+def window_days(wins):
+    # 各窗口实际跨越的日历天数（逐小时窗口起止在任意小时，长度不等于按日规则的周期）
+    return [w['end'] - w['start'] + 1 for w in wins]
+
+def plan_hourly(weather, hourly, cfg, econ):
+    # 单站逐小时规划：返回 (逐日汇总计划, 清洗窗口记录, 统计)，与逐日引擎的输出形式一致
+    plan, stats = run_engine_hourly(hourly, cfg, econ)
+    summary, idx = daily_plan(weather, hourly, plan)
+    _, single_cost = engine_params(cfg, econ)
+    gusty = np.append(summary['safety'], False)[idx]
+    wins = hourly_windows(hourly, plan, idx, single_cost, len(summary['clean']))
+    spans = window_days(wins)
+    # duration 为最长窗口跨越的天数，window_days 为各窗口的天数
+    return summary, wins, {
+        "total_cost": float(stats['total_cost']), "count": int(stats['count']), "duration": max(spans, default=0),
+        "window_days": spans,
+        "robot_hours": int(stats['robot_hours']), "workable_hours": int(stats['workable_hours']),
+        "recovered_hours": int(np.count_nonzero(plan['workable'] & gusty))
+    }
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .engine import run_engine, weather_columns
+
+# ================= 🧮 引擎结果记忆化 =================
+# Streamlit 每次控件交互都会重跑整个脚本：规划输入（天气、cfg、econ、策略）不变时，
+# 引擎结果与由它派生的展示对象（表格帧、图表）直接复用，筛选 / 排序只付出表格渲染的代价。
+# 进程内 LRU，条目数有上限，并记录命中 / 未命中次数。
+MEMO_MAX_ENTRIES = 128
+ENGINE_KEYS = ("rain", "wind", "radiation_mj", "humidity")
+
+def engine_key(weather, cfg, econ, mode="greedy", hourly=None):
+    # 只对影响引擎结果的列取摘要（图标、温度等展示字段不参与）
+    cols = weather_columns(weather)
+    h = hashlib.blake2b(digest_size=16)
+    h.update("\x1f".join(map(str, cols['date'])).encode())
+    for k in ENGINE_KEYS:
+        h.update(np.asarray(cols[k], dtype=float).tobytes())
+    if hourly is not None:
+        h.update(np.asarray(hourly['hour'], dtype=np.int64).tobytes())
+        for k in ENGINE_KEYS:
+            h.update(np.asarray(hourly[k], dtype=float).tobytes())
+    h.update(json.dumps([cfg, econ, mode], sort_keys=True, default=float).encode())
+    return h.hexdigest()
+
+class EngineMemo:
+    def __init__(self, max_entries=MEMO_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        # 返回的对象在多次重跑间共享，调用方不得原地修改
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits, "misses": self.misses, "size": len(self._data),
+                "max_entries": self.max_entries, "hit_rate": self.hits / total if total else 0.0
+            }
+
+_default_memo = None
+_default_lock = threading.Lock()
+
+def default_memo():
+    global _default_memo
+    with _default_lock:
+        if _default_memo is None:
+            _default_memo = EngineMemo()
+        return _default_memo
+
+def run_engine_cached(weather, cfg, econ, mode="greedy", memo=None, hourly=None):
+    # 与 run_engine 返回值相同 (df, wins, stats)，另返回键，供派生对象（表格、图表）按同一键缓存
+    memo = memo or default_memo()
+    key = engine_key(weather, cfg, econ, mode, hourly)
+    return key, memo.get(key, lambda: run_engine(weather, cfg, econ, mode, hourly))
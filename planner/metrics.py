@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+# ================= 🔬 运行时度量 =================
+# 记录各阶段墙钟耗时（获取、解析、模拟、引擎、图表、表格）与事件计数（缓存命中、数据来源）。
+# 默认关闭：stage() 返回共享的空上下文，count() 只做一次布尔判断，开销可忽略。
+# 环境变量 PLANNER_METRICS=1 或 enable() 打开；进程内全局一份，供命令行与基准使用。
+# 多会话的页面用 bind_metrics() 为当前线程（上下文）换上会话自己的记录器，各会话的开关与计数互不影响。
+_NULL_STAGE = nullcontext()
+
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+
+    def enable(self, on=True):
+        self.enabled = on
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def stage(self, name):
+        # with metrics().stage("engine"): ...
+        return self._timed(name) if self.enabled else _NULL_STAGE
+
+    @contextmanager
+    def _timed(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t)
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            s = self._stages.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+            s['count'] += 1
+            s['total'] += seconds
+            s['max'] = max(s['max'], seconds)
+            s['last'] = seconds
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "stages": {
+                    name: {
+                        "count": s['count'], "total_ms": round(s['total'] * 1e3, 3),
+                        "mean_ms": round(s['total'] / s['count'] * 1e3, 3),
+                        "max_ms": round(s['max'] * 1e3, 3), "last_ms": round(s['last'] * 1e3, 3)
+                    }
+                    for name, s in sorted(self._stages.items())
+                },
+                "counters": dict(sorted(self._counters.items()))
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix="planner"):
+        # Prometheus 文本格式（0.0.4）：阶段耗时为 _seconds_total / _calls_total / _seconds_max，事件为 _events_total
+        snap = self.snapshot()
+        lines = []
+
+        def family(name, kind, help_text, label, values):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.extend(f'{prefix}_{name}{{{label}="{key}"}} {value:.9g}' for key, value in values)
+
+        stages = snap['stages'].items()
+        family("stage_seconds_total", "counter", "Wall time spent in each stage.", "stage",
+               [(k, v['total_ms'] / 1e3) for k, v in stages])
+        family("stage_calls_total", "counter", "Number of times each stage ran.", "stage",
+               [(k, v['count']) for k, v in stages])
+        family("stage_seconds_max", "gauge", "Slowest single run of each stage.", "stage",
+               [(k, v['max_ms'] / 1e3) for k, v in stages])
+        family("events_total", "counter", "Cache and data-source events.", "event", snap['counters'].items())
+        return "\n".join(lines) + "\n"
+
+_metrics = Metrics(os.environ.get("PLANNER_METRICS", "") not in ("", "0"))
+_bound = ContextVar("planner_metrics", default=None)
+
+def metrics():
+    return _bound.get() or _metrics
+
+def bind_metrics(recorder):
+    # 当前上下文之后的 metrics() 都返回 recorder（None 恢复进程级记录器）；新线程不继承
+    _bound.set(recorder)
+    return recorder
@@ -0,0 +1,110 @@
+import numpy as np
+
+from .constants import (
+    MAX_DUST_CAPACITY, ROBOT_AVAILABILITY_RATE, ROBOT_DAILY_WORK_HOURS, ROBOT_EFFICIENCY_PANELS_PER_HOUR, WIND_SAFETY_LIMIT,
+)
+from .engine import daily_terms, engine_params, engine_params_batch, model_params, run_engine_arrays, weather_columns
+
+# ================= 🗓️ 清洗时机曲线 =================
+# “如果改在第 k 天开工呢？”：对每个候选开工日，只在该日开工清洗一次（窗口 duration 天）相对全程不清洗的净收益增量。
+# 窗口期间积灰照常，第 k + duration 天复位，所以增量只取决于复位日 r：先对每个 r 求出复位带来的发电收益 G(r)，
+# 任意窗口长度的曲线都是 G 平移后减去一次清洗成本，不必对每个开工日重跑引擎（O(天数²)）。
+# 复位后两条积灰轨迹之差 d 逐日按 d ← max(0, a·d - e) 演化：a 为雨水系数（大雨 0、小雨 0.5、其余 1），
+# e 为不清洗时积灰超出上限被截掉的部分。该映射的复合仍是 max(0, α·d - ε)，α、ε 可由前缀积 / 前缀和表示，
+# 于是 Σ 收益差 化为两个前缀和之差，d 归零的那天用一次二分查找定位（ε 的归一化前缀和单调不减）。
+# 复位日积灰本就低于 0.2（刚下过大雨）的少数情况轨迹之差为负，逐日递推到两条轨迹汇合为止（只在一段降雨间隔内）。
+# 损耗按积灰线性计算（积灰上限下损耗远小于 100%，引擎中的 min(·, 1) 不起作用）。
+OPPORTUNITY_MAX_ROBOTS = 200
+
+def reset_gain(rain, wind, rad_mj, hum, cfg, econ):
+    # 第 r 天积灰复位（前一天清洗窗口结束）带来的发电收益增量，不含清洗成本；形状 (天,)
+    n = len(rain)
+    if n == 0:
+        return np.zeros(0)
+    terms = daily_terms(rain, wind, rad_mj, hum, cfg['capacity'], model_params(cfg))
+    base, _, _ = run_engine_arrays(rain, wind, rad_mj, hum, cfg, econ, starts=())
+    y, loss = base['dust'], base['loss']
+    heavy, light, rate = terms['heavy'], terms['light'], terms['rate']
+    w = terms['gen'] * econ['sell'] * terms['soil_k'] / 100       # 每单位积灰差的当日收益
+
+    a = np.where(heavy, 0.0, np.where(light, 0.5, 1.0))
+    y_prev = np.concatenate(([0.0], y[:-1]))
+    u = y_prev + rate                                             # 无雨日的未截断积灰
+    dry = ~heavy & ~light
+    e = np.where(dry, np.maximum(u - MAX_DUST_CAPACITY, 0.0), 0.0)
+
+    # 以大雨日为界分段：段内 P(t) = 0.5^(段内小雨次数)，α_{r,t} = P(t)/P(r)，ε_{r,t} = P(t)·(E(t) - E(r))
+    idx = np.arange(n)
+    lights = np.cumsum(light & ~heavy)
+    seg_start = np.maximum.accumulate(np.where(heavy, idx, 0))
+    p = 0.5 ** (lights - lights[seg_start])
+    big_e = np.cumsum(e / p)
+    s1 = np.cumsum(w * p)
+    s2 = np.cumsum(w * p * big_e)
+    nxt = np.minimum.accumulate(np.where(heavy, idx, n)[::-1])[::-1]
+    next_heavy = np.concatenate((nxt[1:], [n]))                   # r 之后的第一个大雨日
+
+    d0 = y - 0.2
+    gain = terms['gen'] * econ['sell'] * (loss - 0.002)           # 复位当天
+    pos = d0 > 0
+    c = np.where(pos, d0 / p + big_e, 0.0)
+    zero_at = np.searchsorted(big_e, c, side="left")              # 第一个 E(t) ≥ c_r 的日子：差值归零
+    end = np.minimum(np.maximum(zero_at, idx + 1), next_heavy)    # 贡献区间 (r, end)
+    last = end - 1
+    gain += np.where(pos & (last > idx), c * (s1[last] - s1) - (s2[last] - s2), 0.0)
+
+    # 差值为负：d ← max(a·d, -(上限 - 未截断积灰))，清洗后的轨迹反而更高，直到两者汇合
+    headroom = np.where(dry, np.maximum(MAX_DUST_CAPACITY - u, 0.0), np.inf)
+    a_l, head_l, w_l = a.tolist(), headroom.tolist(), w.tolist()
+    for r in np.flatnonzero(~pos).tolist():
+        d, extra = d0[r], 0.0
+        for t in range(r + 1, n):
+            d = max(a_l[t] * d, -head_l[t])
+            if d == 0.0:
+                break
+            extra += w_l[t] * d
+        gain[r] += extra
+    return gain
+
+def robot_durations(panels, n, max_robots=OPPORTUNITY_MAX_ROBOTS):
+    # 1–max_robots 台机器人对应的不同清洗周期（能在预测期内完成的），及达到该周期所需的最少台数
+    robots = np.arange(1, max_robots + 1)
+    dur, _ = engine_params_batch({"panels": panels, "robots": robots}, {"water": 0.0, "elec": 0.0})
+    uniq, first = np.unique(dur, return_index=True)
+    keep = uniq < n
+    return uniq[keep], robots[first][keep]
+
+def opportunity_curve(weather, cfg, econ, durations=None):
+    # 返回 {"date", "duration": (R,), "robots": (R,), "gain": (R, 天), "current", "best"}：
+    # gain[i, k] 为第 k 天开工、窗口 duration[i] 天的净收益增量（不可开工处为 NaN：大风日或窗口超出预测期）；
+    # durations 缺省时取 1–200 台机器人的全部不同周期，current 为 cfg 自身周期所在行，best 为该行的最佳开工日
+    cols = weather_columns(weather)
+    rain = np.asarray(cols['rain'], dtype=float)
+    n = len(rain)
+    duration, single_cost = engine_params(cfg, econ)
+    if durations is None:
+        durations, robots = robot_durations(cfg['panels'], n)
+        if duration < n and duration not in durations:
+            durations, robots = np.append(durations, duration), np.append(robots, cfg['robots'])
+    else:
+        durations = np.asarray(durations, dtype=np.int64)
+        per_robot = ROBOT_AVAILABILITY_RATE * ROBOT_EFFICIENCY_PANELS_PER_HOUR * ROBOT_DAILY_WORK_HOURS
+        robots = np.ceil(cfg['panels'] / (durations * per_robot)).astype(np.int64)
+    order = np.argsort(durations)
+    durations, robots = durations[order], robots[order]
+
+    g = reset_gain(rain, cols['wind'], cols['radiation_mj'], cols['humidity'], cfg, econ)
+    safety = np.asarray(cols['wind'], dtype=float) > WIND_SAFETY_LIMIT
+    starts = np.arange(n)
+    reset = starts[None, :] + durations[:, None]
+    ok = (reset < n) & ~safety[None, :]
+    gain = np.where(ok, np.append(g, np.nan)[np.minimum(reset, n)] - single_cost, np.nan)
+
+    current = int(np.flatnonzero(durations == duration)[0]) if duration in durations else None
+    best = None
+    if current is not None and np.isfinite(gain[current]).any():
+        best = int(np.nanargmax(gain[current]))
+    return {
+        "date": list(cols['date']), "duration": durations, "robots": robots, "gain": gain,
+        "cost": single_cost, "current": current, "best": best
+    }
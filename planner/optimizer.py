@@ -0,0 +1,103 @@
+import numpy as np
+
+from .constants import HOTSPOT_THRESHOLD, MAX_DUST_CAPACITY
+from .engine import daily_terms, engine_params, model_params
+
+# ================= 🎯 全局最优调度（动态规划） =================
+# 与贪心规则相同的物理模型与约束：开工日不得大风停机、窗口须在预测期内完成、
+# 窗口互不重叠、空闲日积灰超过热斑阈值且可开工时必须开工。
+#
+# 积灰只取决于“上一次归零”之后的天气，因此以归零事件为 DP 节点：
+#   - 复位节点 r：窗口在 r-1 结束，r 日积灰 0.2、损耗 0.002；
+#   - 大雨节点 h：空闲期遇到大雨，积灰归零，此后所有空闲路径完全重合，只保留最优者。
+# 每个节点向前扫描到下一场大雨 / 被迫开工日为止（再加一个窗口长度），
+# 复杂度约为 O(天数 × (雨间隔 + 窗口长度))，一年的预测在毫秒级完成。
+NODE_INIT, NODE_RESET, NODE_RAIN = 0, 1, 2
+
+def optimal_starts(rain, wind, rad_mj, hum, cfg, econ):
+    rain = np.asarray(rain, dtype=float)
+    n = len(rain)
+    if n == 0:
+        return np.zeros(0, dtype=int), 0.0
+
+    p_sell = econ['sell']
+    duration, single_cost = engine_params(cfg, econ)
+    terms = daily_terms(rain, wind, rad_mj, hum, cfg['capacity'], model_params(cfg))
+    heavy, light, rate = terms['heavy'].tolist(), terms['light'].tolist(), terms['rate'].tolist()
+    soil_k, gen = terms['soil_k'].tolist(), terms['gen'].tolist()
+    allowed = (~terms['safety'] & (np.arange(n) + duration < n)).tolist()
+
+    neg = float("-inf")
+    best = {NODE_RESET: [neg] * (n + 1), NODE_RAIN: [neg] * n}
+    back = {NODE_RESET: [None] * (n + 1), NODE_RAIN: [None] * n}
+    final_value, final_back = neg, None
+
+    def scan(kind, t, base):
+        nonlocal final_value, final_back
+        # 第一段：空闲路径，直到大雨（并入大雨节点）、被迫开工或预测期末
+        dust = 0.0
+        vals = []
+        stop, forced, j = n, False, t
+        while j < n:
+            if j > t and heavy[j]:
+                stop = j
+                break
+            if kind == NODE_RESET and j == t:
+                dust, loss = 0.2, 0.002
+            else:
+                if heavy[j]: dust = 0.0
+                elif light[j]: dust *= 0.5
+                else: dust += rate[j]
+                dust = min(dust, MAX_DUST_CAPACITY)
+                loss = min((dust / 100) * soil_k[j], 1.0)
+            vals.append(gen[j] * (1 - loss) * p_sell)
+            if allowed[j] and dust > HOTSPOT_THRESHOLD:
+                stop, forced = j + 1, True
+                break
+            j += 1
+
+        # 第二段：窗口期内积灰照常变化，继续推演一个窗口长度供候选开工日使用
+        last = min(n, stop + duration - 1) if stop < n or forced else n
+        jj = t + len(vals)
+        while jj < last:
+            if heavy[jj]: dust = 0.0
+            elif light[jj]: dust *= 0.5
+            else: dust += rate[jj]
+            dust = min(dust, MAX_DUST_CAPACITY)
+            vals.append(gen[jj] * (1 - min((dust / 100) * soil_k[jj], 1.0)) * p_sell)
+            jj += 1
+
+        prefix = np.concatenate(([0.0], np.cumsum(vals))).tolist()
+        for s in range(t, stop):
+            if not allowed[s]:
+                continue
+            r = s + duration
+            value = base + prefix[r - t] - single_cost
+            if value > best[NODE_RESET][r]:
+                best[NODE_RESET][r], back[NODE_RESET][r] = value, (kind, t, s)
+
+        if forced:
+            return
+        if stop < n:
+            value = base + prefix[stop - t]
+            if value > best[NODE_RAIN][stop]:
+                best[NODE_RAIN][stop], back[NODE_RAIN][stop] = value, (kind, t, None)
+        else:
+            value = base + prefix[n - t]
+            if value > final_value:
+                final_value, final_back = value, (kind, t, None)
+
+    scan(NODE_INIT, 0, 0.0)
+    for t in range(1, n):
+        for kind in (NODE_RESET, NODE_RAIN):
+            if best[kind][t] > neg:
+                scan(kind, t, best[kind][t])
+
+    # 沿回溯指针还原开工日
+    starts, node = [], final_back
+    while node is not None:
+        kind, t, s = node
+        if s is not None:
+            starts.append(s)
+        node = back[kind][t] if kind != NODE_INIT else None
+    return np.array(sorted(starts), dtype=int), final_value
@@ -0,0 +1,404 @@
+import math
+from itertools import combinations
+
+import numpy as np
+
+from .constants import (
+    CARBON_FACTOR, HOTSPOT_THRESHOLD, MAX_DUST_CAPACITY, ROBOT_AVAILABILITY_RATE, ROBOT_DAILY_WORK_HOURS,
+    ROBOT_EFFICIENCY_PANELS_PER_HOUR,
+)
+from .engine import (
+    REASON_ECONOMIC, REASON_HOTSPOT, daily_terms, engine_params, run_engine_arrays, stack_models, weather_columns,
+)
+from .metrics import metrics
+from .registry import distance_km
+
+# ================= 🤝 共享机器人池 =================
+# 相邻电站（相距不超过 POOL_RADIUS_KM，按连通分量成组）共用一组机器人，逐日分配。
+# 每个清洗窗口可以选择机器人数量：人多则工期短，超出本站机器人的部分从邻站调来，
+# 调拨的机器人在窗口前后各占用 transfer_days 天在途，并按往返里程计费。
+# 风速停机、窗口须在预测期内完成、空闲日积灰超过热斑阈值且本站可开工时必须开工等规则与贪心引擎相同。
+#
+# 求解分两步：
+#   1. 每站生成候选计划：至多 MAX_WINDOWS 个窗口 × MAX_LEVELS 档机器人数量的全部组合，
+#      外加本站独立运行时的贪心计划；整个机群的候选一次批量回放，得到净收益与逐日机器人占用。
+#   2. 每组在“每日占用不超过池内机器人总数”的约束下为各站选一个候选：
+#      exact 为分支定界（在上述候选范围内最优），heuristic 为拉格朗日松弛（按日给机器人定价）+ 修复 + 局部搜索。
+# 两者都从“各站只用自有机器人”的可行解出发，结果不会差于各站独立的贪心计划。
+# 相对各站独立贪心计划（run_engine_arrays）的增益拆成两部分：schedule_gain 为各站只用自有机器人时
+# 候选计划优于贪心规则的部分（与共享无关），gain 为池化调度相对该起点的增益（没有调入机器人时为 0）。
+POOL_RADIUS_KM = 150.0
+TRANSFER_KM_PER_DAY = 150.0      # 机器人转运（公路 / 河运）每天的里程
+TRANSFER_COST_PER_KM = 0.5       # 每台机器人每公里的转运费用 (R$)
+MAX_WINDOWS = 2
+MAX_LEVELS = 4
+EXACT_MAX_STATIONS = 6
+HEURISTIC_MAX_MOVES = 4       # 局部搜索中每站平均换候选次数的上限
+HEURISTIC_ROUNDS = 60         # 拉格朗日松弛的迭代轮数
+POOL_MODES = ("auto", "exact", "heuristic")
+
+def pool_groups(coords, radius_km=POOL_RADIUS_KM):
+    # 距离不超过 radius_km 的电站连成一组（连通分量）；返回 (组列表, 各站到组内最近邻站的距离)
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    s = len(coords)
+    dist = distance_km(coords[:, None, 0], coords[:, None, 1], coords[None, :, 0], coords[None, :, 1])
+    np.fill_diagonal(dist, np.inf)
+    near = dist <= radius_km
+    group = np.full(s, -1)
+    groups = []
+    for i in range(s):
+        if group[i] >= 0:
+            continue
+        group[i], todo, members = len(groups), [i], []
+        while todo:
+            k = todo.pop()
+            members.append(k)
+            for j in np.flatnonzero(near[k] & (group < 0)).tolist():
+                group[j] = group[i]
+                todo.append(j)
+        groups.append(sorted(members))
+    return groups, dist.min(axis=1) if s > 1 else np.full(s, np.inf)
+
+def robots_for(panels, days):
+    # 在 days 天内洗完所需的最少机器人数（engine_params 的反算）
+    per_robot = ROBOT_AVAILABILITY_RATE * ROBOT_EFFICIENCY_PANELS_PER_HOUR * ROBOT_DAILY_WORK_HOURS
+    robots = max(1, math.ceil(panels / (per_robot * days)))
+    while engine_params({"panels": panels, "robots": robots}, {"water": 0.0, "elec": 0.0})[0] > days:
+        robots += 1
+    return robots
+
+def _levels(cfg, n, pool, km):
+    # 可选的 (机器人数, 工期, 借调数)：工期在 1 天到本站自有机器人的工期之间取 MAX_LEVELS 档
+    home = engine_params(cfg, {"water": 0.0, "elec": 0.0})[0]
+    top = min(home, n - 1)
+    if top < 1:
+        return []
+    levels = {}
+    for days in sorted({int(d) for d in np.linspace(1, top, MAX_LEVELS).round()}, reverse=True):
+        robots = robots_for(cfg['panels'], days)
+        borrowed = max(0, robots - cfg['robots'])
+        if robots <= pool and (borrowed == 0 or np.isfinite(km)):
+            actual = engine_params({"panels": cfg['panels'], "robots": robots}, {"water": 0.0, "elec": 0.0})[0]
+            levels.setdefault(actual, (robots, actual, borrowed))
+    return list(levels.values())
+
+def _candidates(n, level_ids, durations, greedy_starts, home_level):
+    # 单站候选计划的开工编码矩阵 (候选, 天)：0 为不开工，否则为档位编号（档位表第 0 项为占位）。
+    # 第 0 行为不清洗，最后一行为本站独立运行时的贪心计划
+    ids = np.asarray(level_ids, dtype=np.int32)
+    t1, g1 = (x.ravel() for x in np.meshgrid(np.arange(n), ids, indexing="ij"))
+    pairs = np.array(list(combinations(range(n), 2)) if MAX_WINDOWS >= 2 else [], dtype=np.int64).reshape(-1, 2)
+    p, q1, q2 = (x.ravel() for x in np.meshgrid(np.arange(len(pairs)), ids, ids, indexing="ij"))
+    pt1, pt2, pg1, pg2 = pairs[p, 0], pairs[p, 1], q1, q2
+    keep = pt2 >= pt1 + durations[pg1]    # 前一个窗口结束后才能开始下一个
+    pt1, pt2, pg1, pg2 = pt1[keep], pt2[keep], pg1[keep], pg2[keep]
+
+    m = 2 + len(t1) + len(pt1)
+    codes = np.zeros((m, n), dtype=np.int32)
+    rows = 1 + np.arange(len(t1))
+    codes[rows, t1] = g1
+    rows = 1 + len(t1) + np.arange(len(pt1))
+    codes[rows, pt1], codes[rows, pt2] = pg1, pg2
+    if home_level is not None:
+        codes[-1, greedy_starts] = home_level
+    return codes
+
+def _replay(codes, sid, terms, p_sell, home_dur, lev, record=False):
+    # 批量回放候选计划（每行一个候选，sid 为其所属电站）：返回可行性、净收益（record 时另含逐日数组）
+    m, n = codes.shape
+    dust = np.zeros(m)
+    last_end = np.full(m, -999, dtype=np.int64)
+    valid = np.ones(m, dtype=bool)
+    revenue = np.zeros(m)
+    cost = np.zeros(m)
+    sell = p_sell[sid]
+    days = {k: np.empty((m, n)) for k in ("dust", "loss", "revenue", "cost")} if record else None
+    flags = {k: np.zeros((m, n), dtype=bool) for k in ("hot_spot", "reset")} if record else None
+    reason = np.zeros((m, n), dtype=np.int8) if record else None
+
+    for i in range(n):
+        heavy, light = terms['heavy'][sid, i], terms['light'][sid, i]
+        dust = np.where(heavy, 0.0, np.where(light, dust * 0.5, dust + terms['rate'][sid, i]))
+        dust = np.minimum(dust, MAX_DUST_CAPACITY)
+        loss = np.minimum((dust / 100) * terms['soil_k'][sid, i], 1.0)
+
+        just_cleaned = last_end == i - 1
+        hot = dust > HOTSPOT_THRESHOLD
+        idle = i > last_end
+        safe = ~terms['safety'][sid, i]
+        code = codes[:, i]
+        start = code > 0
+        g = code
+        dur = lev['duration'][g]
+        ok = idle & safe & (i + dur < n) & ((lev['borrowed'][g] == 0) | (i >= lev['transfer_days'][g]))
+        valid &= ~start | ok
+        valid &= start | ~(idle & hot & safe & (i + home_dur[sid] < n))
+        last_end = np.where(start, i + dur - 1, last_end)
+        day_cost = np.where(start, lev['cost'][g], 0.0)
+        cost += day_cost
+
+        dust = np.where(just_cleaned, 0.2, dust)
+        loss = np.where(just_cleaned, 0.002, loss)
+        day_rev = terms['gen'][sid, i] * (1 - loss) * sell
+        revenue += day_rev
+        if record:
+            days['dust'][:, i], days['loss'][:, i], days['revenue'][:, i], days['cost'][:, i] = dust, loss, day_rev, day_cost
+            flags['hot_spot'][:, i], flags['reset'][:, i] = hot, just_cleaned
+            reason[:, i] = np.where(start, np.where(hot, REASON_HOTSPOT, REASON_ECONOMIC), 0)
+
+    out = {"valid": valid, "net": revenue - cost}
+    if record:
+        out.update(days, **flags, reason=reason)
+    return out
+
+def _occupancy(codes, lev):
+    # 候选计划的逐日机器人占用：窗口期 robots 台，调拨的 borrowed 台另占前后各 transfer_days 天在途
+    m, n = codes.shape
+    occ = np.zeros((m, n), dtype=np.int32)
+    reach = int(lev['duration'].max(initial=0) + 2 * lev['transfer_days'].max(initial=0))
+    for i in range(n):
+        code = codes[:, i]
+        rows = np.flatnonzero(code)
+        if not len(rows):
+            continue
+        g = code[rows]
+        dur, robots, borrowed, travel = lev['duration'][g], lev['robots'][g], lev['borrowed'][g], lev['transfer_days'][g]
+        for o in range(-int(lev['transfer_days'].max()), reach):
+            day = i + o
+            if not 0 <= day < n:
+                continue
+            amount = np.where(
+                o < 0, np.where(o >= -travel, borrowed, 0),
+                np.where(o < dur, robots, np.where(o < dur + travel, borrowed, 0))
+            )
+            occ[rows, day] += amount.astype(np.int32)
+    return occ
+
+def _pareto(values, occ):
+    # 去掉被支配的候选：存在净收益不低且每日占用都不多的其他候选
+    order = np.argsort(-values, kind="stable")
+    keep = []
+    for j in order.tolist():
+        if keep and (occ[keep] <= occ[j]).all(axis=1).any():
+            continue
+        keep.append(j)
+    return np.array(keep, dtype=np.int64)
+
+def _solve_exact(menus, cap, start):
+    # 分支定界：各站候选按净收益降序，剩余各站的最大净收益之和为上界
+    order = sorted(range(len(menus)), key=lambda k: -(menus[k][0][0] - menus[k][0][-1]))
+    rest = np.concatenate([np.cumsum([menus[k][0][0] for k in order][::-1])[::-1], [0.0]])
+    best = {"value": sum(menus[k][0][start[k]] for k in range(len(menus))), "pick": list(start)}
+    pick = [0] * len(menus)
+
+    def dfs(depth, resid, value):
+        if depth == len(order):
+            if value > best['value'] + 1e-9:
+                best['value'], best['pick'] = value, list(pick)
+            return
+        k = order[depth]
+        values, occ = menus[k]
+        for j in np.flatnonzero((occ <= resid).all(axis=1)).tolist():
+            if value + values[j] + rest[depth + 1] <= best['value'] + 1e-9:
+                break
+            pick[k] = j
+            dfs(depth + 1, resid - occ[j], value + values[j])
+
+    dfs(0, cap, 0.0)
+    return best['pick']
+
+def _improve(menus, cap, pick):
+    # 局部搜索：每步在所有电站中找出在剩余容量内换候选收益增加最多的一站，直到没有改进
+    pick = list(pick)
+    used = sum(menus[k][1][pick[k]] for k in range(len(menus)))
+    for _ in range(HEURISTIC_MAX_MOVES * len(menus)):
+        best = (1e-9, None, None)
+        for k, (values, occ) in enumerate(menus):
+            if values[0] - values[pick[k]] <= best[0]:
+                continue
+            resid = cap - (used - occ[pick[k]])
+            j = int(np.flatnonzero((occ <= resid).all(axis=1))[0])    # 候选按净收益降序，第一个可行者即最优
+            if values[j] - values[pick[k]] > best[0]:
+                best = (values[j] - values[pick[k]], k, j)
+        _, k, j = best
+        if k is None:
+            break
+        used = used - menus[k][1][pick[k]] + menus[k][1][j]
+        pick[k] = j
+    return pick
+
+def _solve_heuristic(menus, cap, start):
+    # 拉格朗日松弛：给每天的机器人定价 price，各站独立选 净收益 - 占用 × price 最大的候选；
+    # 按超用量做次梯度更新（Polyak 步长），每轮把松弛解修复为可行解并局部搜索，保留最好的可行解
+    total = lambda pick: sum(menus[k][0][j] for k, j in enumerate(pick))
+    best = _improve(menus, cap, start)
+    best_value = total(best)
+    price = np.zeros(len(cap))
+    theta, stall = 2.0, 0
+    for _ in range(HEURISTIC_ROUNDS):
+        scores = [values - occ @ price for values, occ in menus]
+        choice = [int(np.argmax(sc)) for sc in scores]
+        bound = sum(sc[j] for sc, j in zip(scores, choice)) + float(price @ cap)
+        over = sum(menus[k][1][j] for k, j in enumerate(choice)) - cap
+        if bound - best_value < 1e-6 * max(1.0, abs(best_value)):
+            break
+
+        # 修复：按松弛解收益从高到低依次选入，放不下时取剩余容量内净收益最高的候选
+        resid, pick = cap.copy(), [None] * len(menus)
+        for k in np.argsort([-(menus[k][0][j] - menus[k][0][start[k]]) for k, j in enumerate(choice)]).tolist():
+            values, occ = menus[k]
+            j = choice[k] if (occ[choice[k]] <= resid).all() else None
+            if j is None:
+                fits = np.flatnonzero((occ <= resid).all(axis=1))
+                if not len(fits):
+                    break
+                j = int(fits[0])
+            pick[k] = j
+            resid = resid - occ[j]
+        if None not in pick:
+            pick = _improve(menus, cap, pick)
+            if total(pick) > best_value + 1e-9:
+                best, best_value, stall = pick, total(pick), 0
+        stall += 1
+        if stall >= 3:
+            theta, stall = theta / 2, 0
+
+        if not (over > 0).any() and not (price[over < 0] > 0).any():
+            break
+        grad = over.astype(float)
+        grad[(price <= 0) & (grad < 0)] = 0.0
+        price = np.maximum(0.0, price + theta * (bound - best_value) / max(float(grad @ grad), 1.0) * grad)
+    return best
+
+def plan_pool(frames, setups, coords, mode="auto", radius_km=POOL_RADIUS_KM):
+    # frames: 各站列式天气（天数相同）；setups: [(cfg, econ)]；coords: [(lat, lon)]。
+    # 返回各站计划（字段同 run_engine_arrays）、窗口（含机器人数与借调数）、逐日机器人占用及机群汇总
+    if mode not in POOL_MODES:
+        raise ValueError(f"unknown pool mode {mode!r}, expected one of {', '.join(POOL_MODES)}")
+    cols = [weather_columns(f) for f in frames]
+    s = len(cols)
+    n = len(cols[0]['rain']) if s else 0
+    if any(len(c['rain']) != n for c in cols):
+        raise ValueError("共享机器人池要求各站预测天数相同")
+    if not s:
+        return {"stations": [], "groups": [], "net": 0.0, "standalone": 0.0, "own": 0.0, "schedule_gain": 0.0,
+                "gain": 0.0, "borrowed": 0}
+    groups, near_km = pool_groups(coords, radius_km)
+
+    with metrics().stage(f"pool.{mode}"):
+        stacked = {
+            k: np.stack([np.asarray(c[k], dtype=float) for c in cols]) for k in ("rain", "wind", "radiation_mj", "humidity")
+        }
+        cap_mw = np.array([cfg['capacity'] for cfg, _ in setups], dtype=float)
+        terms = daily_terms(stacked['rain'], stacked['wind'], stacked['radiation_mj'], stacked['humidity'], 1.0,
+                            stack_models([cfg for cfg, _ in setups]))
+        terms['gen'] = cap_mw[:, None] * terms['gen']
+        p_sell = np.array([econ['sell'] for _, econ in setups], dtype=float)
+        home_dur = np.array([engine_params(cfg, econ)[0] for cfg, econ in setups])
+        group_of = np.empty(s, dtype=np.int64)
+        for gi, members in enumerate(groups):
+            group_of[members] = gi
+        pools = [sum(setups[k][0]['robots'] for k in members) for members in groups]
+
+        # 档位表（全站共用编号，第 0 项为占位）与各站候选
+        lev = {k: [0] for k in ("robots", "duration", "borrowed", "transfer_days", "cost")}
+        codes, sid, greedy_net = [], [], np.empty(s)
+        for k, (cfg, econ) in enumerate(setups):
+            km = near_km[k]
+            travel = math.ceil(km / TRANSFER_KM_PER_DAY) if np.isfinite(km) else 0
+            single_cost = engine_params(cfg, econ)[1]
+            ids, home = [], None
+            for robots, days, borrowed in _levels(cfg, n, pools[group_of[k]], km):
+                ids.append(len(lev['robots']))
+                if days == home_dur[k]:
+                    home = ids[-1]
+                lev['robots'].append(robots)
+                lev['duration'].append(days)
+                lev['borrowed'].append(borrowed)
+                lev['transfer_days'].append(travel if borrowed else 0)
+                lev['cost'].append(single_cost + (borrowed * 2 * km * TRANSFER_COST_PER_KM if borrowed else 0.0))
+            c = cols[k]
+            greedy, wins, _ = run_engine_arrays(c['rain'], c['wind'], c['radiation_mj'], c['humidity'], cfg, econ)
+            greedy_net[k] = greedy['net'].sum()
+            cand = _candidates(n, ids, np.asarray(lev['duration']), wins['start'], home)
+            codes.append(cand)
+            sid.append(np.full(len(cand), k))
+        lev = {k: np.array(v, dtype=float if k == "cost" else np.int64) for k, v in lev.items()}
+        codes, sid = np.concatenate(codes), np.concatenate(sid)
+        bounds = np.searchsorted(sid, np.arange(s + 1))    # 第 k 站的候选为 bounds[k]:bounds[k + 1]，最后一个为贪心计划
+
+        res = _replay(codes, sid, terms, p_sell, home_dur, lev)
+        occ = _occupancy(codes, lev)
+        metrics().count("pool.candidates", len(codes))
+
+        # 各站候选菜单：只保留可行候选。起点为各站只用自有机器人时净收益最高的候选
+        # （每天占用不超过本站机器人数，组合必然可行，且不差于独立贪心计划）
+        own = (lev['borrowed'][codes] == 0).all(axis=1)
+        chosen = np.empty(s, dtype=np.int64)
+        alone_rows = np.empty(s, dtype=np.int64)
+        solved = []
+        for gi, members in enumerate(groups):
+            menus, index, start = [], [], []
+            exact = mode == "exact" or (mode == "auto" and len(members) <= EXACT_MAX_STATIONS)
+            for k in members:
+                rows = np.arange(bounds[k], bounds[k + 1])
+                rows = rows[res['valid'][rows]]
+                alone = rows[own[rows]]
+                alone = alone[np.argmax(res['net'][alone])]
+                alone_rows[k] = alone
+                if exact:
+                    rows = rows[_pareto(res['net'][rows], occ[rows])]
+                    if alone not in rows:
+                        rows = np.append(rows, alone)
+                rows = rows[np.argsort(-res['net'][rows], kind="stable")]
+                menus.append((res['net'][rows], occ[rows]))
+                index.append(rows)
+                start.append(int(np.flatnonzero(rows == alone)[0]))
+            cap = np.full(n, pools[gi], dtype=np.int32)
+            pick = (_solve_exact if exact else _solve_heuristic)(menus, cap, start)
+            for k, rows, j in zip(members, index, pick):
+                chosen[k] = rows[j]
+            solved.append("exact" if exact else "heuristic")
+
+        final = _replay(codes[chosen], sid[chosen], terms, p_sell, home_dur, lev, record=True)
+
+    stations = []
+    robots_by_day = occ[chosen]
+    for k in range(s):
+        code = codes[chosen[k]]
+        starts = np.flatnonzero(code)
+        g = code[starts]
+        rad = np.asarray(cols[k]['radiation_mj'], dtype=float)
+        revenue, cost, loss = final['revenue'][k], final['cost'][k], final['loss'][k]
+        actual_gen = terms['gen'][k] * (1 - loss)
+        plan = {
+            "rain": np.asarray(cols[k]['rain'], dtype=float), "wind": np.asarray(cols[k]['wind'], dtype=float),
+            "radiation_kwh": rad / 3.6, "dust": final['dust'][k], "loss": loss,
+            "clean": code > 0, "reason": final['reason'][k],
+            "reset": final['reset'][k], "revenue": revenue, "cost": cost, "net": revenue - cost,
+            "carbon": (actual_gen * CARBON_FACTOR) / 1000,
+            "hot_spot": final['hot_spot'][k], "safety": terms['safety'][k]
+        }
+        windows = {
+            "start": starts, "end": starts + lev['duration'][g] - 1, "reason": final['reason'][k][starts],
+            "cost": lev['cost'][g], "robots": lev['robots'][g], "borrowed": lev['borrowed'][g]
+        }
+        stations.append({
+            "plan": plan, "windows": windows, "robots": robots_by_day[k], "group": int(group_of[k]),
+            "stats": {
+                "total_cost": float(windows['cost'].sum()), "count": len(starts), "duration": int(home_dur[k]),
+                "net": float(final['net'][k]), "standalone": float(greedy_net[k]), "own": float(res['net'][alone_rows[k]])
+            }
+        })
+    net = float(final['net'].sum())
+    standalone = float(greedy_net.sum())
+    own = float(res['net'][alone_rows].sum())
+    return {
+        "stations": stations,
+        "groups": [
+            {"members": members, "robots": pools[gi], "mode": solved[gi],
+             "used": robots_by_day[members].sum(axis=0)} for gi, members in enumerate(groups)
+        ],
+        "net": net, "standalone": standalone, "own": own, "schedule_gain": own - standalone, "gain": net - own,
+        "borrowed": int(sum(int(st['windows']['borrowed'].sum()) for st in stations))
+    }
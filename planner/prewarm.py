@@ -0,0 +1,153 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .cache import default_cache
+from .fleet import FLEET_DEFAULTS, station_setup
+from .memo import default_memo, run_engine_cached
+from .metrics import metrics
+from .registry import default_stations, snap_coords
+from .weather import BULK_MAX_LOCATIONS, parse_forecast, parse_forecast_hourly, request_forecast_bulk
+
+# ================= 🔥 后台预热 =================
+# 与页面并行运行的刷新线程：在磁盘缓存到期前 PREWARM_LEAD 秒重新获取全部已登记电站的预报，
+# 并用新预报为每个电站预先计算默认参数下的计划（写入引擎记忆化，键与页面一致）。
+# 页面读到的总是未过期的缓存与已算好的计划，延迟不再取决于 Open-Meteo 的响应时间。
+# 同一网格的电站共用一次请求；批量请求的并发数有上限，每批随机延迟启动，失败的网格按指数退避重试。
+# 环境变量 PLANNER_PREWARM=0 关闭（页面随进程启动它）；modes=() 时只刷新磁盘缓存（命令行 --prewarm，供多个页面进程共用）。
+PREWARM_ENABLED = os.environ.get("PLANNER_PREWARM", "1") != "0"
+PREWARM_LEAD = 300           # 距缓存过期不足该秒数即刷新
+PREWARM_INTERVAL = 60        # 两轮检查之间的间隔（另加 ±20% 随机抖动）
+PREWARM_WORKERS = 2          # 同时进行的批量请求数
+PREWARM_JITTER = 10.0        # 每批请求启动前的随机延迟上限（秒）
+PREWARM_BACKOFF_MAX = 1800   # 失败重试的最长间隔
+PREWARM_MODES = ("greedy",)
+
+class Prewarmer:
+    def __init__(self, stations=None, days=14, defaults=FLEET_DEFAULTS, cache=None, memo=None, modes=PREWARM_MODES,
+                 lead=PREWARM_LEAD, interval=PREWARM_INTERVAL, workers=PREWARM_WORKERS, jitter=PREWARM_JITTER,
+                 request=request_forecast_bulk):
+        # 电站数 × 模式数超过记忆化容量时，早算好的计划会被挤出，应相应调大 MEMO_MAX_ENTRIES
+        self.stations = dict(default_stations() if stations is None else stations)
+        self.days, self.defaults, self.modes = days, defaults, tuple(modes)
+        self.cache = cache or default_cache()
+        self.memo = memo or default_memo()
+        self.lead, self.interval, self.workers, self.jitter = lead, interval, workers, jitter
+        self.request = request
+        names = list(self.stations)
+        coords = [(float(self.stations[n]['lat']), float(self.stations[n]['lon'])) for n in names]
+        centers, cell_of = snap_coords(coords) if names else ([], np.zeros(0, np.int64))
+        self.cells = {}
+        for name, k in zip(names, cell_of.tolist()):
+            self.cells.setdefault(centers[k], []).append(name)
+        self.stats = {"cycles": 0, "refreshed": 0, "errors": 0, "plans": 0, "last_cycle": None, "last_error": None}
+        self._planned = {}       # 电站 -> 计划所用预报的时间戳
+        self._retry = {}         # 网格 -> (下次重试时间, 连续失败次数)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def due(self, now=None):
+        # 缓存缺失或即将过期、且不在退避期内的网格
+        now = time.time() if now is None else now
+        out = []
+        for cell in self.cells:
+            issued = self.cache.issued(*cell, self.days)
+            if issued is not None and now - issued < self.cache.ttl - self.lead:
+                continue
+            if self._retry.get(cell, (0, 0))[0] > now:
+                continue
+            out.append(cell)
+        return out
+
+    def _fetch_chunk(self, chunk):
+        time.sleep(random.uniform(0, self.jitter))
+        if self._stop.is_set():
+            return 0
+        try:
+            payloads = self.request(chunk, self.days)
+        except Exception as exc:
+            with self._lock:
+                for cell in chunk:
+                    fails = self._retry.get(cell, (0, 0))[1] + 1
+                    self._retry[cell] = (time.time() + min(PREWARM_BACKOFF_MAX, self.interval * 2 ** fails), fails)
+                self.stats['errors'] += 1
+                self.stats['last_error'] = f"{type(exc).__name__}: {exc}"
+            metrics().count("prewarm.error")
+            return 0
+        for cell, data in zip(chunk, payloads):
+            self.cache.put(*cell, self.days, data)
+        with self._lock:
+            for cell in chunk:
+                self._retry.pop(cell, None)
+        metrics().count("prewarm.refreshed", len(chunk))
+        return len(chunk)
+
+    def refresh(self, cells):
+        # 到期网格按 BULK_MAX_LOCATIONS 分批，最多 workers 批同时请求
+        chunks = [cells[i:i + BULK_MAX_LOCATIONS] for i in range(0, len(cells), BULK_MAX_LOCATIONS)]
+        if not chunks:
+            return 0
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks)), thread_name_prefix="prewarm") as pool:
+            done = sum(pool.map(self._fetch_chunk, chunks))
+        self.stats['refreshed'] += done
+        return done
+
+    def warm_plans(self):
+        # 预报更新过的电站重新计算计划；直接读缓存解析，不经过 fetch_weather（不计入页面的缓存计数）
+        count = 0
+        if not self.modes:
+            return count
+        for cell, names in self.cells.items():
+            issued = self.cache.issued(*cell, self.days)
+            todo = [n for n in names if issued is not None and self._planned.get(n) != issued]
+            hit = self.cache.get(*cell, self.days) if todo else None
+            if hit is None:
+                continue
+            data, issued = hit
+            weather = parse_forecast(data)
+            hourly = parse_forecast_hourly(data) if "hourly" in self.modes else None
+            for name in todo:
+                cfg, econ = station_setup(self.stations[name], self.defaults)
+                for mode in self.modes:
+                    run_engine_cached(weather, cfg, econ, mode, self.memo, hourly if mode == "hourly" else None)
+                    count += 1
+                self._planned[name] = issued
+        self.stats['plans'] += count
+        metrics().count("prewarm.plans", count)
+        return count
+
+    def run_once(self):
+        with metrics().stage("prewarm.cycle"):
+            refreshed = self.refresh(self.due())
+            plans = self.warm_plans()
+        self.stats['cycles'] += 1
+        self.stats['last_cycle'] = time.time()
+        return {"refreshed": refreshed, "plans": plans}
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as exc:
+                self.stats['last_error'] = f"{type(exc).__name__}: {exc}"
+            self._stop.wait(self.interval * random.uniform(0.8, 1.2))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="prewarm")
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
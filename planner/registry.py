@@ -0,0 +1,178 @@
+import csv
+import math
+import os
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+
+from .constants import STATION_DB
+from .engine import MODEL_FIELDS
+
+# ================= 🗺️ 电站注册表 =================
+# 从 CSV / SQLite 加载成百上千个电站（字段同 STATION_DB，另有 name 列），
+# 并把坐标映射到天气模型网格：同一网格内的电站共用一份预报（一次请求、一条缓存）。
+# 环境变量 SOLAR_STATIONS 指向注册表文件时，全站批量规划默认使用它；
+# SOLAR_MODELS 指向 calibrate.py 输出的按站模型参数时，一并覆盖各站的积灰模型参数。
+REGISTRY_PATH = os.environ.get("SOLAR_STATIONS")
+MODELS_PATH = os.environ.get("SOLAR_MODELS")
+REGISTRY_TABLE = "stations"
+GRID_RES_DEG = 0.1        # Open-Meteo 默认模型的网格约 0.1°（~11 km）
+INDEX_RES_DEG = 0.5       # 最近邻查询的空间分桶边长
+KM_PER_DEG = 111.195
+REQUIRED_FIELDS = ("name", "lat", "lon", "sell_price", "robot_elec_price", "water_price")
+FIELD_TYPES = {
+    "lat": float, "lon": float, "sell_price": float, "robot_elec_price": float, "water_price": float,
+    "panels": int, "power": float, "robots": int,
+    **{k: float for k in MODEL_FIELDS}
+}
+
+def _cells(lat, lon, res):
+    # 1e-9：避免 -3.6 / 0.1 = -36.000000000000004 这类浮点误差把格点边界上的电站分到相邻格
+    return np.floor(np.asarray(lat, dtype=float) / res + 1e-9).astype(np.int64), \
+        np.floor(np.asarray(lon, dtype=float) / res + 1e-9).astype(np.int64)
+
+def cell_center(lat, lon, res=GRID_RES_DEG):
+    # 坐标所在网格的中心点：请求与缓存都以它为键
+    i, j = _cells(lat, lon, res)
+    return round((int(i) + 0.5) * res, 4), round((int(j) + 0.5) * res, 4)
+
+def snap_coords(coords, res=GRID_RES_DEG):
+    # 坐标列表 -> (不重复的网格中心, 每个坐标对应的中心下标)
+    arr = np.asarray(coords, dtype=float).reshape(-1, 2)
+    i, j = _cells(arr[:, 0], arr[:, 1], res)
+    cells, inv = np.unique(np.stack([i, j], axis=1), axis=0, return_inverse=True)
+    centers = [(round((a + 0.5) * res, 4), round((b + 0.5) * res, 4)) for a, b in cells.tolist()]
+    return centers, inv.ravel()
+
+def distance_km(lat1, lon1, lat2, lon2):
+    # 球面距离（haversine），参数可为标量或可广播的数组
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    dp, dl = p2 - p1, np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dp / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def _station(row, where):
+    missing = [k for k in REQUIRED_FIELDS if row.get(k) in (None, "")]
+    if missing:
+        raise ValueError(f"{where}: missing {', '.join(missing)}")
+    station = {}
+    for k, v in row.items():
+        if k == "name" or v in (None, ""):
+            continue
+        try:
+            station[k] = FIELD_TYPES.get(k, str)(v)
+        except (TypeError, ValueError):
+            raise ValueError(f"{where}: invalid {k} {v!r}") from None
+    return station
+
+def parse_stations(rows, where, start=1):
+    # 记录序列（csv.DictReader、上传文件等）-> {名称: 参数}；缺字段或类型不符时抛出带行号的 ValueError
+    stations = {}
+    for n, row in enumerate(rows, start=start):
+        station = _station(row, f"{where}:{n}")      # 先校验：缺 name 列时报 ValueError 而不是 KeyError
+        stations[str(row['name']).strip()] = station
+    return stations
+
+def parse_stations_csv(f, where="<csv>"):
+    # 已打开的文本文件（如网页上传的清单）
+    return parse_stations(csv.DictReader(f), where, start=2)
+
+def read_stations_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return parse_stations_csv(f, path)
+
+def read_stations_sqlite(path, table=REGISTRY_TABLE):
+    conn = sqlite3.connect(path)
+    try:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(f'SELECT * FROM "{table}"').fetchall()
+    finally:
+        conn.close()
+    return parse_stations([dict(r) for r in rows], f"{path}:{table}")
+
+def read_stations(path):
+    # {名称: 参数}，格式与 STATION_DB 相同
+    if Path(path).suffix.lower() in (".db", ".sqlite", ".sqlite3"):
+        return read_stations_sqlite(path)
+    return read_stations_csv(path)
+
+def read_models(path):
+    # calibrate.write_models 的输出 -> {名称: {模型参数: 值}}（拟合统计列忽略）
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return {
+            row['name'].strip(): {k: float(row[k]) for k in MODEL_FIELDS if row.get(k) not in (None, "")}
+            for row in csv.DictReader(f)
+        }
+
+def apply_models(stations, models):
+    return {name: {**db, **models.get(name, {})} for name, db in stations.items()}
+
+def default_stations():
+    if REGISTRY_PATH:
+        stations = read_stations(REGISTRY_PATH)
+    else:
+        stations = {name: db for name, db in STATION_DB.items() if db}
+    return apply_models(stations, read_models(MODELS_PATH)) if MODELS_PATH else stations
+
+class StationRegistry:
+    def __init__(self, stations, res=GRID_RES_DEG, index_res=INDEX_RES_DEG):
+        self.stations = dict(stations)
+        self.names = list(self.stations)
+        self.lat = np.array([float(self.stations[n]['lat']) for n in self.names])
+        self.lon = np.array([float(self.stations[n]['lon']) for n in self.names])
+        self.res, self.index_res = res, index_res
+        self.centers, self.cell_of = snap_coords(np.stack([self.lat, self.lon], axis=1), res) if self.names else ([], np.zeros(0, np.int64))
+
+        # 最近邻索引：按 index_res 分桶，查询时由近及远逐圈扫描
+        bi, bj = _cells(self.lat, self.lon, index_res)
+        self._buckets = {}
+        for k, key in enumerate(zip(bi.tolist(), bj.tolist())):
+            self._buckets.setdefault(key, []).append(k)
+        self._buckets = {key: np.array(v) for key, v in self._buckets.items()}
+        self._span = (int(np.ptp(bi)) + int(np.ptp(bj)) + 1) if self.names else 0
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        return cls(read_stations(path), **kwargs)
+
+    def __len__(self):
+        return len(self.names)
+
+    def cells(self):
+        # {网格中心: [电站名]}
+        out = {}
+        for name, k in zip(self.names, self.cell_of.tolist()):
+            out.setdefault(self.centers[k], []).append(name)
+        return out
+
+    def _distance_km(self, lat, lon, idx):
+        return distance_km(lat, lon, self.lat[idx], self.lon[idx])
+
+    def nearest(self, lat, lon, k=1):
+        # [(电站名, 距离 km)]，由近到远。第 r 圈之外的电站至少相距 r 个分桶边长，
+        # 已找到 k 个且第 k 近的距离不超过这个下界时即可停止
+        if not self.names:
+            return []
+        k = min(k, len(self.names))
+        ci, cj = (int(x) for x in _cells(lat, lon, self.index_res))
+        found, dist = np.zeros(0, np.int64), np.zeros(0)
+        for r in range(self._span + max(abs(ci), abs(cj)) + 1):
+            ring = [
+                self._buckets[key] for key in (
+                    [(ci + di, cj + dj) for di in (-r, r) for dj in range(-r, r + 1)]
+                    + [(ci + di, cj + dj) for dj in (-r, r) for di in range(-r + 1, r)]
+                    if r else [(ci, cj)]
+                ) if key in self._buckets
+            ]
+            if ring:
+                idx = np.concatenate(ring)
+                found = np.concatenate([found, idx])
+                dist = np.concatenate([dist, self._distance_km(lat, lon, idx)])
+            if len(found) >= k:
+                kth = np.partition(dist, k - 1)[k - 1]
+                bound = r * self.index_res * KM_PER_DEG * math.cos(math.radians(min(89.9, abs(lat) + (r + 1) * self.index_res)))
+                if kth <= bound or len(found) == len(self.names):
+                    break
+        order = np.argsort(dist, kind="stable")[:k]
+        return [(self.names[found[i]], float(dist[i])) for i in order]
@@ -0,0 +1,165 @@
+import datetime
+import math
+
+import numpy as np
+
+from .constants import MUD_RISK_HUMIDITY, WIND_SAFETY_LIMIT
+
+# ================= 🎨 渲染管线 =================
+# 图表规格与预报网格只依赖计划数据：生成纯 dict / HTML 字符串，不依赖 plotly / streamlit，
+# 由页面按计划哈希缓存；清洗背景与柱色整列生成，不再逐窗口 add_vrect、逐行 apply。
+
+def fmt_date_short(s):
+    try:
+        dt = datetime.datetime.strptime(s, "%Y-%m-%d")
+        return f"{dt.month}/{dt.day}"
+    except: return s
+
+def window_shapes(dates, wins):
+    # 清洗背景：一次性生成全部矩形（等价于逐个 add_vrect，但不触发逐次校验与重绘）
+    idx = np.array([(w['start'], w['end']) for w in wins], dtype=int).reshape(-1, 2)
+    return [
+        dict(type="rect", xref="x", yref="y domain", x0=x0, x1=x1, y0=0, y1=1,
+             fillcolor="#0071e3", opacity=0.1, line=dict(width=0))
+        for x0, x1 in zip(dates[idx[:, 0]].tolist(), dates[idx[:, 1]].tolist())
+    ]
+
+def chart_specs(df, wins):
+    # 图表规格为纯 dict：按计划哈希缓存，构造 go.Figure 时只校验一次
+    dates = np.asarray(df['date'])
+    net = np.asarray(df['net'], dtype=float)
+    shapes = window_shapes(dates, wins)
+    
+    # --- 图一：辐射量 & 净现金流 (重新编辑，确保坐标轴格式正确) ---
+    spec1 = dict(
+        data=[
+            # 1. 辐射量 (左轴)
+            dict(type="scatter", x=dates, y=np.asarray(df['radiation_kwh']), name='辐射量 (kWh/m²)',
+                 line=dict(color='#ff9500', width=3), yaxis='y'),
+            # 2. 净现金流 (右轴)
+            dict(type="bar", x=dates, y=net, name='净现金流 (R$)',
+                 marker=dict(color=np.where(net > 0, '#34c759', '#ff3b30')), opacity=0.5, yaxis='y2')
+        ],
+        # 关键：重新定义布局，确保双轴彻底分离
+        layout=dict(
+            height=400,
+            hovermode='x unified',
+            legend=dict(orientation="h", y=1.05, x=0.5, xanchor='center', font=dict(size=11)),
+            # 左轴配置
+            yaxis=dict(
+                title=dict(text="辐射量 (kWh/m²)", font=dict(color="#ff9500", size=12)),
+                side='left', 
+                gridcolor='#f0f0f0', 
+                tickfont=dict(color="#ff9500", size=11),
+                showgrid=True,
+                zeroline=False
+            ),
+            # 右轴配置 - 关键修改：独立域，右侧，无网格
+            yaxis2=dict(
+                title=dict(text="净现金流 (R$)", font=dict(color="#34c759", size=12)),
+                overlaying='y', 
+                side='right', 
+                tickfont=dict(color="#34c759", size=11),
+                showgrid=False, # 右侧不显示网格，避免混乱
+                zeroline=False,
+                anchor='x' # 确保锚定在X轴上
+            ),
+            xaxis=dict(showgrid=False, tickfont=dict(size=10)),
+            shapes=shapes,
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            margin=dict(l=70, r=70, t=50, b=40), 
+            font=dict(family="Noto Sans SC", size=11),
+            barmode='overlay'
+        )
+    )
+    
+    # --- 图二：积灰度 (纵轴间隔调整为0.5) ---
+    # 计算动态范围，但重点是设置 tickinterval
+    max_dust = max(df['dust'], default=0)
+    y_max = max(5, math.ceil(max_dust * 1.2))
+    spec2 = dict(
+        data=[
+            dict(type="scatter", x=dates, y=np.asarray(df['dust']), name='积灰度 (%)',
+                 line=dict(color='#d70000', width=4), mode='lines+markers', marker=dict(size=6, color='#d70000'))
+        ],
+        layout=dict(
+            height=300, # 稍微增加高度以容纳更多刻度
+            hovermode='x unified',
+            showlegend=False, 
+            yaxis=dict(
+                title=dict(text="积灰度 (%)", font=dict(color="#d70000", size=12)),
+                side='left', 
+                gridcolor='#f0f0f0', 
+                range=[0, y_max],
+                tickfont=dict(color="#d70000", size=11), 
+                # 关键修改：强制刻度间隔为 0.5
+                dtick=0.5, 
+                showgrid=True,
+                zeroline=False
+            ),
+            xaxis=dict(showgrid=False, tickfont=dict(size=10)),
+            shapes=shapes,
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            margin=dict(l=70, r=20, t=10, b=40), 
+            font=dict(family="Noto Sans SC", size=11),
+        )
+    )
+    return spec1, spec2
+
+def opportunity_spec(curve):
+    # 清洗时机热力图：横轴开工日，纵轴清洗周期（所需机器人数），颜色为相对不清洗的净收益增量；
+    # 当前配置所在行加框，最佳开工日标星。不可开工的格子（NaN）留空
+    dates = np.asarray(curve['date'])
+    gain = np.asarray(curve['gain'], dtype=float)
+    labels = [f"{d} 天（≥{r} 台）" for d, r in zip(curve['duration'].tolist(), curve['robots'].tolist())]
+    finite = gain[np.isfinite(gain)]
+    span = max(float(np.abs(finite).max()), 1.0) if finite.size else 1.0
+    shapes, data = [], [
+        dict(type="heatmap", x=dates, y=labels, z=np.where(np.isfinite(gain), gain, None),
+             colorscale=[[0, "#ff3b30"], [0.5, "#f5f5f7"], [1, "#34c759"]], zmin=-span, zmax=span,
+             colorbar=dict(title="R$"), xgap=1, ygap=1,
+             hovertemplate="开工 %{x}<br>周期 %{y}<br>净收益增量 R$ %{z:,.0f}<extra></extra>")
+    ]
+    if curve['current'] is not None:
+        shapes.append(dict(type="rect", xref="paper", yref="y", x0=0, x1=1,
+                           y0=curve['current'] - 0.5, y1=curve['current'] + 0.5,
+                           line=dict(color="#0071e3", width=2)))
+        if curve['best'] is not None:
+            data.append(dict(type="scatter", x=[dates[curve['best']]], y=[labels[curve['current']]], mode="markers",
+                             marker=dict(symbol="star", size=14, color="#0071e3"), name="最佳开工日",
+                             hoverinfo="skip", showlegend=False))
+    return dict(
+        data=data,
+        layout=dict(
+            height=max(220, 26 * len(labels) + 80),
+            xaxis=dict(showgrid=False, tickfont=dict(size=10)),
+            yaxis=dict(title=dict(text="清洗周期", font=dict(size=12)), tickfont=dict(size=10), autorange="reversed"),
+            shapes=shapes,
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            margin=dict(l=110, r=20, t=10, b=40),
+            font=dict(family="Noto Sans SC", size=11),
+        )
+    )
+
+def weather_grid_html(weather_data):
+    # 预报网格一次性拼成单个 HTML 块（CSS grid 每行 7 天），替代逐日 st.columns + st.markdown
+    cards = []
+    for idx, d in enumerate(weather_data):
+        badge = ""
+        if d['wind'] > WIND_SAFETY_LIMIT: badge = "<div class='risk-badge risk-wind'>大风</div>"
+        elif d['humidity'] > MUD_RISK_HUMIDITY and d['code'] in [2,3]: badge = "<div class='risk-badge risk-mud'>泥泞</div>"
+        # 每张卡片拼成一行：Markdown 中空白行会结束 HTML 块，缩进 ≥4 的行会被当成代码块
+        cards.append("".join((
+            f'<div class="weather-card fade-in-up" style="animation-delay: {idx*0.05}s">',
+            f"<div class='w-date'>{fmt_date_short(d['date'])}</div>",
+            f"<div class='w-icon'>{d['icon']}</div>",
+            f"<div class='w-temp'>{d['temp']}°C</div>",
+            f"<div class='w-desc'>{d['desc'].split('(')[0]}</div>",
+            f"<div class='w-stats'>🌧️ {d['rain']}mm | ☢️ {d['radiation_kwh']} kWh</div>",
+            badge,
+            '</div>',
+        )))
+    return f'<div class="weather-grid">{"".join(cards)}</div>'
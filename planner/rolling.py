@@ -0,0 +1,150 @@
+import threading
+
+import numpy as np
+
+from .engine import run_engine_arrays, weather_columns
+
+# ================= 🔁 滚动重规划（可续算的引擎状态） =================
+# 引擎状态 = 某日结束时的积灰 + 最近一个清洗窗口的结束日（相对次日，-999 表示无），可 JSON 序列化。
+# checkpoint 在此基础上记录截至日期、进行中的窗口和累计 KPI：次日的规划从昨天的 checkpoint 续算，
+# 而不是从积灰 0 重新开始；同一天内预报刷新时，只重算与上次输入不同的后缀天数。
+WEATHER_KEYS = ("rain", "wind", "radiation_mj", "humidity")
+DAY_KEYS = ("revenue", "cost", "net", "carbon")
+NO_WINDOW = -999
+
+def initial_state():
+    return {"dust": 0.0, "last_end": NO_WINDOW}
+
+def initial_checkpoint():
+    return {
+        "date": None, **initial_state(), "window": None,
+        "kpi": {"days": 0, "windows": 0, **{k: 0.0 for k in DAY_KEYS}}
+    }
+
+def day_states(plan, windows, duration, state=None):
+    # 每天结束时的引擎状态：(积灰, 窗口结束日相对次日)，从第 i 天续算即取第 i-1 天的值
+    state = state or initial_state()
+    days = np.arange(len(plan['dust']))
+    starts = windows['start']
+    k = np.searchsorted(starts, days, side="right")
+    end = np.where(k > 0, starts[np.maximum(k - 1, 0)] + duration - 1 if len(starts) else 0, state['last_end'])
+    rel = end - (days + 1)
+    return plan['dust'], np.where(rel >= -1, rel, NO_WINDOW)
+
+def _state(dust, last_end, i, fallback):
+    return {"dust": float(dust[i]), "last_end": int(last_end[i])} if i >= 0 else fallback
+
+def _cols(weather):
+    cols = weather_columns(weather)
+    return {k: np.asarray(cols[k]) for k in ("date",) + WEATHER_KEYS}
+
+def plan_from(state, weather, cfg, econ):
+    # 从给定状态开始完整计算一次，返回可供 replan 复用的运行记录
+    cols = _cols(weather)
+    state = state or initial_state()
+    plan, wins, stats = run_engine_arrays(*(cols[k] for k in WEATHER_KEYS), cfg, econ, state=state)
+    stats['recomputed'] = len(cols['rain'])
+    return {"cols": cols, "plan": plan, "windows": wins, "stats": stats,
+            "cfg": dict(cfg), "econ": dict(econ), "state": state}
+
+def aligned(prev, weather):
+    # 新预报首日在上次运行中的位置；没有重叠（或新预报为空）时为 None
+    cols = _cols(weather)
+    pos = np.flatnonzero(prev['cols']['date'] == cols['date'][0]) if len(cols['date']) else []
+    return int(pos[0]) if len(pos) else None
+
+def replan(prev, weather, cfg, econ):
+    # 预报刷新：新预报的首日对齐到上次运行中的同一天，之前的天数视为已发生（从其结束状态续算），
+    # 与上次输入相同的前缀直接复用，只重算第一个变化日之后的部分；参数（cfg / econ）变化时从对齐日状态全部重算。
+    # 结果与从对齐日状态完整计算一次逐项相同。
+    # 新预报首日不在上次运行中时无从得知其间的积灰与窗口，抛出 ValueError（由调用方决定是否从初始状态重来）
+    cols = _cols(weather)
+    if prev is None:
+        return plan_from(None, cols, cfg, econ)
+    o = aligned(prev, cols)
+    if o is None:
+        first = str(cols['date'][0]) if len(cols['date']) else "（空）"
+        raise ValueError(f"新预报首日 {first} 不在上次运行的日期范围内，无法对齐引擎状态")
+    duration = prev['stats']['duration']
+    dust, last_end = day_states(prev['plan'], prev['windows'], duration, prev['state'])
+    base = _state(dust, last_end, o - 1, prev['state'])
+    if prev['cfg'] != dict(cfg) or prev['econ'] != dict(econ):
+        return plan_from(base, cols, cfg, econ)
+
+    n, n_prev = len(cols['rain']), len(prev['cols']['rain']) - o
+    m = min(n, n_prev)
+    same = np.ones(m, dtype=bool)
+    for k in ("date",) + WEATHER_KEYS:
+        same &= cols[k][:m] == prev['cols'][k][o:o + m]
+    s = int(np.argmin(same)) if not same.all() else m
+    if n != n_prev:
+        # 预测期长度变化时，末尾 duration 天的“窗口须在预测期内完成”判断会变化
+        s = min(s, max(m - duration, 0))
+    plan, wins, stats = run_engine_arrays(
+        *(cols[k][s:] for k in WEATHER_KEYS), cfg, econ, state=_state(dust, last_end, o + s - 1, prev['state'])
+    )
+    head = (prev['windows']['start'] >= o) & (prev['windows']['start'] < o + s)
+    plan = {k: np.concatenate((prev['plan'][k][o:o + s], v)) for k, v in plan.items()}
+    wins = {
+        k: np.concatenate((prev['windows'][k][head] - (o if k in ("start", "end") else 0),
+                           v + (s if k in ("start", "end") else 0)))
+        for k, v in wins.items()
+    }
+    stats.update(total_cost=sum(wins['cost'].tolist()), count=len(wins['start']), recomputed=n - s)
+    return {"cols": cols, "plan": plan, "windows": wins, "stats": stats,
+            "cfg": dict(cfg), "econ": dict(econ), "state": base}
+
+def run_days(run):
+    # 运行记录 -> 可序列化的逐日结果（含每天结束时的状态），用于之后推进 checkpoint
+    dust, last_end = day_states(run['plan'], run['windows'], run['stats']['duration'], run['state'])
+    return {
+        "date": [str(d) for d in run['cols']['date']], "duration": run['stats']['duration'],
+        "dust": dust.tolist(), "last_end": last_end.tolist(), "clean": run['plan']['clean'].tolist(),
+        **{k: run['plan'][k].tolist() for k in DAY_KEYS}
+    }
+
+def commit(ckpt, days, before):
+    # 把 days 中 checkpoint 之后、before 日期之前的天数计入 checkpoint（这些天已经发生）
+    idx = [i for i, d in enumerate(days['date']) if (ckpt['date'] is None or d > ckpt['date']) and d < before]
+    if not idx:
+        return ckpt
+    last = idx[-1]
+    kpi = dict(ckpt['kpi'])
+    kpi['days'] += len(idx)
+    kpi['windows'] += sum(days['clean'][i] for i in idx)
+    for k in DAY_KEYS:
+        kpi[k] += sum(days[k][i] for i in idx)
+
+    date, rel = days['date'][last], days['last_end'][last]
+    window = None
+    if rel >= 0:
+        end = np.datetime64(date) + rel + 1
+        window = {"start": str(end - days['duration'] + 1), "end": str(end), "days_remaining": rel + 1}
+    return {"date": date, "dust": days['dust'][last], "last_end": rel, "window": window, "kpi": kpi}
+
+def resume(ckpt, weather, cfg, econ):
+    # 从 checkpoint 续算：丢弃截至日及之前的预报天数，以 checkpoint 的状态为初始状态
+    cols = _cols(weather)
+    if ckpt['date'] is not None:
+        keep = cols['date'].astype(str) > ckpt['date']
+        cols = {k: v[keep] for k, v in cols.items()}
+    return plan_from({"dust": ckpt['dust'], "last_end": ckpt['last_end']}, cols, cfg, econ)
+
+class RollingPlanner:
+    # 按电站保存上一次运行记录；全站按小时刷新预报时，每站只为变化的天数付出计算
+    def __init__(self):
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def plan(self, key, weather, cfg, econ):
+        # 新预报与上次运行没有重叠（如长时间未刷新）时从初始状态重新开始，并在 stats["restarted"] 中标明
+        with self._lock:
+            prev = self._runs.get(key)
+        if prev is not None and aligned(prev, weather) is None:
+            run = plan_from(None, weather, cfg, econ)
+            run['stats']['restarted'] = True
+        else:
+            run = replan(prev, weather, cfg, econ)
+        with self._lock:
+            self._runs[key] = run
+        return run
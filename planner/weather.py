@@ -0,0 +1,372 @@
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .cache import default_cache
+from .constants import MUD_RISK_HUMIDITY, WIND_SAFETY_LIMIT
+from .engine import weather_columns
+from .metrics import metrics
+from .synthetic import default_seed, station_frame, synthetic_weather
+
+# ================= 🛠️ 工具函数 =================
+def get_weather_icon(code: int) -> str:
+    icons = {0: "☀️", 1: "🌤️", 2: "⛅", 3: "☁️", 45: "🌫️", 51: "🌦️", 53: "🌦️", 55: "🌧️", 
+             61: "🌧️", 63: "🌧️", 65: "⛈️", 80: "🌦️", 81: "🌧️", 82: "⛈️", 95: "⚡", 96: "⚡", 99: "⚡"}
+    return icons.get(code, "❓")
+
+def get_weather_desc(code: int, humidity: float, wind: float) -> str:
+    base = {0: "晴朗", 1: "大部晴朗", 2: "多云", 3: "阴天", 45: "雾", 51: "小雨", 
+            53: "雨", 55: "雨", 61: "雨", 63: "雨", 65: "大雨", 80: "阵雨", 
+            81: "雨", 82: "风暴", 95: "雷暴", 96: "雷暴", 99: "雷暴"}.get(code, "未知")
+    risks = []
+    if code in [95, 96, 99]: risks.append("⚡")
+    if wind > WIND_SAFETY_LIMIT: risks.append(f"💨{wind:.0f}")
+    if humidity > MUD_RISK_HUMIDITY and code in [2, 3]: risks.append("💧")
+    return f"{base} ({' '.join(risks)})" if risks else base
+
+# ================= 🌐 数据获取 =================
+SOURCE_API = "Open-Meteo API"
+SOURCE_SIM = "模拟模式 (API 备用)"
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+HOURLY_VARS = "weathercode,temperature_2m,relativehumidity_2m,windspeed_10m,rain,shortwave_radiation"
+DAILY_VARS = "shortwave_radiation_sum,precipitation_sum,windspeed_10m_max,temperature_2m_max"
+BULK_MAX_LOCATIONS = 50   # 单次请求的坐标数上限（受 URL 长度与 API 配额限制）
+BULK_WORKERS = 4
+
+_session = None
+_session_lock = threading.Lock()
+
+def http_session():
+    # 全局复用连接池（keep-alive），429/5xx 有限次重试并指数退避
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            
+            retry = Retry(
+                total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(["GET"]), respect_retry_after_header=True
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+def request_forecast(lat, lon, days=14):
+    params = {
+        "latitude": lat, "longitude": lon,
+        "hourly": HOURLY_VARS, "daily": DAILY_VARS,
+        "timezone": "auto", "forecast_days": days
+    }
+    resp = http_session().get(FORECAST_URL, params=params, timeout=15)
+    resp.raise_for_status()
+    return resp.json()
+
+def request_forecast_bulk(coords, days=14):
+    # Open-Meteo 接受逗号分隔的坐标列表，多坐标时按输入顺序返回 JSON 数组
+    if not coords:
+        return []
+    params = {
+        "latitude": ",".join(f"{float(lat):.4f}" for lat, _ in coords),
+        "longitude": ",".join(f"{float(lon):.4f}" for _, lon in coords),
+        "hourly": HOURLY_VARS, "daily": DAILY_VARS,
+        "timezone": "auto", "forecast_days": days
+    }
+    resp = http_session().get(FORECAST_URL, params=params, timeout=30)
+    resp.raise_for_status()
+    data = resp.json()
+    data = data if isinstance(data, list) else [data]
+    if len(data) != len(coords):
+        raise ValueError(f"bulk response has {len(data)} locations, expected {len(coords)}")
+    return data
+
+def _fill(values, default):
+    # 等价于逐项的 `v or default`：None 与 0 都取默认值
+    arr = np.array(values, dtype=float)
+    arr[np.isnan(arr) | (arr == 0)] = default
+    return arr
+
+def _round_col(arr, ndigits):
+    return np.array([round(v, ndigits) for v in arr.tolist()])
+
+def _aggregate_forecast(data):
+    # 逐小时数据按日期分组：雨量求和、风速/湿度/温度取最大、天气代码取众数（计数法）
+    h, d = data['hourly'], data['daily']
+    hour_dates = np.array(h['time'], dtype=str).astype("U10")
+    days, inv = np.unique(hour_dates, return_inverse=True)
+    n_groups = len(days)
+    
+    rain_h = np.bincount(inv, weights=_fill(h['rain'], 0), minlength=n_groups)
+    wind_h = np.zeros(n_groups)
+    hum_h = np.zeros(n_groups)
+    temp_h = np.zeros(n_groups)
+    np.maximum.at(wind_h, inv, _fill(h['windspeed_10m'], 0))
+    np.maximum.at(hum_h, inv, _fill(h['relativehumidity_2m'], 50))
+    np.maximum.at(temp_h, inv, _fill(h['temperature_2m'], 25))
+    
+    codes = _fill(h['weathercode'], 0).astype(np.int64)
+    n_codes = int(codes.max()) + 1 if len(codes) else 1
+    counts = np.bincount(inv * n_codes + codes, minlength=n_groups * n_codes).reshape(n_groups, n_codes)
+    code_h = counts.argmax(axis=1)   # 并列时取较小的代码
+    
+    # 日数据缺失时回退到小时聚合值；没有对应小时数据的日期用默认值
+    daily_dates = np.array(d['time'], dtype=str)
+    pos = np.searchsorted(days, daily_dates)
+    found = pos < n_groups
+    found[found] = days[pos[found]] == daily_dates[found]
+    pos = np.where(found, pos, 0)
+    
+    def hourly(col, default):
+        return np.where(found, col[pos], default) if n_groups else np.full(len(daily_dates), float(default))
+    
+    def daily(name, fallback):
+        arr = _fill(d[name], np.nan)
+        return np.where(np.isnan(arr), fallback, arr)
+    
+    return {
+        "date": daily_dates,
+        "rain": daily('precipitation_sum', hourly(rain_h, 0)),
+        "wind": daily('windspeed_10m_max', hourly(wind_h, 0)) / 3.6,
+        "radiation_mj": _fill(d['shortwave_radiation_sum'], 0),
+        "humidity": hourly(hum_h, 70),
+        "temp": daily('temperature_2m_max', hourly(temp_h, 25)),
+        "code": hourly(code_h, 0).astype(np.int64)
+    }
+
+def _frame(raw):
+    return {
+        "date": raw['date'],
+        "rain": _round_col(raw['rain'], 1), "wind": _round_col(raw['wind'], 1),
+        "radiation_mj": _round_col(raw['radiation_mj'], 1),
+        "radiation_kwh": _round_col(raw['radiation_mj'] / 3.6, 2),
+        "humidity": _round_col(raw['humidity'], 1), "temp": _round_col(raw['temp'], 1),
+        "code": raw['code']
+    }
+
+def parse_forecast_columns(data):
+    # 紧凑的逐日天气帧（列 -> 数组），可直接交给 run_engine / run_engine_arrays
+    return _frame(_aggregate_forecast(data))
+
+def parse_forecast(data):
+    raw = _aggregate_forecast(data)
+    cols = _frame(raw)
+    return [
+        {
+            "date": str(date), "rain": rain, "wind": wind,
+            "radiation_mj": rad_mj, "radiation_kwh": rad_kwh,
+            "humidity": hum, "temp": temp,
+            "code": code, "icon": get_weather_icon(code), "desc": get_weather_desc(code, raw_hum, raw_wind)
+        }
+        for date, rain, wind, rad_mj, rad_kwh, hum, temp, code, raw_hum, raw_wind in zip(
+            cols['date'].tolist(), cols['rain'].tolist(), cols['wind'].tolist(),
+            cols['radiation_mj'].tolist(), cols['radiation_kwh'].tolist(),
+            cols['humidity'].tolist(), cols['temp'].tolist(), cols['code'].tolist(),
+            raw['humidity'].tolist(), raw['wind'].tolist()
+        )
+    ]
+
+def diurnal_profile(hour):
+    # 晴空辐射的日变化形状（6–18 时正弦），用于把日辐射量分摊到小时
+    return np.maximum(0.0, np.sin(np.pi * (np.asarray(hour, dtype=float) - 6) / 12))
+
+def _spread_daily(values, day_idx, weights):
+    # 按权重把逐日总量分摊到该日的各小时（权重和为 0 的日期平均分摊）
+    sums = np.bincount(day_idx, weights=weights, minlength=len(values))
+    counts = np.bincount(day_idx, minlength=len(values))
+    share = np.where(sums[day_idx] > 0, weights / np.where(sums[day_idx] > 0, sums[day_idx], 1), 1 / counts[day_idx])
+    return np.asarray(values, dtype=float)[day_idx] * share
+
+def parse_forecast_hourly(data):
+    # 逐小时天气帧（逐小时调度用）：风速 m/s，辐射 MJ/m²（小时平均 W/m² × 0.0036）。
+    # 旧缓存中没有小时辐射时，按日辐射与日变化曲线分摊
+    h, d = data['hourly'], data['daily']
+    time = np.array(h['time'], dtype=str)
+    stamps = time.astype("datetime64[h]")
+    date = time.astype("U10")
+    hour = (stamps - stamps.astype("datetime64[D]")).astype(np.int64)
+    if 'shortwave_radiation' in h:
+        rad_mj = _fill(h['shortwave_radiation'], 0) * 0.0036
+    else:
+        daily_dates = np.array(d['time'], dtype=str)
+        pos = np.searchsorted(daily_dates, date)
+        known = pos < len(daily_dates)
+        known[known] = daily_dates[pos[known]] == date[known]
+        daily_rad = np.append(_fill(d['shortwave_radiation_sum'], 0), 0.0)   # 末位：无对应日数据
+        rad_mj = _spread_daily(daily_rad, np.where(known, pos, len(daily_dates)), diurnal_profile(hour))
+    return {
+        "date": date, "hour": hour,
+        "rain": _fill(h['rain'], 0), "wind": _fill(h['windspeed_10m'], 0) / 3.6,
+        "radiation_mj": rad_mj, "humidity": _fill(h['relativehumidity_2m'], 50)
+    }
+
+def expand_hourly(weather):
+    # 逐日天气 -> 逐小时：雨量集中在 14–17 时（一次降雨事件，与逐日阈值语义一致），
+    # 风速按午后峰值的日变化缩放（日最大值不变），辐射按日变化曲线分摊，湿度取日值
+    cols = weather_columns(weather)
+    days = len(cols['date'])
+    hour = np.tile(np.arange(24), days)
+    day_idx = np.repeat(np.arange(days), 24)
+    rain_w = ((hour >= 14) & (hour < 18)).astype(float)
+    wind_f = 0.6 + 0.4 * np.maximum(0.0, np.sin(np.pi * (hour - 9) / 12))
+    return {
+        "date": np.repeat(np.asarray(cols['date'], dtype=str), 24), "hour": hour,
+        "rain": _spread_daily(cols['rain'], day_idx, rain_w),
+        "wind": np.asarray(cols['wind'], dtype=float)[day_idx] * wind_f,
+        "radiation_mj": _spread_daily(cols['radiation_mj'], day_idx, diurnal_profile(hour)),
+        "humidity": np.asarray(cols['humidity'], dtype=float)[day_idx]
+    }
+
+def simulate_columns(days=14, lat=-3.60, lon=-59.12, seed=None):
+    # API 不可用时的回退数据：按坐标的气候参数生成；默认种子由坐标与起始日期决定，
+    # 同一天内多次缓存未命中得到同一份模拟预报
+    start = datetime.date.today().isoformat()
+    seed = default_seed(lat, lon, start) if seed is None else seed
+    return station_frame(synthetic_weather([(lat, lon)], days, start, seed), 0)
+
+def simulate_weather(days=14, lat=-3.60, lon=-59.12, seed=None):
+    cols = simulate_columns(days, lat, lon, seed)
+    return [
+        {
+            "date": str(d), "rain": r, "wind": w, "radiation_mj": rad, "radiation_kwh": kwh,
+            "humidity": hum, "temp": temp,
+            "code": code, "icon": get_weather_icon(code), "desc": get_weather_desc(code, hum, w)
+        }
+        for d, r, w, rad, kwh, hum, temp, code in zip(
+            cols['date'].tolist(), cols['rain'].tolist(), cols['wind'].tolist(), cols['radiation_mj'].tolist(),
+            cols['radiation_kwh'].tolist(), cols['humidity'].tolist(), cols['temp'].tolist(), cols['code'].tolist()
+        )
+    ]
+
+def _cached_source(issued):
+    return f"{SOURCE_API} (缓存 {datetime.datetime.fromtimestamp(issued).strftime('%H:%M')})"
+
+def _parsed(parse, data):
+    with metrics().stage("weather.parse"):
+        return parse(data)
+
+def _simulated(simulate, days, lat, lon):
+    m = metrics()
+    m.count("weather.source.simulation")
+    with m.stage("weather.simulate"):
+        return simulate(days, lat, lon)
+
+def _fetch(lat, lon, days, cache, parse, simulate):
+    # 磁盘缓存 stale-while-revalidate：过期数据立即返回并在后台刷新，
+    # 只有没有可用缓存时才阻塞请求 API，请求失败才回退到模拟数据
+    m = metrics()
+    cache = cache or default_cache()
+    with m.stage("weather.cache"):
+        hit = cache.get(lat, lon, days)
+    if hit is not None:
+        data, issued = hit
+        age = time.time() - issued
+        if age <= cache.ttl:
+            m.count("weather.cache.fresh")
+            return _parsed(parse, data), _cached_source(issued)
+        if age <= cache.stale_max:
+            m.count("weather.cache.stale")
+            cache.refresh_async(lat, lon, days, lambda: request_forecast(lat, lon, days))
+            return _parsed(parse, data), _cached_source(issued)
+    m.count("weather.cache.miss")
+    
+    try:
+        with m.stage("weather.fetch"):
+            data = request_forecast(lat, lon, days)
+        res = _parsed(parse, data)
+        cache.put(lat, lon, days, data)
+        m.count("weather.source.api")
+        return res, SOURCE_API
+    except Exception:
+        m.count("weather.fetch.error")
+        if hit is not None:
+            m.count("weather.source.expired_cache")
+            return _parsed(parse, hit[0]), _cached_source(hit[1])
+        return _simulated(simulate, days, lat, lon), SOURCE_SIM
+
+def fetch_weather(lat, lon, days=14, cache=None):
+    return _fetch(lat, lon, days, cache, parse_forecast, simulate_weather)
+
+def fetch_weather_hourly(lat, lon, days=14, cache=None):
+    # ((逐日记录, 逐小时帧), 来源)：两者来自同一份预报，供逐小时调度与页面展示共用
+    return _fetch(lat, lon, days, cache, *_with_hourly(parse_forecast, simulate_weather))
+
+def _request_chunks(coords, days):
+    chunks = [coords[i:i + BULK_MAX_LOCATIONS] for i in range(0, len(coords), BULK_MAX_LOCATIONS)]
+    if len(chunks) == 1:
+        return request_forecast_bulk(chunks[0], days)
+    with ThreadPoolExecutor(max_workers=min(BULK_WORKERS, len(chunks))) as pool:
+        parts = pool.map(lambda c: request_forecast_bulk(c, days), chunks)
+        return [data for part in parts for data in part]
+
+def _with_hourly(parse, simulate):
+    # 在逐日解析 / 模拟的基础上附带同一份数据的逐小时帧
+    def parse_both(data):
+        return parse(data), parse_forecast_hourly(data)
+    
+    def simulate_both(days, lat, lon):
+        sim = simulate(days, lat, lon)
+        return sim, expand_hourly(sim)
+    return parse_both, simulate_both
+
+def fetch_weather_bulk(coords, days=14, cache=None, columns=False, hourly=False):
+    # 多电站一次请求：逐个查磁盘缓存，未命中的坐标合并为批量请求，
+    # 过期的坐标先用旧数据并合并为一次后台批量刷新；返回与 coords 顺序一致的 (天气, 来源) 列表。
+    # columns=True 时天气为列式帧（批量规划无需图标/描述）；hourly=True 时天气为 (逐日, 逐小时帧)
+    m = metrics()
+    cache = cache or default_cache()
+    parse = parse_forecast_columns if columns else parse_forecast
+    simulate = simulate_columns if columns else simulate_weather
+    if hourly:
+        parse, simulate = _with_hourly(parse, simulate)
+    coords = [(float(lat), float(lon)) for lat, lon in coords]
+    out = [None] * len(coords)
+    hits, missing, stale = {}, [], []
+    
+    for i, (lat, lon) in enumerate(coords):
+        with m.stage("weather.cache"):
+            hit = cache.get(lat, lon, days)
+        if hit is not None:
+            hits[i] = hit
+            data, issued = hit
+            age = time.time() - issued
+            if age <= cache.stale_max:
+                out[i] = (_parsed(parse, data), _cached_source(issued))
+                if age > cache.ttl:
+                    stale.append(i)
+                continue
+        missing.append(i)
+    m.count("weather.cache.fresh", len(coords) - len(missing) - len(stale))
+    m.count("weather.cache.stale", len(stale))
+    m.count("weather.cache.miss", len(missing))
+    
+    if stale:
+        cache.refresh_many_async(
+            [coords[i] for i in stale], days, lambda cs: _request_chunks(cs, days)
+        )
+    
+    if missing:
+        try:
+            with m.stage("weather.fetch"):
+                payloads = _request_chunks([coords[i] for i in missing], days)
+            for i, data in zip(missing, payloads):
+                out[i] = (_parsed(parse, data), SOURCE_API)
+                cache.put(*coords[i], days, data)
+                m.count("weather.source.api")
+        except Exception:
+            m.count("weather.fetch.error")
+            for i in missing:
+                if out[i] is not None:
+                    continue
+                if i in hits:
+                    m.count("weather.source.expired_cache")
+                    out[i] = (_parsed(parse, hits[i][0]), _cached_source(hits[i][1]))
+                else:
+                    out[i] = (_simulated(simulate, days, *coords[i]), SOURCE_SIM)
+    return out
@@ -0,0 +1,137 @@
+import numpy as np
+
+from .constants import (
+    CARBON_FACTOR, ENERGY_CONSUMPTION_PER_PANEL, HOTSPOT_THRESHOLD, MAX_DUST_CAPACITY, ROBOT_AVAILABILITY_RATE,
+    ROBOT_DAILY_WORK_HOURS, ROBOT_EFFICIENCY_PANELS_PER_HOUR, WATER_CONSUMPTION_PER_PANEL,
+)
+from .engine import REASON_ECONOMIC, REASON_HOTSPOT, REASONS, daily_terms, engine_params, model_params
+
+# ================= 🧩 分区积灰引擎 =================
+# 整站引擎把电站当作一个积灰值、每次整场清洗 duration 天；分区引擎按 分区 × 天 数组递推积灰：
+# 各分区积灰速率乘以位置系数（外侧阵列行迎风、检修道路两侧扬尘），机器人每天在日产能内
+# 优先清洗积灰最重的分区，损耗按各分区板数加权。触发规则与整站引擎相同，逐分区判断：
+# 积灰超过热斑阈值必清；否则该分区三天的损失超过其清洗成本（含 10% 余量）才清。
+# 判断顺序也与整站引擎相同：先按当天复位前的积灰决策，再把昨天清洗过的分区复位（可连续两天清洗同一分区），
+# 单个分区、一天清完的布局与 run_engine_arrays 逐日一致。
+# 按天循环，每步对全部分区向量运算（排序只作用于当天需清洗的分区），几千个分区的一年计划在百毫秒量级。
+ZONE_ROWS = 20               # 默认布局：阵列行数
+ZONE_COLS = 50               # 默认布局：每行分区数
+ZONE_EDGE_SOILING = 1.3      # 最外侧行 / 列
+ZONE_ROAD_SOILING = 1.5      # 检修道路两侧的分区
+ZONE_ROAD_EVERY = 10         # 每隔多少列一条检修道路
+
+def zone_layout(panels, rows=ZONE_ROWS, cols=ZONE_COLS, edge=ZONE_EDGE_SOILING, road=ZONE_ROAD_SOILING,
+                road_every=ZONE_ROAD_EVERY):
+    # 规则网格布局：板数尽量均分；位置系数按板数加权平均归一为 1，全站平均积灰速率与整站引擎一致
+    n = rows * cols
+    count = np.full(n, int(panels) // n, dtype=np.int64)
+    count[:int(panels) % n] += 1
+    r, c = np.divmod(np.arange(n), cols)
+    soiling = np.ones(n)
+    soiling[(r == 0) | (r == rows - 1) | (c == 0) | (c == cols - 1)] *= edge
+    soiling[(c % road_every == 0) | (c % road_every == road_every - 1)] *= road
+    soiling /= np.average(soiling, weights=np.maximum(count, 1))
+    return {"panels": count, "soiling": soiling}
+
+def run_engine_zones(rain, wind, rad_mj, hum, cfg, econ, layout=None):
+    # layout 为 {"panels": (Z,), "soiling": (Z,)}，缺省时按 cfg['panels'] 生成 zone_layout。
+    # 清洗以分区为单位当天完成，次日该分区积灰复位；大风日停工。
+    # 返回的逐日计划字段与 run_engine_arrays 相同（清洗 = 当天有机器人作业），另含分区明细 zone_dust / zone_clean (Z, D)
+    rain = np.asarray(rain, dtype=float)
+    wind = np.asarray(wind, dtype=float)
+    rad_mj = np.asarray(rad_mj, dtype=float)
+    n = len(rain)
+    layout = layout or zone_layout(cfg['panels'])
+    panels = np.asarray(layout['panels'], dtype=float)
+    soiling = np.asarray(layout['soiling'], dtype=float)
+    z = len(panels)
+    share = panels / panels.sum() if panels.sum() > 0 else np.full(z, 1 / max(z, 1))
+
+    p_sell = econ['sell']
+    # 与 engine_params 同样的算式，单分区时与整站清洗成本逐位相同
+    zone_cost = panels * WATER_CONSUMPTION_PER_PANEL * econ['water'] + panels * ENERGY_CONSUMPTION_PER_PANEL * econ['elec']
+    zone_trigger = zone_cost * 1.1
+    daily_cap = cfg['robots'] * ROBOT_AVAILABILITY_RATE * ROBOT_EFFICIENCY_PANELS_PER_HOUR * ROBOT_DAILY_WORK_HOURS
+    terms = daily_terms(rain, wind, rad_mj, hum, cfg['capacity'], model_params(cfg))
+    gen_potential, safety = terms['gen'], terms['safety']
+
+    zone_dust = np.empty((n, z), dtype=np.float32)
+    zone_clean = np.zeros((n, z), dtype=bool)
+    dust_arr = np.empty(n)
+    loss_arr = np.empty(n)
+    hot_spot = np.zeros(n, dtype=bool)
+    reason = np.zeros(n, dtype=np.int8)
+    reset = np.zeros(n, dtype=bool)
+    cost = np.zeros(n)
+
+    heavy_l, light_l, rate_l = terms['heavy'].tolist(), terms['light'].tolist(), terms['rate'].tolist()
+    k_l, gen_l, safety_l = terms['soil_k'].tolist(), gen_potential.tolist(), safety.tolist()
+    dust = np.zeros(z)
+    cleaned = np.zeros(z, dtype=bool)
+
+    for i in range(n):
+        if heavy_l[i]: dust = np.zeros(z)
+        elif light_l[i]: dust = dust * 0.5
+        else: dust = np.minimum(dust + rate_l[i] * soiling, MAX_DUST_CAPACITY)
+
+        loss = np.minimum((dust / 100) * k_l[i], 1.0)
+        hot = dust > HOTSPOT_THRESHOLD
+
+        today = np.zeros(z, dtype=bool)
+        if not safety_l[i] and i + 1 < n:
+            # 经济规则：该分区三天的损失 gen·share·loss·p·3 超过其清洗成本 × 1.1（乘法顺序与整站引擎一致）
+            todo = np.flatnonzero(hot | (gen_l[i] * (share * loss) * p_sell * 3.0 > zone_trigger))
+            if len(todo):
+                # 积灰最重的分区优先，按板数累计到当天产能为止
+                todo = todo[np.argsort(-dust[todo], kind="stable")]
+                todo = todo[np.cumsum(panels[todo]) <= daily_cap]
+                today[todo] = True
+                cost[i] = zone_cost[todo].sum()
+                if len(todo):
+                    reason[i] = REASON_HOTSPOT if hot[todo].any() else REASON_ECONOMIC
+
+        # 决策之后，昨天清洗过的分区复位
+        if cleaned.any():
+            dust[cleaned] = 0.2
+            loss[cleaned] = 0.002
+            reset[i] = True
+        cleaned = today
+
+        zone_dust[i], zone_clean[i] = dust, cleaned
+        dust_arr[i], loss_arr[i], hot_spot[i] = share @ dust, share @ loss, hot.any()
+
+    clean = reason > 0
+    actual_gen = gen_potential * (1 - loss_arr)
+    revenue = actual_gen * p_sell
+    plan = {
+        "rain": rain, "wind": wind, "radiation_kwh": rad_mj / 3.6,
+        "dust": dust_arr, "loss": loss_arr,
+        "clean": clean, "reason": reason, "reset": reset & ~clean,   # 作业日照常显示为清洗中
+        "revenue": revenue, "cost": cost, "net": revenue - cost,
+        "carbon": (actual_gen * CARBON_FACTOR) / 1000,
+        "hot_spot": hot_spot, "safety": safety,
+        "zone_dust": zone_dust.T, "zone_clean": zone_clean.T,
+        "cleaned_panels": zone_clean @ panels
+    }
+    return plan, {
+        "total_cost": float(cost.sum()), "count": int(np.count_nonzero(clean)), "duration": 1,
+        "zones": z, "zone_cleanings": int(np.count_nonzero(zone_clean)),
+        "sweep_days": engine_params(cfg, econ)[0]
+    }
+
+def zone_windows(plan):
+    # 连续作业日合并为一个清洗窗口（展示用）；含热斑分区的窗口记为热斑风险
+    clean = np.asarray(plan['clean'])
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], clean.astype(np.int8), [0]))))
+    return [
+        {"start": int(s), "end": int(e - 1), "reason": REASONS[int(plan['reason'][s:e].min())],
+         "cost": float(plan['cost'][s:e].sum())}
+        for s, e in zip(edges[0::2].tolist(), edges[1::2].tolist())
+    ]
+
+def plan_zones(weather, cfg, econ, layout=None):
+    # 单站分区规划：返回 (逐日计划, 清洗窗口记录, 统计)，与 run_engine_arrays / plan_hourly 的输出形式一致。
+    # stats['duration'] 为 1：逐日计划中每个作业日都是一次清洗（导出时按天成窗）
+    plan, stats = run_engine_zones(weather['rain'], weather['wind'], weather['radiation_mj'], weather['humidity'],
+                                   cfg, econ, layout)
+    return plan, zone_windows(plan), stats